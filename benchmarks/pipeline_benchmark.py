@@ -0,0 +1,206 @@
+"""End-to-end download/transcode benchmark against a local media fixture server.
+
+Synthetic clips are generated with ffmpeg and served over HTTP on localhost, so
+yt-dlp goes through its generic extractor exactly like it would for a direct
+media link, without touching the network. Every configuration (concurrency x
+encoder x transfer profile) runs in a fresh child process so its peak RSS is its own.
+
+	python benchmarks/pipeline_benchmark.py --items 8 --concurrency 1 2 4 --encoder libx264 --transfer auto conservative -o bench.json
+
+Results are written as JSON so runs can be compared over time.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src')
+sys.path.insert(0, os.path.abspath(SRC_DIR))
+
+from engine import DownloadEngine, find_tool  # noqa: E402
+from transfer import TRANSFER_PROFILES, throughput_report  # noqa: E402
+
+STAGES = ('extract', 'download', 'merge', 'convert')
+
+
+def make_fixture(ffmpeg_path, directory, seconds, height, codec):
+	"""renders a test clip with video and audio; codec 'h264' hits the remux path, 'mpeg4' forces a transcode"""
+	path = os.path.join(directory, 'clip.mp4')
+	video_args = ['-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p'] if codec == 'h264' else ['-c:v', 'mpeg4', '-q:v', '5']
+	subprocess.run(
+		[
+			ffmpeg_path, '-hide_banner', '-v', 'error', '-y',
+			'-f', 'lavfi', '-i', f'testsrc2=size={height * 16 // 9}x{height}:rate=30',
+			'-f', 'lavfi', '-i', 'sine=frequency=440:sample_rate=48000',
+			'-t', str(seconds),
+		] + video_args + ['-c:a', 'aac', '-b:a', '128k', '-movflags', '+faststart', path],
+		check=True
+	)
+	return path
+
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+	"""serves the one fixture under any /clip-<n>.mp4 name so every item gets its own title"""
+	def translate_path(self, path):
+		return os.path.join(self.directory, 'clip.mp4')
+
+	def log_message(self, format, *args):
+		pass
+
+
+def start_server(directory):
+	server = ThreadingHTTPServer(('127.0.0.1', 0), partial(FixtureHandler, directory=directory))
+	threading.Thread(target=server.serve_forever, daemon=True).start()
+	return server
+
+
+def peak_rss_kb():
+	"""peak resident memory of this process and its finished children (ffmpeg), in KiB"""
+	try:
+		import resource
+	except ImportError:
+		return None
+	scale = 1024 if sys.platform == 'darwin' else 1  # macOS reports bytes
+	own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // scale
+	children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // scale
+	return {'self': own, 'children': children}
+
+
+def run_config(config):
+	"""runs one batch in this process and returns its measurements"""
+	output_dir = tempfile.mkdtemp(prefix='bench-out-')
+	engine = DownloadEngine(
+		ffmpeg_path=config['ffmpeg'],
+		ffprobe_path=config['ffprobe'],
+		download_workers=config['concurrency'],
+		postprocess_workers=config['postprocess_workers'],
+		transfer=config['transfer']
+	)
+	links = [f"{config['base_url']}/clip-{i}.mp4" for i in range(config['items'])]
+	settings = {
+		'media_type': config['mode'],
+		'directory': output_dir,
+		'resolution': config['height'],
+		'bitrate': config['bitrate'],
+		'encoder': config['encoder'],
+	}
+
+	started = time.perf_counter()
+	jobs = engine.run(links, settings)
+	wall = time.perf_counter() - started
+	engine.shutdown()
+	shutil.rmtree(output_dir, ignore_errors=True)
+
+	done = [job for job in jobs if job.status == 'done']
+	total_bytes = sum(job.bytes_downloaded for job in done)
+	ttfbs = [job.ttfb for job in done if job.ttfb is not None]
+	stages = {}
+	for stage in STAGES:
+		values = [job.timings[stage] for job in done if stage in job.timings]
+		if values:
+			stages[stage] = {'mean': statistics.mean(values), 'max': max(values), 'total': sum(values)}
+	return {
+		'concurrency': config['concurrency'],
+		'encoder': config['encoder'],
+		'transfer': config['transfer'],
+		'items': len(jobs),
+		'failed': len(jobs) - len(done),
+		'errors': sorted({job.error for job in jobs if job.error}),
+		'strategies': sorted({job.strategy for job in done if job.strategy}),
+		'wall_seconds': wall,
+		'items_per_minute': len(done) / wall * 60 if wall else 0,
+		'bytes_per_second': total_bytes / wall if wall else 0,
+		'ttfb_seconds': {'mean': statistics.mean(ttfbs), 'max': max(ttfbs)} if ttfbs else None,
+		'stages': stages,
+		'throughput': throughput_report(jobs),
+		'peak_rss_kb': peak_rss_kb(),
+	}
+
+
+def run_in_child(config):
+	"""runs a configuration in a fresh interpreter so peak memory isn't shared between runs"""
+	result = subprocess.run(
+		[sys.executable, os.path.abspath(__file__), '--run-one', json.dumps(config)],
+		capture_output=True,
+		text=True
+	)
+	if result.returncode != 0:
+		return {'concurrency': config['concurrency'], 'encoder': config['encoder'], 'transfer': config['transfer'], 'error': result.stderr.strip()[-2000:]}
+	return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument('--items', type=int, default=8, help="items per batch")
+	parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4], help="download worker counts to try")
+	parser.add_argument('--encoder', nargs='+', default=['libx264'], help="encoders to try")
+	parser.add_argument('--transfer', nargs='+', default=['auto'], choices=list(TRANSFER_PROFILES), help="transfer profiles to try")
+	parser.add_argument('--postprocess-workers', type=int, help="conversion workers (default: scheduler's choice)")
+	parser.add_argument('--mode', choices=['audio', 'video'], default='video')
+	parser.add_argument('--seconds', type=int, default=10, help="fixture length")
+	parser.add_argument('--height', type=int, default=720, help="fixture height")
+	parser.add_argument('--codec', choices=['h264', 'mpeg4'], default='mpeg4', help="fixture video codec")
+	parser.add_argument('--bitrate', default='5M')
+	parser.add_argument('--ffmpeg', default=None)
+	parser.add_argument('--ffprobe', default=None)
+	parser.add_argument('-o', '--output', help="write the JSON report here instead of stdout")
+	parser.add_argument('--run-one', help=argparse.SUPPRESS)
+	args = parser.parse_args(argv)
+
+	if args.run_one:
+		print(json.dumps(run_config(json.loads(args.run_one))))
+		return 0
+
+	ffmpeg_path = args.ffmpeg or find_tool('ffmpeg')
+	ffprobe_path = args.ffprobe or find_tool('ffprobe')
+	fixture_dir = tempfile.mkdtemp(prefix='bench-fixture-')
+	try:
+		fixture = make_fixture(ffmpeg_path, fixture_dir, args.seconds, args.height, args.codec)
+		server = start_server(fixture_dir)
+		base = {
+			'base_url': f"http://127.0.0.1:{server.server_port}",
+			'ffmpeg': ffmpeg_path,
+			'ffprobe': ffprobe_path,
+			'items': args.items,
+			'mode': args.mode,
+			'height': args.height,
+			'bitrate': args.bitrate,
+			'postprocess_workers': args.postprocess_workers,
+		}
+		results = []
+		for encoder in args.encoder:
+			for transfer in args.transfer:
+				for concurrency in args.concurrency:
+					result = run_in_child({**base, 'encoder': encoder, 'transfer': transfer, 'concurrency': concurrency})
+					print(f"{encoder} {transfer} x{concurrency}: {result.get('items_per_minute', 0):.1f} items/min", file=sys.stderr)
+					results.append(result)
+		server.shutdown()
+
+		report = {
+			'timestamp': time.time(),
+			'host': {'platform': platform.platform(), 'python': platform.python_version(), 'cpus': os.cpu_count()},
+			'fixture': {'seconds': args.seconds, 'height': args.height, 'codec': args.codec, 'bytes': os.path.getsize(fixture)},
+			'results': results,
+		}
+	finally:
+		shutil.rmtree(fixture_dir, ignore_errors=True)
+
+	if args.output:
+		with open(args.output, 'w', encoding='utf-8') as f:
+			json.dump(report, f, indent=2)
+	else:
+		print(json.dumps(report, indent=2))
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
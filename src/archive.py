@@ -0,0 +1,114 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from paths import get_data_dir
+from metadata_cache import normalize_url, info_key
+
+# job strategy for a video the archive already has, nothing is downloaded or converted
+ARCHIVED = 'archived'
+
+
+def archive_key(link, info=None):
+	"""Returns the extractor+id key for a video, without any network access where possible.
+
+	YouTube links carry their id, so they are keyed straight from the url; anything else
+	needs an extracted info dict.
+	"""
+	key = normalize_url(link)
+	if key.startswith('youtube:'):
+		return key
+	if info and info.get('extractor_key'):
+		return info_key(info)
+	return None
+
+
+def archive_variant(settings):
+	"""The same video as audio and as 720p video are different downloads, as are mp3 and native audio."""
+	if settings['media_type'] == 'audio':
+		codec = settings.get('audio_codec', 'native')
+		if codec == 'mp3':
+			return f"audio:mp3:{settings.get('audio_bitrate', '320k')}"
+		return f"audio:{codec}"
+	return f"video:{settings['resolution']}"
+
+
+def file_checksum(path, chunk_size=1024 * 1024):
+	digest = hashlib.sha256()
+	with open(path, 'rb') as f:
+		while chunk := f.read(chunk_size):
+			digest.update(chunk)
+	return digest.hexdigest()
+
+
+class DownloadArchive:
+	"""Persistent index of every finished download, keyed by extractor+video id.
+
+	Lookups are a single primary key seek on a WITHOUT ROWID table, so they cost the
+	same with a handful of entries or hundreds of thousands. An entry only counts while
+	its output file is still there with the recorded size.
+	"""
+	def __init__(self, path=None):
+		self.path = str(path or get_data_dir() / 'archive.sqlite3')
+		self.lock = threading.Lock()
+		self.db = sqlite3.connect(self.path, check_same_thread=False)
+		self.db.executescript("""
+			PRAGMA journal_mode = WAL;
+			PRAGMA synchronous = NORMAL;
+			CREATE TABLE IF NOT EXISTS archive (
+				key TEXT NOT NULL,
+				variant TEXT NOT NULL,
+				output_path TEXT NOT NULL,
+				format TEXT,
+				size INTEGER NOT NULL,
+				checksum TEXT NOT NULL,
+				added REAL NOT NULL,
+				PRIMARY KEY (key, variant)
+			) WITHOUT ROWID;
+		""")
+
+	def get(self, key, variant):
+		"""returns the archived entry if its file is still intact, otherwise None"""
+		if not key:
+			return None
+		with self.lock:
+			row = self.db.execute(
+				"SELECT output_path, format, size, checksum, added FROM archive WHERE key = ? AND variant = ?",
+				(key, variant)
+			).fetchone()
+		if row is None:
+			return None
+		entry = dict(zip(('output_path', 'format', 'size', 'checksum', 'added'), row))
+		try:
+			if os.path.getsize(entry['output_path']) == entry['size']:
+				return entry
+		except OSError:
+			pass
+		# the file was moved, deleted or replaced since, so it has to be fetched again
+		self.remove(key, variant)
+		return None
+
+	def add(self, key, variant, output_path, format=None):
+		"""records a finished download; checksums the file, so call it off the UI thread"""
+		if not key:
+			return
+		output_path = os.path.abspath(output_path)
+		size = os.path.getsize(output_path)
+		checksum = file_checksum(output_path)
+		with self.lock:
+			self.db.execute(
+				"INSERT OR REPLACE INTO archive VALUES (?, ?, ?, ?, ?, ?, ?)",
+				(key, variant, output_path, format, size, checksum, time.time())
+			)
+			self.db.commit()
+
+	def remove(self, key, variant):
+		with self.lock:
+			self.db.execute("DELETE FROM archive WHERE key = ? AND variant = ?", (key, variant))
+			self.db.commit()
+
+	def close(self):
+		with self.lock:
+			self.db.close()
@@ -0,0 +1,226 @@
+import json
+import logging
+import os
+import re
+import subprocess
+import tempfile
+import threading
+import time
+
+from paths import get_data_dir
+from media import CREATE_NO_WINDOW, HARDWARE_PIPELINES, get_encoder_args, get_hardware_args
+
+ENCODER_LINE = re.compile(r'^\s*[VAS][F.][S.][X.][B.][D.]\s+(\S+)', re.MULTILINE)
+
+# encoders the app knows how to drive, with the vendor shown in the menu
+CANDIDATE_ENCODERS = {
+	'libx264': 'CPU',
+	'h264_nvenc': 'NVIDIA',
+	'hevc_nvenc': 'NVIDIA',
+	'h264_amf': 'AMD',
+	'h264_qsv': 'Intel',
+}
+TEST_SECONDS = 2
+TEST_FPS = 30
+TEST_HEIGHT = 480  # below the test clip's 720, so the pipeline test exercises the scaler too
+VALIDATION_MAX_AGE = 7 * 24 * 3600  # drivers and hardware change more often than the binary
+
+
+def run_ffmpeg_info(ffmpeg_path: str, *args) -> str:
+	"""Runs ffmpeg with an informational flag and returns its stdout."""
+	result = subprocess.run(
+		[ffmpeg_path, '-hide_banner', *args],
+		capture_output=True,
+		text=True,
+		timeout=10,
+		check=True,
+		shell=False,
+		creationflags=CREATE_NO_WINDOW
+	)
+	return result.stdout
+
+
+def probe_capabilities(ffmpeg_path: str) -> dict:
+	"""Asks ffmpeg for its version, encoders and hardware acceleration methods."""
+	version_output = run_ffmpeg_info(ffmpeg_path, '-version')
+	encoders_output = run_ffmpeg_info(ffmpeg_path, '-encoders')
+	hwaccels_output = run_ffmpeg_info(ffmpeg_path, '-hwaccels')
+	return {
+		'version': version_output.splitlines()[0] if version_output else '',
+		# the legend above the dashed line uses the same layout, so skip it
+		'encoders': ENCODER_LINE.findall(encoders_output.split('------', 1)[-1]),
+		'hwaccels': [line.strip() for line in hwaccels_output.splitlines()[1:] if line.strip()],
+	}
+
+
+def _test_encode(ffmpeg_path: str, command: list, output: str) -> float:
+	"""Runs a test encode and returns how long it took; raises with ffmpeg's last error line."""
+	start = time.perf_counter()
+	try:
+		result = subprocess.run(
+			[ffmpeg_path, '-hide_banner', '-v', 'error', '-y'] + command + [output],
+			capture_output=True,
+			text=True,
+			timeout=30,
+			creationflags=CREATE_NO_WINDOW
+		)
+	except subprocess.TimeoutExpired:
+		raise Exception("test encode timed out")
+	elapsed = time.perf_counter() - start
+
+	if result.returncode != 0 or not os.path.isfile(output) or not os.path.getsize(output):
+		errors = result.stderr.strip().splitlines()
+		raise Exception(errors[-1] if errors else f"ffmpeg exited with {result.returncode}")
+	return elapsed
+
+
+def test_encoder(ffmpeg_path: str, encoder: str) -> float:
+	"""Encodes a short synthetic clip with the app's real arguments and returns frames per second.
+
+	Raises with ffmpeg's last error line when the encoder doesn't work on this machine,
+	e.g. an NVENC build without an NVIDIA card or driver.
+	"""
+	with tempfile.TemporaryDirectory() as temp_dir:
+		elapsed = _test_encode(ffmpeg_path, [
+			'-f', 'lavfi', '-i', f'testsrc2=size=1280x720:rate={TEST_FPS}',
+			'-t', str(TEST_SECONDS),
+		] + get_encoder_args(encoder, '2M'), os.path.join(temp_dir, f'{encoder}.mp4'))
+	return TEST_SECONDS * TEST_FPS / elapsed
+
+
+def test_pipeline(ffmpeg_path: str, encoder: str) -> float:
+	"""Runs a real H.264 clip through an encoder's full hardware pipeline and returns frames per second.
+
+	Synthetic lavfi frames never touch a decoder, so the clip is encoded in software first
+	and only the hardware decode, scale and encode are timed.
+	"""
+	with tempfile.TemporaryDirectory() as temp_dir:
+		source = os.path.join(temp_dir, 'source.mp4')
+		_test_encode(ffmpeg_path, [
+			'-f', 'lavfi', '-i', f'testsrc2=size=1280x720:rate={TEST_FPS}',
+			'-t', str(TEST_SECONDS), '-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p',
+		], source)
+		input_args, output_args = get_hardware_args(encoder, '2M', TEST_HEIGHT)
+		elapsed = _test_encode(
+			ffmpeg_path, input_args + ['-i', source] + output_args, os.path.join(temp_dir, f'{encoder}.mp4')
+		)
+	return TEST_SECONDS * TEST_FPS / elapsed
+
+
+def validate_pipelines(ffmpeg_path: str, working: list, hwaccels: list) -> dict:
+	"""Tries the full hardware pipeline of every hardware encoder that passed its own test."""
+	pipelines = {'working': [], 'rejected': {}}
+	for entry in working:
+		encoder = entry['name']
+		if (pipeline := HARDWARE_PIPELINES.get(encoder)) is None:
+			continue
+		if pipeline['hwaccel'] not in hwaccels:
+			pipelines['rejected'][encoder] = f"this ffmpeg build has no {pipeline['hwaccel']} hwaccel"
+			continue
+		try:
+			pipelines['working'].append({'name': encoder, 'fps': round(test_pipeline(ffmpeg_path, encoder), 1)})
+		except Exception as e:
+			pipelines['rejected'][encoder] = str(e)
+	return pipelines
+
+
+def has_hardware_pipeline(encoder: str, capabilities: dict) -> bool:
+	"""Whether validation proved the encoder's full hardware pipeline works on this machine."""
+	pipelines = (capabilities.get('validation') or {}).get('pipelines') or {}
+	return any(entry['name'] == encoder for entry in pipelines.get('working', []))
+
+
+def validate_encoders(ffmpeg_path: str, available: list, hwaccels: list = ()) -> dict:
+	"""Test-encodes with every candidate encoder and ranks the working ones by throughput.
+
+	Hardware encoders that work are then tried with hardware decode and scaling as well.
+	"""
+	working = []
+	rejected = {}
+	for encoder in CANDIDATE_ENCODERS:
+		if encoder not in available:
+			rejected[encoder] = "not included in this ffmpeg build"
+			continue
+		try:
+			working.append({'name': encoder, 'fps': round(test_encoder(ffmpeg_path, encoder), 1)})
+		except Exception as e:
+			rejected[encoder] = str(e)
+
+	working.sort(key=lambda entry: entry['fps'], reverse=True)
+	return {
+		'working': working,
+		'rejected': rejected,
+		'pipelines': validate_pipelines(ffmpeg_path, working, hwaccels),
+		'checked_at': time.time(),
+	}
+
+
+def get_encoder_options(capabilities: dict) -> list:
+	"""Returns the encoder menu entries, fastest working encoder first.
+
+	libx264 is always offered as the fallback, even before validation has run.
+	"""
+	working = [entry['name'] for entry in capabilities.get('validation', {}).get('working', [])]
+	if 'libx264' not in working:
+		working.append('libx264')
+	return [f"{name} ({CANDIDATE_ENCODERS[name]})" for name in working]
+
+
+class CapabilityCache:
+	"""Remembers what an ffmpeg binary can do across launches.
+
+	Entries are keyed on the binary's path, size and mtime, so replacing ffmpeg
+	invalidates them without any manual step.
+	"""
+	def __init__(self, path=None):
+		self.path = path or get_data_dir() / 'ffmpeg_capabilities.json'
+		self.lock = threading.Lock()
+		try:
+			with open(self.path, encoding='utf-8') as f:
+				self.entries = json.load(f)
+		except (OSError, ValueError):
+			self.entries = {}
+
+	@staticmethod
+	def fingerprint(ffmpeg_path):
+		stat = os.stat(ffmpeg_path)
+		return f"{os.path.abspath(ffmpeg_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+
+	def get(self, ffmpeg_path, probe=probe_capabilities):
+		"""returns cached capabilities for the binary, probing it on a miss; raises if ffmpeg is unusable"""
+		key = self.fingerprint(ffmpeg_path)
+		with self.lock:
+			if key in self.entries:
+				return self.entries[key]
+
+		capabilities = probe(ffmpeg_path)
+		self.update(ffmpeg_path, capabilities, key)
+		return capabilities
+
+	def validate(self, ffmpeg_path, force=False):
+		"""returns capabilities including a fresh encoder validation, running the test encodes if needed"""
+		capabilities = self.get(ffmpeg_path)
+		validation = capabilities.get('validation')
+		# results from before the hardware pipelines were tested don't say whether they work
+		if (force or not validation or 'pipelines' not in validation
+				or time.time() - validation['checked_at'] > VALIDATION_MAX_AGE):
+			capabilities = {**capabilities, 'validation': validate_encoders(
+				ffmpeg_path, capabilities['encoders'], capabilities.get('hwaccels', []))}
+			self.update(ffmpeg_path, capabilities)
+		return capabilities
+
+	def update(self, ffmpeg_path, capabilities, key=None):
+		"""stores capabilities for the binary and writes the cache file"""
+		key = key or self.fingerprint(ffmpeg_path)
+		with self.lock:
+			# only the current build of each binary is worth keeping
+			prefix = key.rsplit('|', 2)[0] + '|'
+			self.entries = {k: v for k, v in self.entries.items() if not k.startswith(prefix)}
+			self.entries[key] = capabilities
+			try:
+				temp_path = f"{self.path}.tmp"
+				with open(temp_path, 'w', encoding='utf-8') as f:
+					json.dump(self.entries, f, indent=1)
+				os.replace(temp_path, self.path)
+			except OSError as e:
+				logging.warning(f"Could not save ffmpeg capabilities: {e}")
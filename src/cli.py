@@ -0,0 +1,227 @@
+"""Headless command line entry point for batch downloads.
+
+Progress is streamed to stdout as JSON lines, one object per scheduler event.
+
+Exit codes:
+	0  every item finished
+	1  at least one item failed
+	2  bad arguments or no urls given
+	3  ffmpeg is missing or broken
+	130  interrupted (Ctrl+C or SIGTERM)
+"""
+import argparse
+import json
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+
+from engine import DownloadEngine, find_tool
+from transfer import TRANSFER_PROFILES, throughput_report
+
+EXIT_OK = 0
+EXIT_FAILED_ITEMS = 1
+EXIT_USAGE = 2
+EXIT_FFMPEG = 3
+EXIT_INTERRUPTED = 130
+
+
+def _interrupt(signum, frame):
+	# a terminated run cleans up exactly like Ctrl+C
+	raise KeyboardInterrupt
+
+
+def read_links(args):
+	"""collects urls from the command line and the optional url file ('-' for stdin)"""
+	links = list(args.urls)
+	if args.file:
+		handle = sys.stdin if args.file == '-' else open(args.file, encoding='utf-8')
+		with handle:
+			links.extend(line.strip() for line in handle)
+	return [link for link in links if link and not link.startswith('#')]
+
+
+def build_parser():
+	parser = argparse.ArgumentParser(description="Download YouTube videos or audio without the GUI.")
+	parser.add_argument('urls', nargs='*', help="urls to download")
+	parser.add_argument('-f', '--file', help="file with one url per line, '-' reads stdin")
+	parser.add_argument('-o', '--output', default='.', help="directory to save into")
+	parser.add_argument('-m', '--mode', choices=['audio', 'video'], default='video')
+	parser.add_argument('-r', '--resolution', type=int, default=720, help="maximum video height")
+	parser.add_argument('-b', '--bitrate', default='5M', help="video bitrate, e.g. 5M")
+	parser.add_argument('-e', '--encoder', default='libx264', help="ffmpeg video encoder")
+	parser.add_argument('--no-hwaccel', action='store_true',
+						help="decode and scale on the cpu even when the GPU pipeline passed validation")
+	parser.add_argument('-a', '--audio-codec', choices=['native', 'm4a', 'opus', 'mp3'], default='native',
+						help="audio mode output: native keeps the best stream without re-encoding")
+	parser.add_argument('--audio-bitrate', default='320k', help="bitrate when audio is re-encoded, e.g. 192k")
+	parser.add_argument('-j', '--concurrency', type=int, default=3, help="parallel downloads")
+	parser.add_argument('--postprocess-workers', type=int, help="parallel conversions")
+	parser.add_argument('-t', '--transfer', choices=list(TRANSFER_PROFILES), default='auto',
+						help="transfer profile: connections per download, chunk and buffer sizes")
+	parser.add_argument('--limit-rate', help="total download bandwidth cap in bytes per second, e.g. 5M")
+	parser.add_argument('--external-downloader', help="hand transfers to an external program, e.g. aria2c")
+	parser.add_argument('--ffmpeg', help="path to the ffmpeg binary")
+	parser.add_argument('--ffprobe', help="path to the ffprobe binary")
+	parser.add_argument('--no-cache', action='store_true', help="don't use the on-disk metadata cache")
+	parser.add_argument('--no-journal', action='store_true', help="don't resume or record job state")
+	parser.add_argument('--no-archive', action='store_true',
+						help="download again even if the download archive already has the video")
+	parser.add_argument('--failure-report', help="where to write the failure report (default: app data folder)")
+	parser.add_argument('--metrics-file', help="write the batch summary with stage timings and counters as JSON")
+	parser.add_argument('--metrics-port', type=int,
+						help="serve Prometheus metrics on http://127.0.0.1:PORT/metrics while the batch runs")
+	parser.add_argument('--progress-interval', type=float, default=1.0,
+						help="seconds between aggregate progress lines, 0 disables them")
+	parser.add_argument('--probe-encoders', action='store_true',
+						help="test-encode with every candidate encoder, print the report and exit")
+	return parser
+
+
+def emit(event):
+	sys.stdout.write(json.dumps(event, default=str) + '\n')
+	sys.stdout.flush()
+
+
+def probe_encoders(args):
+	"""prints which encoders actually work on this machine, fastest first"""
+	from capabilities import CapabilityCache
+	engine_ffmpeg = args.ffmpeg or find_tool('ffmpeg')
+	try:
+		capabilities = CapabilityCache().validate(engine_ffmpeg, force=True)
+	except Exception as e:
+		emit({'status': 'error', 'error': str(e)})
+		return EXIT_FFMPEG
+	emit({'status': 'encoders', 'version': capabilities['version'], **capabilities['validation']})
+	return EXIT_OK
+
+
+def main(argv=None):
+	parser = build_parser()
+	args = parser.parse_args(argv)
+	if args.probe_encoders:
+		return probe_encoders(args)
+
+	links = read_links(args)
+	if not links:
+		parser.print_usage(sys.stderr)
+		return EXIT_USAGE
+
+	metadata_cache = None
+	if not args.no_cache:
+		from metadata_cache import MetadataCache
+		metadata_cache = MetadataCache()
+
+	journal = None
+	if not args.no_journal:
+		from journal import JobJournal
+		journal = JobJournal()
+
+	archive = None
+	if not args.no_archive:
+		from archive import DownloadArchive
+		archive = DownloadArchive()
+
+	from network import NetworkGovernor
+	from media import parse_bitrate
+	try:
+		bandwidth = parse_bitrate(args.limit_rate) if args.limit_rate else None
+	except ValueError:
+		parser.error(f"invalid --limit-rate: {args.limit_rate}")
+
+	from metrics import Metrics
+	metrics = Metrics(enabled=bool(args.metrics_file or args.metrics_port))
+	if args.metrics_port:
+		metrics.serve(args.metrics_port)
+
+	engine = DownloadEngine(
+		ffmpeg_path=args.ffmpeg,
+		ffprobe_path=args.ffprobe,
+		download_workers=args.concurrency,
+		postprocess_workers=args.postprocess_workers,
+		metadata_cache=metadata_cache,
+		journal=journal,
+		transfer=args.transfer,
+		external_downloader=args.external_downloader,
+		archive=archive,
+		governor=NetworkGovernor(bandwidth=bandwidth),
+		metrics=metrics
+	)
+	try:
+		engine.check_ffmpeg()
+	except Exception as e:
+		emit({'status': 'error', 'error': str(e)})
+		return EXIT_FFMPEG
+
+	os.makedirs(args.output, exist_ok=True)
+	settings = {
+		'media_type': args.mode,
+		'directory': os.path.abspath(args.output),
+		'resolution': args.resolution,
+		'bitrate': args.bitrate,
+		'encoder': args.encoder,
+		'hwaccel': 'off' if args.no_hwaccel else 'auto',
+		'audio_codec': args.audio_codec,
+		'audio_bitrate': args.audio_bitrate,
+	}
+	result = {}
+	worker = threading.Thread(
+		target=lambda: result.setdefault('jobs', engine.run(links, settings)),
+		daemon=True
+	)
+	worker.start()
+
+	last_progress = time.monotonic()
+	progress_version = None
+	if threading.current_thread() is threading.main_thread():
+		signal.signal(signal.SIGTERM, _interrupt)
+	try:
+		while worker.is_alive() or not engine.events.empty():
+			try:
+				emit(engine.events.get(timeout=0.2))
+			except queue.Empty:
+				pass
+			if args.progress_interval and time.monotonic() - last_progress >= args.progress_interval:
+				last_progress = time.monotonic()
+				snapshot = engine.progress.snapshot()
+				if snapshot['version'] != progress_version:
+					progress_version = snapshot['version']
+					emit({'status': 'progress', **snapshot})
+	except KeyboardInterrupt:
+		# kills ffmpeg and waits for the workers, so no half written output is left behind
+		engine.shutdown(wait=True)
+		emit({'status': 'interrupted'})
+		return EXIT_INTERRUPTED
+
+	jobs = result.get('jobs', [])
+	failed = [job for job in jobs if job.status != 'done']
+	report = None
+	if any(job.failures for job in jobs):
+		from retry import write_failure_report
+		try:
+			report = write_failure_report(jobs, args.failure_report)
+		except OSError as e:
+			emit({'status': 'error', 'error': f"Could not save failure report: {e}"})
+	summary = None
+	if args.metrics_file:
+		from metrics import write_batch_summary
+		try:
+			summary = write_batch_summary(jobs, metrics, args.metrics_file)
+		except OSError as e:
+			emit({'status': 'error', 'error': f"Could not save metrics: {e}"})
+	emit({
+		'status': 'batch_finished',
+		'total': len(jobs),
+		'failed': len(failed),
+		'transfer': throughput_report(jobs),
+		'failure_report': report,
+		'metrics_file': summary,
+	})
+	engine.shutdown()
+	return EXIT_FAILED_ITEMS if failed or not jobs else EXIT_OK
+
+
+if __name__ == "__main__":
+	sys.exit(main())
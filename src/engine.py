@@ -0,0 +1,521 @@
+import os
+import re
+import logging
+import shutil
+import threading
+import time
+import uuid
+import yt_dlp
+
+from paths import get_base_path
+from scheduler import Job, JobScheduler
+from capabilities import CapabilityCache, has_hardware_pipeline
+from progress import ProgressAggregator
+from transfer import resolve_transfer, get_transfer_options
+from playlists import is_collection_url, iter_collection
+from network import GovernedYoutubeDL, METADATA, BULK
+from metadata_cache import normalize_url
+from archive import ARCHIVED, archive_key, archive_variant
+from metrics import Metrics
+from transcode import TranscodeExecutor, TranscodeCancelled
+from retry import RetryPolicy, ConversionError, classify, ENCODER, EXPIRED
+from media import (
+	probe_media, choose_video_strategy, get_encoder_args, get_hardware_args, get_scale_filter, AUDIO_ARGS,
+	HARDWARE_PIPELINES,
+	get_audio_format, guess_audio_probe, choose_audio_output,
+	REMUX, COPY_VIDEO, TRANSCODE
+)
+
+# Settings every job carries:
+#   media_type  "audio" or "video"
+#   directory   folder the finished files are written to
+#   resolution  maximum video height, e.g. 720
+#   bitrate     ffmpeg style video bitrate, e.g. "5M"
+#   encoder     ffmpeg video encoder name, e.g. "libx264"
+#   hwaccel     "auto" decodes and scales on the GPU too when validation proved it works, "off" never does
+#   audio_codec    "native" keeps the best audio stream as-is, "m4a", "opus" or "mp3" convert to that
+#   audio_bitrate  bitrate for audio that does have to be re-encoded, e.g. "320k"
+DEFAULT_SETTINGS = {
+	'media_type': 'video',
+	'directory': '.',
+	'resolution': 720,
+	'bitrate': '5M',
+	'encoder': 'libx264',
+	'hwaccel': 'auto',
+	'audio_codec': 'native',
+	'audio_bitrate': '320k',
+}
+
+# how many jobs per download worker are queued ahead while a playlist is still being listed
+QUEUE_AHEAD = 4
+
+
+def find_tool(name: str) -> str:
+	"""Finds the bundled ffmpeg/ffprobe binary, falling back to one on PATH."""
+	bundled = get_base_path() / 'ffmpeg'
+	for candidate in (bundled / f'{name}.exe', bundled / name):
+		if candidate.is_file():
+			return str(candidate)
+	return shutil.which(name) or str(bundled / f'{name}.exe')
+
+
+def extract_link_info(link: str, governor=None, priority=METADATA) -> dict:
+	"""Extracts a single video's info without resolving formats or downloading anything."""
+	with GovernedYoutubeDL({'quiet': True, 'noplaylist': True}, governor, priority) as ydl:
+		return ydl.extract_info(link, download=False, process=False)
+
+
+def sanitize_filename(filename: str) -> str:
+	"""Sanitizes a filename by removing invalid characters and limiting length."""
+	filename = re.sub(r'[\\/*?:"<>|]', '', filename)
+	filename = filename.encode('ascii', 'ignore').decode('ascii')
+	return filename.strip()[:120]
+
+
+class DownloadEngine:
+	"""Headless download pipeline shared by the GUI and the command line.
+
+	Owns the job scheduler and the download/postprocess stages. Nothing in here
+	touches Tk; progress is published as dicts on ``self.events``.
+	"""
+	def __init__(self, ffmpeg_path=None, ffprobe_path=None, download_workers=3,
+				 postprocess_workers=None, metadata_cache=None, capabilities=None, journal=None, events=None,
+				 transfer='auto', external_downloader=None, archive=None, governor=None, retry_policy=None,
+				 prefetcher=None, metrics=None, encoder_limits=None):
+		self.ffmpeg_path = ffmpeg_path or find_tool('ffmpeg')
+		self.ffprobe_path = ffprobe_path or find_tool('ffprobe')
+		self.transcoder = TranscodeExecutor(self.ffmpeg_path, encoder_limits)
+		self.metadata_cache = metadata_cache
+		self.capabilities = capabilities or CapabilityCache()
+		self.transfer = transfer
+		self.external_downloader = external_downloader
+		if postprocess_workers is None:
+			# a thread for every job the run window lets in, so a job waiting for a libx264 slot
+			# never keeps a remux or an nvenc encode from starting; the executor's caps decide what runs
+			postprocess_workers = max(download_workers * QUEUE_AHEAD, sum(self.transcoder.limits.values()))
+		self.scheduler = JobScheduler(
+			download_workers=download_workers,
+			postprocess_workers=postprocess_workers,
+			audio_workers=postprocess_workers,
+			events=events
+		)
+		self.events = self.scheduler.events
+		self.progress = ProgressAggregator()
+		self.scheduler.listeners.append(self.progress.on_status)
+		self.journal = journal
+		if journal:
+			self.scheduler.listeners.append(journal.record)
+		self.archive = archive
+		self.governor = governor
+		self.retry_policy = retry_policy or RetryPolicy()
+		self.prefetcher = prefetcher
+		# disabled unless the caller passes one in, the hooks below are then no-ops
+		self.metrics = metrics or Metrics(enabled=False)
+		if self.metrics.enabled:
+			self.scheduler.listeners.append(self.metrics.record_job)
+			if metadata_cache:
+				self.metrics.add_collector(lambda: {
+					f'metadata_cache_{name}': value for name, value in metadata_cache.stats().items()
+				})
+		# output paths picked by running conversions, so two same-titled videos never share one
+		self.reserved_outputs = set()
+		self.output_lock = threading.Lock()
+		# ids stay in here only until the job has failed, the journal hands a requeued link its old id
+		self.cancelled_jobs = set()
+		self.scheduler.listeners.append(self._forget_cancelled)
+		self.stopping = threading.Event()
+
+	def check_ffmpeg(self):
+		"""raises if the ffmpeg binary is missing or doesn't run; returns its cached capabilities"""
+		if not os.path.isfile(self.ffmpeg_path):
+			raise FileNotFoundError(f"FFmpeg not found at {self.ffmpeg_path}")
+		return self.capabilities.get(self.ffmpeg_path)
+
+	def run(self, links, settings, link_info=None, transfer=None):
+		"""downloads every link with the given settings and returns the finished jobs
+
+		Playlist and channel links are expanded into their videos while the batch runs,
+		so the first downloads start before the whole list has been enumerated.
+		``transfer`` picks a transfer profile for this batch instead of the engine's default.
+		"""
+		settings = {**DEFAULT_SETTINGS, **settings}
+		link_info = link_info or {}
+		streaming = any(is_collection_url(link) for link in links)
+		jobs = self._expand(links, settings, link_info)
+		if not streaming:
+			# everything is known up front, so progress can count the whole batch from the start
+			jobs = list(jobs)
+		self.progress.reset([] if streaming else [job.id for job in jobs])
+
+		# connections are shared out between the downloads that can actually run together
+		streams = self.scheduler.download_workers if streaming else min(self.scheduler.download_workers, len(links))
+		resolved = resolve_transfer(transfer or self.transfer, streams, self.external_downloader)
+
+		seen = []
+		def pending():
+			for job in jobs:
+				seen.append(job)
+				if job.error:
+					self.scheduler.emit(job, 'failed', error=job.error)
+					continue
+				if job.status == 'done' and job.output_path and os.path.isfile(job.output_path):
+					self.scheduler.emit(job, 'done', output=job.output_path, skipped=True)
+					continue
+				# checked before anything touches the network
+				job.key = archive_key(job.link, job.info)
+				if self._find_archived(job) and not job.archived_copy:
+					self.scheduler.emit(job, 'done', output=job.output_path, strategy=ARCHIVED, skipped=True)
+					continue
+				# an archived file that has to be copied goes through the pools, which do the copy
+				job.transfer = resolved
+				yield job
+
+		self.scheduler.run(pending(), self._retrying('download', self.download),
+						   self._retrying('postprocess', self.postprocess),
+						   window=self.scheduler.download_workers * QUEUE_AHEAD)
+		return seen
+
+	def _expand(self, links, settings, link_info):
+		"""yields a job per video, expanding playlists and channels lazily and skipping duplicates"""
+		queued = set()
+
+		def make_job(url, info=None, parent=None):
+			key = normalize_url(url)
+			if key in queued:
+				return None
+			queued.add(key)
+			job = Job(url, settings, info=info, parent=parent)
+			if self.journal:
+				self.journal.restore(job)
+			return job
+
+		for link in links:
+			if not is_collection_url(link):
+				if job := make_job(link, link_info.get(link)):
+					yield job
+				continue
+
+			try:
+				for entry in iter_collection(link, self.governor):
+					if job := make_job(entry['url'], entry, link):
+						yield job
+			except Exception as e:
+				# whatever was listed before the error still downloads
+				job = Job(link, settings)
+				job.error = f"Could not list playlist: {e}"
+				yield job
+
+	def cancel(self):
+		self.scheduler.cancel()
+
+	def cancel_job(self, job_id):
+		"""stops one job: its download at the next progress update, or its running (or waiting)
+		conversion; the job then fails as cancelled and stays in the queue"""
+		self.cancelled_jobs.add(job_id)
+		self.transcoder.cancel(job_id)
+
+	def pause_job(self, job_id):
+		"""suspends a job's running conversion, returns False when it isn't converting"""
+		return self.transcoder.pause(job_id)
+
+	def resume_job(self, job_id):
+		return self.transcoder.resume(job_id)
+
+	def _forget_cancelled(self, job):
+		if job.status in ('done', 'failed'):
+			self.cancelled_jobs.discard(job.id)
+
+	def _check_cancelled(self, job):
+		if self.stopping.is_set() or job.id in self.cancelled_jobs:
+			raise RuntimeError("Cancelled")
+
+	def shutdown(self, wait=False):
+		"""stops the batch, kills every ffmpeg and closes the stores
+
+		With ``wait`` the worker threads are joined first, so the killed conversions have
+		removed their partial outputs and nothing still writes to the stores once they close.
+		"""
+		self.stopping.set()
+		self.scheduler.cancel()
+		self.transcoder.shutdown()
+		self.scheduler.shutdown(wait)
+		if self.metadata_cache:
+			self.metadata_cache.close()
+		if self.journal:
+			self.journal.close()
+		if self.archive:
+			self.archive.close()
+
+	def _retrying(self, stage, func):
+		"""wraps a pipeline stage so transient failures are retried after a jittered backoff"""
+		def run(job):
+			attempt = 0
+			while True:
+				try:
+					self._check_cancelled(job)
+					return func(job)
+				except TranscodeCancelled:
+					raise
+				except Exception as e:
+					# a cancelled download surfaces as whatever yt-dlp wrapped the hook's error in
+					self._check_cancelled(job)
+					attempt += 1
+					category = classify(e)
+					job.failures.append({'stage': stage, 'category': category, 'error': str(e), 'attempt': attempt})
+					if not self.retry_policy.should_retry(category, attempt):
+						raise
+					self.metrics.count('retries_total', stage=stage, category=category)
+					delay = self.retry_policy.delay(category, attempt)
+					logging.warning(f"{stage} of {job.title or job.link} failed ({category}), retrying in {delay:.1f}s: {e}")
+					if category == EXPIRED:
+						# stream urls are signed and time limited, only a fresh extraction helps
+						job.info = None
+						job.refresh_info = True
+					if self.scheduler.cancelled.wait(delay):
+						raise
+		return run
+
+	def _find_archived(self, job):
+		"""points the job at an intact earlier download of the same video, if the archive has one
+
+		An earlier download saved to another folder is hardlinked into this batch's folder,
+		so the file always ends up where the user asked for it. Across drives, where a
+		hardlink can't be made, ``job.archived_copy`` is set instead and the postprocess
+		stage copies the file, so a large copy never holds up queueing the batch.
+		"""
+		if not self.archive or not (entry := self.archive.get(job.key, archive_variant(job.settings))):
+			return False
+		output_path = entry['output_path']
+		directory = os.path.abspath(job.settings['directory'])
+		if os.path.dirname(output_path) != directory:
+			target = os.path.join(directory, os.path.basename(output_path))
+			try:
+				if os.path.exists(target):
+					# the same file from an earlier batch, or another file that just shares the name
+					if os.path.getsize(target) != entry['size']:
+						return False
+				else:
+					os.makedirs(directory, exist_ok=True)
+					try:
+						os.link(output_path, target)
+					except OSError:
+						job.archived_copy = output_path
+			except OSError as e:
+				logging.warning(f"Could not bring the archived {output_path} over, downloading again: {e}")
+				return False
+			output_path = target
+		job.output_path = output_path
+		job.strategy = ARCHIVED
+		self.metrics.count('archive_hits_total')
+		return True
+
+	def _reserve_output(self, job, ext):
+		"""picks the output path: the title, or the title plus video id if that name is already taken"""
+		directory = job.settings['directory']
+		video_id = (job.key or job.id).split(':')[-1]
+		names = [f'{job.title}.{ext}', f'{job.title} [{video_id}].{ext}']
+		with self.output_lock:
+			attempt = 2
+			while True:
+				for name in names:
+					path = os.path.join(directory, name)
+					if path not in self.reserved_outputs and not os.path.exists(path):
+						self.reserved_outputs.add(path)
+						return path
+				names = [f'{job.title} [{video_id}] ({attempt}).{ext}']
+				attempt += 1
+
+	def _get_info(self, link):
+		if self.prefetcher:
+			# joins a prefetch of the same video that's still running instead of extracting twice
+			return self.prefetcher.get(link, need_formats=True)
+		if self.metadata_cache:
+			return self.metadata_cache.get_or_extract(link, self._extract, need_formats=True)
+		return self._extract(link)
+
+	def _extract(self, link):
+		self.metrics.count('extractions_total')
+		return extract_link_info(link, self.governor)
+
+	def download(self, job):
+		"""fetches the source streams for a job without converting them"""
+		if job.strategy == ARCHIVED:
+			return
+		if not job.link.startswith(('http://', 'https://')):
+			raise ValueError("Invalid URL")
+
+		# the source already finished downloading in an earlier run
+		if job.source_path and os.path.isfile(job.source_path):
+			return
+
+		settings = job.settings
+		info = job.info
+		started = time.perf_counter()
+		# flat search entries only carry id/title, so they still need a real extraction
+		if job.refresh_info:
+			info = self._extract(job.link)
+			if self.metadata_cache:
+				self.metadata_cache.put(info, url=job.link)
+		elif not info or not info.get('formats'):
+			info = self._get_info(job.link)
+		job.timings['extract'] = time.perf_counter() - started
+		job.duration = info.get('duration')
+		job.title = sanitize_filename(info.get('title', 'untitled')) or str(uuid.uuid4())[:8]
+		# other sites only reveal their video id once extracted
+		job.key = job.key or archive_key(job.link, info)
+		if self._find_archived(job):
+			return
+
+		download_started = time.perf_counter()
+		merge_started = []
+
+		def track_progress(data):
+			# the only place a running download can be stopped from
+			self._check_cancelled(job)
+			self.progress.on_download(job.id, data)
+			if job.ttfb is None and data.get('downloaded_bytes'):
+				job.ttfb = time.perf_counter() - download_started
+			if data['status'] == 'finished':
+				job.bytes_downloaded += data.get('total_bytes') or data.get('downloaded_bytes') or 0
+			if data.get('tmpfilename') and data['tmpfilename'] != job.partial_path:
+				job.partial_path = data['tmpfilename']
+				if self.journal:
+					self.journal.record(job)
+
+		def track_merge(data):
+			if data.get('postprocessor') != 'Merger':
+				return
+			if data['status'] == 'started':
+				merge_started.append(time.perf_counter())
+			elif data['status'] == 'finished' and merge_started:
+				job.timings['merge'] = time.perf_counter() - merge_started[0]
+
+		# the job id survives restarts through the journal, so yt-dlp picks up any .part file
+		# left by an earlier run, and two jobs with the same title never share a source file
+		ydl_opts = {
+			'ffmpeg_location': self.ffmpeg_path,
+			'outtmpl': os.path.join(settings['directory'], f'{job.title} [{job.id}].source.%(ext)s'),
+			'continuedl': True,
+			'progress_hooks': [track_progress],
+			'postprocessor_hooks': [track_merge],
+			'quiet': True,
+			'noprogress': True,
+			**get_transfer_options(job.transfer or resolve_transfer()),
+		}
+		if settings['media_type'] == "audio":
+			ydl_opts['format'] = get_audio_format(settings.get('audio_codec', 'native'))
+		else:
+			ydl_opts.update({
+				# prefer streams that can be remuxed as-is before falling back to anything but av1
+				'format': (
+					f"bestvideo[height<={settings['resolution']}][vcodec^=avc1]+bestaudio[acodec^=mp4a]/"
+					f"bestvideo[height<={settings['resolution']}][vcodec!^=av01]+bestaudio/best"
+				),
+				'merge_output_format': 'mkv',
+			})
+
+		with GovernedYoutubeDL(ydl_opts, self.governor, BULK) as ydl:
+			# reuses the already extracted info instead of fetching the page a second time
+			info = ydl.process_ie_result(yt_dlp.YoutubeDL.sanitize_info(info, remove_private_keys=True), download=True)
+			downloads = info.get('requested_downloads') or [info]
+			job.source_path = downloads[0].get('filepath') or ydl.prepare_filename(info)
+			job.format_id = info.get('format_id')
+		job.timings['download'] = time.perf_counter() - download_started - job.timings.get('merge', 0)
+
+	def postprocess(self, job):
+		"""converts a downloaded source into the final audio file or mp4"""
+		if job.strategy == ARCHIVED:
+			if job.archived_copy:
+				started = time.perf_counter()
+				temp_path = f"{job.output_path}.part"
+				shutil.copy2(job.archived_copy, temp_path)
+				os.replace(temp_path, job.output_path)
+				job.timings['copy'] = time.perf_counter() - started
+			return
+		settings = job.settings
+		started = time.perf_counter()
+		probe = {}
+		if settings['media_type'] == "audio":
+			try:
+				probe = probe_media(self.ffprobe_path, job.source_path)
+			except Exception as e:
+				logging.warning(f"Probe failed, going by the source extension: {e}")
+				probe = guess_audio_probe(job.source_path)
+			# the native stream is only copied into a plain container, mp3 and friends are re-encoded
+			job.strategy, extension, args = choose_audio_output(
+				probe, settings.get('audio_codec', 'native'), settings.get('audio_bitrate', '320k'))
+			job.output_path = self._reserve_output(job, extension)
+			attempts = [(None, [], args)]
+		else:
+			job.output_path = self._reserve_output(job, 'mp4')
+			try:
+				probe = probe_media(self.ffprobe_path, job.source_path)
+				job.strategy = choose_video_strategy(probe, settings['resolution'], settings['bitrate'])
+			except Exception as e:
+				logging.warning(f"Probe failed, transcoding: {e}")
+				job.strategy = TRANSCODE
+
+			streams = ['-map', '0:v:0', '-map', '0:a:0?']
+			if job.strategy == REMUX:
+				attempts = [(None, [], streams + ['-c', 'copy', '-movflags', '+faststart'])]
+			elif job.strategy == COPY_VIDEO:
+				attempts = [(None, [], streams + ['-c:v', 'copy', '-movflags', '+faststart'] + AUDIO_ARGS)]
+			else:
+				attempts = [
+					(encoder, input_args, streams + args + AUDIO_ARGS)
+					for encoder, input_args, args in self._transcode_chain(settings)
+				]
+
+		try:
+			for number, (encoder, input_args, args) in enumerate(attempts, 1):
+				try:
+					self._convert(job, args, probe.get('duration') or job.duration, input_args)
+				except ConversionError as e:
+					if number == len(attempts):
+						raise
+					self.metrics.count('encoder_fallbacks_total', encoder=encoder)
+					job.failures.append({'stage': 'postprocess', 'category': ENCODER, 'error': str(e),
+										 'attempt': number, 'encoder': encoder})
+					logging.warning(f"{encoder} failed on {job.title}, trying {attempts[number][0]}: {e}")
+					continue
+				job.encoder = encoder
+				break
+			os.remove(job.source_path)
+			job.timings['convert'] = time.perf_counter() - started
+			if self.archive:
+				self.archive.add(job.key, archive_variant(settings), job.output_path, job.format_id)
+		finally:
+			with self.output_lock:
+				self.reserved_outputs.discard(job.output_path)
+
+	def _transcode_chain(self, settings):
+		"""Returns (encoder, input args, output args) for every way to transcode, best first.
+
+		A failing attempt falls through to the next one on the same source: the chosen
+		encoder's full hardware pipeline when validation proved it works, then the chosen
+		encoder with software decode and scaling, then every other encoder that passed
+		validation (fastest first), then libx264.
+		"""
+		try:
+			capabilities = self.capabilities.get(self.ffmpeg_path)
+		except Exception:
+			capabilities = {}
+		encoder = settings['encoder']
+		height = settings['resolution']
+		chain = []
+		if settings.get('hwaccel', 'auto') == 'auto' and has_hardware_pipeline(encoder, capabilities):
+			input_args, args = get_hardware_args(encoder, settings['bitrate'], height)
+			chain.append((f"{encoder}+{HARDWARE_PIPELINES[encoder]['hwaccel']}", input_args, args))
+
+		working = [entry['name'] for entry in (capabilities.get('validation') or {}).get('working', [])]
+		for name in dict.fromkeys([encoder, *working, 'libx264']):
+			chain.append((name, [], ['-vf', get_scale_filter(height)] + get_encoder_args(name, settings['bitrate'])))
+		return chain
+
+	def _convert(self, job, args, duration=None, input_args=None):
+		self._check_cancelled(job)
+
+		def on_progress(progress):
+			if progress['percent'] is not None:
+				self.progress.on_convert(job.id, progress['percent'])
+		self.transcoder.run(job.id, job.source_path, args, job.output_path, duration, on_progress, input_args)
@@ -0,0 +1,129 @@
+import json
+import sqlite3
+import threading
+import time
+
+from paths import get_data_dir
+from metadata_cache import normalize_url
+
+TERMINAL = ('done',)
+QUEUED = ''  # settings of a link that is queued in the GUI but no batch has run yet
+
+
+class JobJournal:
+	"""Crash-safe SQLite record of every job's state so a batch can pick up where it stopped.
+
+	A job is identified by its normalized url plus the exact settings it ran with, so
+	re-queuing the same link with the same settings finds its earlier progress while a
+	different resolution or save location starts fresh. Links are also recorded the
+	moment they're queued, before any settings are picked, so a queue that never
+	started survives a crash or a closed window too.
+	"""
+	def __init__(self, path=None, max_age=30 * 24 * 3600):
+		self.path = str(path or get_data_dir() / 'journal.sqlite3')
+		self.lock = threading.Lock()
+		self.db = sqlite3.connect(self.path, check_same_thread=False)
+		self.db.executescript("""
+			PRAGMA journal_mode = WAL;
+			PRAGMA synchronous = NORMAL;
+			CREATE TABLE IF NOT EXISTS jobs (
+				key TEXT NOT NULL,
+				settings TEXT NOT NULL,
+				link TEXT NOT NULL,
+				id TEXT NOT NULL,
+				status TEXT NOT NULL,
+				title TEXT,
+				partial_path TEXT,
+				source_path TEXT,
+				output_path TEXT,
+				error TEXT,
+				updated REAL NOT NULL,
+				parent TEXT,
+				PRIMARY KEY (key, settings)
+			);
+		""")
+		# journals written before playlists were expanded lack the parent column
+		columns = {row[1] for row in self.db.execute("PRAGMA table_info(jobs)")}
+		if 'parent' not in columns:
+			self.db.execute("ALTER TABLE jobs ADD COLUMN parent TEXT")
+		self.prune(max_age)
+
+	@staticmethod
+	def _settings_key(settings):
+		return json.dumps(settings, sort_keys=True, default=str)
+
+	def record(self, job):
+		"""writes the job's current state; called on every status change"""
+		with self.lock:
+			self.db.execute(
+				"INSERT OR REPLACE INTO jobs "
+				"(key, settings, link, id, status, title, partial_path, source_path, output_path, error, updated, parent) "
+				"VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+				(
+					normalize_url(job.link), self._settings_key(job.settings), job.link, job.id,
+					job.status, job.title, job.partial_path, job.source_path, job.output_path,
+					job.error, time.time(), job.parent
+				)
+			)
+			self.db.commit()
+
+	def queue(self, link, title=None):
+		"""records a link added to the queue; the batch that runs it records its jobs separately"""
+		with self.lock:
+			self.db.execute(
+				"INSERT OR REPLACE INTO jobs (key, settings, link, id, status, title, updated) "
+				"VALUES (?, ?, ?, '', 'queued', ?, ?)",
+				(normalize_url(link), QUEUED, link, title, time.time())
+			)
+			self.db.commit()
+
+	def restore(self, job):
+		"""fills a new job in from an earlier run with the same link and settings, if there was one"""
+		with self.lock:
+			row = self.db.execute(
+				"SELECT id, status, title, partial_path, source_path, output_path FROM jobs WHERE key = ? AND settings = ?",
+				(normalize_url(job.link), self._settings_key(job.settings))
+			).fetchone()
+		if row is None:
+			return False
+		job.id, job.status, job.title, job.partial_path, job.source_path, job.output_path = row
+		return True
+
+	def pending(self):
+		"""returns (link, title) for every job that never finished, oldest first
+
+		Videos from a playlist or channel come back as the playlist's url (without a title)
+		so it is queued once and expanded again rather than as every unfinished video.
+		"""
+		with self.lock:
+			rows = self.db.execute(
+				f"SELECT link, title, parent FROM jobs WHERE status NOT IN ({','.join('?' * len(TERMINAL))}) ORDER BY updated",
+				TERMINAL
+			).fetchall()
+		seen = set()
+		pending = []
+		for link, title, parent in rows:
+			link, title = (parent, None) if parent else (link, title)
+			if link not in seen:
+				seen.add(link)
+				pending.append((link, title))
+		return pending
+
+	def forget(self, link):
+		"""drops every unfinished entry for a link or playlist, e.g. when the user removes it from the queue"""
+		with self.lock:
+			self.db.execute(
+				f"DELETE FROM jobs WHERE (key = ? OR parent = ?) AND status NOT IN ({','.join('?' * len(TERMINAL))})",
+				(normalize_url(link), link, *TERMINAL)
+			)
+			self.db.commit()
+
+	def prune(self, max_age):
+		"""drops entries that haven't changed for ``max_age`` seconds"""
+		with self.lock:
+			self.db.execute("DELETE FROM jobs WHERE updated < ?", (time.time() - max_age,))
+			self.db.commit()
+
+	def close(self):
+		with self.lock:
+			self.db.close()
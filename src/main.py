@@ -1,141 +1,51 @@
-import sys
-import re
 import os
-import subprocess
-import requests
-import uuid
 import logging
 import time
 import threading
-import yt_dlp
 import queue
-from packaging import version
-from pathlib import Path
 from customtkinter import (
 	set_default_color_theme, CTk, CTkFrame, CTkLabel, CTkButton,
 	CTkEntry, CTkScrollableFrame, CTkProgressBar, CTkOptionMenu,
 	CTkFont, CTkToplevel, CTkImage
 )
 from tkinter import filedialog, messagebox, StringVar
-from PIL import Image, ImageDraw  
-import io
-from concurrent.futures import ThreadPoolExecutor
-
-def detect_gpu(ffmpeg_path: str) -> str:
-	"""Detects the available GPU and returns its type."""
-	try:
-		result = subprocess.run(
-			[ffmpeg_path, '-hide_banner', '-encoders'],
-			capture_output=True,
-			text=True,
-			timeout=10,
-			check=True,
-			shell=False,
-			env={'PATH': os.environ['PATH']},
-			creationflags=subprocess.CREATE_NO_WINDOW
-		)
-		encoders = result.stdout.lower()
-
-		if 'amf' in encoders or 'h264_amf' in encoders or 'hevc_amf' in encoders:
-			print("Detected GPU: AMD")
-			return 'amd'
-		if 'nvenc' in encoders or 'cuda' in encoders:
-			print("Detected GPU: NVIDIA")
-			return 'nvidia'
-		if 'qsv' in encoders or 'h264_qsv' in encoders or 'hevc_qsv' in encoders:
-			print("Detected GPU: Intel")
-			return 'intel'
-
-		print("No GPU encoder found, defaulting to CPU")
-		return 'cpu'
-	except subprocess.TimeoutExpired as e:
-			logging.critical("FFmpeg detection timed out")
-			raise
-
-def sanitize_filename(filename: str) -> str:
-	"""Sanitizes a filename by removing invalid characters and limiting length."""
-	filename = re.sub(r'[\\/*?:"<>|]', '', filename)
-	filename = filename.encode('ascii', 'ignore').decode('ascii')
-	return filename.strip()[:120]
-
-class UpdateHandler:
-	"""Handles application updates by checking and downloading the latest version."""
-	def __init__(self):
-		self.current_version = self.get_current_version()
-		self.repo_owner = "SleepyTK"
-		self.repo_name = "YoutubeDownloader"
-		self.exe_name = "YouTube_Downloader.exe"
-
-	def get_current_version(self):
-		"""Gets the current version from the version file."""
-		try:
-			base_path = Path(sys._MEIPASS)
-		except AttributeError:
-			base_path = Path(os.path.dirname(__file__))
-		
-		version_file = base_path / "version.txt"
-		return version_file.read_text().strip()
-
-	def check_update(self):
-		"""Checks for updates by querying the GitHub API."""
-		try:
-			response = requests.get(
-				f"https://api.github.com/repos/{self.repo_owner}/{self.repo_name}/releases/latest",
-				timeout=5
-			)
-			if response.status_code == 200:
-				latest_data = response.json()
-				latest_version_str = latest_data['tag_name']
-				latest_version = version.parse(latest_version_str.lstrip('v'))
-				current_version = version.parse(self.current_version)
-				print(f"Current Version: {current_version}")
-				print(f"Latest Version: {latest_version}")
-				
-				if latest_version > current_version:
-					return {
-						'url': latest_data['assets'][1]['browser_download_url'],
-						'version': latest_version_str
-					}
-		except Exception as e:
-			logging.error(f"Update check failed: {e}")
-		return None
-
-	def perform_update(self, download_url):
-		"""Downloads and replaces the current executable with the latest version."""
-		try:
-			temp_exe = Path(os.environ['TEMP']) / "update_temp.exe"
-			response = requests.get(download_url)
-			if response.status_code != 200:
-				raise Exception(f"Download failed with status {response.status_code}")
-			temp_exe.write_bytes(response.content)
-
-			import textwrap
-			bat_script = textwrap.dedent(f"""
-				@echo off
-				timeout /t 1 /nobreak >nul
-				del /F /Q "{sys.executable}"
-				move /Y "{temp_exe}" "{sys.executable}"
-				start "" "{sys.executable}"
-				del %0
-			""")
-
-			script_path = Path(os.environ['TEMP']) / "updater.bat"
-			script_path.write_text(bat_script)
-
-			subprocess.Popen(
-				['cmd.exe', '/C', str(script_path)],
-				shell=True,
-				creationflags=subprocess.CREATE_NO_WINDOW
-			)
-			return True
-		except Exception as e:
-			messagebox.showerror("Update Error", f"Failed to update: {str(e)}")
-			return False
+from PIL import Image
+from metadata_cache import MetadataCache, normalize_url
+from engine import DownloadEngine, find_tool
+from prefetch import MetadataPrefetcher
+from journal import JobJournal
+from archive import DownloadArchive, ARCHIVED
+from thumbnails import ThumbnailStore
+from capabilities import CapabilityCache, get_encoder_options
+from progress import format_bytes, format_eta
+from search import SearchService, YoutubeSearchSession
+from network import NetworkGovernor
+from search_view import SearchResultList
+from transfer import TRANSFER_PROFILES, throughput_report
+from retry import write_failure_report
+from metrics import Metrics, write_batch_summary
+from playlists import is_collection_url
+from updater import UpdateHandler
 
 
 class App(CTk):
 	THUMBNAIL_WIDTH = 128
 	THUMBNAIL_HEIGHT = 72
+	DOWNLOAD_WORKERS = 3
+	POSTPROCESS_WORKERS = None  # None lets the engine size it so ENCODER_LIMITS alone caps conversions
+	EVENT_POLL_MS = 100  # also the progress redraw rate, 10 Hz
+	BANDWIDTH_LIMIT = None  # bytes per second shared by every download, None for unlimited
+	RESULT_TITLE_LENGTH = 60  # keeps search result rows to a fixed height
+	METRICS_PORT = None  # serves Prometheus metrics on 127.0.0.1 when set, None leaves metrics off
+	# audio menu label -> (audio_codec, audio_bitrate) settings
+	AUDIO_OPTIONS = {
+		"Best audio (no re-encode)": ('native', '320k'),
+		"M4A / AAC": ('m4a', '256k'),
+		"Opus": ('opus', '160k'),
+		"MP3 320k": ('mp3', '320k'),
+		"MP3 192k": ('mp3', '192k'),
+		"MP3 128k": ('mp3', '128k'),
+	}
 	"""Main application window."""
 	def __init__(self):
 		super().__init__(fg_color='#040D12')
@@ -146,41 +56,25 @@ class App(CTk):
 		self.my_font = CTkFont(family="Helvetica", weight="bold")
 		set_default_color_theme("green")
 		
-		self.search_queue = queue.Queue()
-		self.search_cache = {}
-		self.current_search_id = 0
-		self.last_search_time = 0
-  
-		self.thumbnail_cache = {}
-		self.thumbnail_executor = ThreadPoolExecutor(max_workers=4)
+		self.metadata_cache = MetadataCache()
+		self.metrics = Metrics(enabled=self.METRICS_PORT is not None)
+		if self.metrics.enabled:
+			self.metrics.serve(self.METRICS_PORT)
+		self.network = NetworkGovernor(bandwidth=self.BANDWIDTH_LIMIT)
+		self.search_service = SearchService(
+			session_factory=lambda query, cancel_event: YoutubeSearchSession(query, cancel_event, self.network),
+			metadata_cache=self.metadata_cache,
+			metrics=self.metrics
+		)
+		self.current_query = None
+		self.thumbnails = ThumbnailStore(self.THUMBNAIL_WIDTH, self.THUMBNAIL_HEIGHT, governor=self.network, metrics=self.metrics)
+		# extractions take seconds, so they get their own pool and never queue in front of thumbnails
+		self.prefetcher = MetadataPrefetcher(self.metadata_cache, self.network)
 		self.placeholder_image = self._create_placeholder_image()
 			
-		try:
-			base_path = Path(sys._MEIPASS)
-		except AttributeError:
-			base_path = Path(os.path.dirname(os.path.abspath(__file__)))
-
-		self.ffmpeg_path = str(base_path / 'ffmpeg' / 'ffmpeg.exe')
-		self.ffprobe_path = str(base_path / 'ffmpeg' / 'ffprobe.exe')
-		
-		try:
-			result = subprocess.run(
-				[self.ffmpeg_path, '-version'],
-				capture_output=True,
-				text=True,
-				creationflags=subprocess.CREATE_NO_WINDOW
-			)
-			print(f"FFmpeg output:\n{result.stdout}")
-			print(f"FFmpeg error:\n{result.stderr}")
-			
-			if result.returncode != 0:
-				raise Exception("FFmpeg test failed")
-		except Exception as e:
-			error_msg = str(e)
-			self.after(0, lambda msg=error_msg: self.progress_label.configure(
-				text=f"FFmpeg verification failed: {msg}"
-			))
-			return
+		self.ffmpeg_path = find_tool('ffmpeg')
+		self.ffprobe_path = find_tool('ffprobe')
+		self.capabilities = CapabilityCache()
 
 		self.main_frame = CTkFrame(master=self, corner_radius=6, fg_color='#040D12')
 		self.main_frame.pack(pady=10, padx=10, expand=True, fill="both")
@@ -214,9 +108,9 @@ class App(CTk):
 		self.directory_label = CTkLabel(
 			master=self.main_frame,
 			height=60,
-			width=405,
+			width=200,
 			text="No directory selected",
-			wraplength=275,
+			wraplength=190,
 			font=self.my_font,
 			text_color='#93B1A6',
 		)
@@ -262,11 +156,27 @@ class App(CTk):
 		)
 		self.search_button.place(x=729, y=340)
 
+		self.audio_menu = CTkOptionMenu(
+			master=self.main_frame,
+			values=list(self.AUDIO_OPTIONS),
+			height=30,
+			width=200,
+			corner_radius=0,
+			font=self.my_font,
+			dropdown_font=self.my_font,
+			fg_color='#183D3D',
+			dropdown_fg_color='#183D3D',
+			button_color='#183D3D',
+			text_color='#93B1A6',
+			dropdown_text_color='#93B1A6',
+		)
+		self.audio_menu.place(x=215, y=420)
+
 		self.encoder_menu = CTkOptionMenu(
 			master=self.main_frame,
-			values=self.get_available_encoders(self.ffmpeg_path),
+			values=['libx264 (CPU)'],
 			height=30,
-			width=405,
+			width=200,
 			corner_radius=0,
 			font=self.my_font,
 			dropdown_font=self.my_font,
@@ -278,6 +188,23 @@ class App(CTk):
 		)
 		self.encoder_menu.place(x=425, y=420)
 
+		self.transfer_menu = CTkOptionMenu(
+			master=self.main_frame,
+			values=[f"{profile.capitalize()} transfer" for profile in TRANSFER_PROFILES],
+			height=30,
+			width=200,
+			corner_radius=0,
+			font=self.my_font,
+			dropdown_font=self.my_font,
+			fg_color='#183D3D',
+			dropdown_fg_color='#183D3D',
+			button_color='#183D3D',
+			text_color='#93B1A6',
+			dropdown_text_color='#93B1A6',
+		)
+		self.transfer_menu.set("Auto transfer")
+		self.transfer_menu.place(x=630, y=420)
+
 		self.search_results_frame = CTkScrollableFrame(
 			master=self.main_frame,
 			width=self.THUMBNAIL_WIDTH + 260,
@@ -286,6 +213,13 @@ class App(CTk):
    		fg_color='#183D3D'
 		)
 		self.search_results_frame.place(x=425, y=10)
+		self.search_list = SearchResultList(
+			self.search_results_frame,
+			create_row=self._create_result_row,
+			bind_row=self._bind_result_row,
+			on_need_more=self._load_more_results,
+			font=self.my_font
+		)
 
 		self.scrollable_frame = CTkScrollableFrame(
 			master=self.main_frame,
@@ -380,7 +314,39 @@ class App(CTk):
 		self.link_entry.bind("<Return>", lambda event: self.add_link())
 		self.links = []
 		self.link_rows = []
+		self.link_info = {}
+
+		self.job_events = queue.Queue()
+		self.journal = JobJournal()
+		self.engine = DownloadEngine(
+			ffmpeg_path=self.ffmpeg_path,
+			ffprobe_path=self.ffprobe_path,
+			download_workers=self.DOWNLOAD_WORKERS,
+			postprocess_workers=self.POSTPROCESS_WORKERS,
+			metadata_cache=self.metadata_cache,
+			capabilities=self.capabilities,
+			journal=self.journal,
+			events=self.job_events,
+			archive=DownloadArchive(),
+			governor=self.network,
+			prefetcher=self.prefetcher,
+			metrics=self.metrics
+		)
+		self.batch_running = False
+		self.batch_thread = None
+		self.closing = False
+		self.progress_version = None
+		self.after(self.EVENT_POLL_MS, self._poll_job_events)
+		self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+		# anything left unfinished by a crash, update or closed window goes back in the queue
+		restored = {}
+		for link, title in self.journal.pending():
+			if row := self.add_link(url=link, title=title, prefetch=False):
+				restored[link] = row
+		self.prefetcher.submit_many(restored, lambda link, future: self._on_link_metadata(link, restored[link], future))
 		
+		self.probe_ffmpeg()
 		self.update_handler = UpdateHandler()
 		self.check_for_updates()
 
@@ -391,7 +357,7 @@ class App(CTk):
 				if update_info := self.update_handler.check_update():
 					self.after(0, lambda: self.show_update_prompt(update_info))
 			except Exception as e:
-				print(f"Update check error: {e}")
+				logging.error(f"Update check error: {e}")
 		threading.Thread(target=update_check, daemon=True).start()
 
 	def show_update_prompt(self, update_info):
@@ -405,225 +371,185 @@ class App(CTk):
 		button_frame = CTkFrame(dialog)
 		button_frame.pack(pady=10)
 		
-		CTkButton(button_frame, text="Update Now", command=lambda: self.start_update(update_info['url'], dialog)).pack(side='top', padx=10, pady=10)
+		CTkButton(button_frame, text="Update Now", command=lambda: self.start_update(update_info, dialog)).pack(side='top', padx=10, pady=10)
 		CTkButton(button_frame, text="Later", command=dialog.destroy).pack(side='bottom', padx=10, pady=10)
 		
 		dialog.after(100, lambda: dialog.attributes('-topmost', True))
 		dialog.mainloop()
 
-	def start_update(self, download_url, dialog):
-		"""Gets rid of the update prompt and starts the update"""
+	def start_update(self, update_info, dialog):
+		"""Gets rid of the update prompt and downloads the update in the background"""
 		dialog.destroy()
 		self.progress_label.configure(text="Downloading update...")
-		success = self.update_handler.perform_update(download_url)
-		if success:
-			self.destroy()
+		shown = [-1]
+
+		def progress(done, total):
+			percent = int(done * 100 / total) if total else 0
+			# one redraw per percent, not one per chunk
+			if percent != shown[0]:
+				shown[0] = percent
+				self.after(0, lambda: self.progress_label.configure(text=f"Downloading update... {percent}%"))
+
+		def update():
+			try:
+				self.update_handler.perform_update(update_info, progress)
+			except Exception as e:
+				logging.error(f"Update failed: {e}")
+				self.after(0, lambda error=e: self._on_update_failed(error))
+				return
+			self.after(0, self.on_close)
+		threading.Thread(target=update, daemon=True).start()
+
+	def _on_update_failed(self, error):
+		self.progress_label.configure(text="Update failed")
+		messagebox.showerror("Update Error", f"Failed to update: {error}")
 
 	def perform_search(self):
-			"""starts searching youtube based on your search"""
-			query = self.search_entry.get().strip()
-			if not query:
-					self._clear_search_results()
-					return
-
-			self._show_loading()
-
-			if query in self.search_cache:
-					self._update_ui(self.search_cache[query])
-					return
-
-			self.current_search_id += 1
-			search_id = self.current_search_id
-			threading.Thread(
-					target=self._async_search,
-					args=(query, search_id),
-					daemon=True
-			).start()
-
-	def _async_search(self, query, search_id):
-		"""searches meta data of videos"""
-		try:
-				ydl_opts = {
-						"quiet": True,
-						"extract_flat": "in_playlist",
-						"skip_download": True,
-						"ignoreerrors": True,
-						"noplaylist": True,
-						"extractor_args": {
-								"youtube": {
-										"skip": ["hls", "dash", "translated_subs"]
-								}
-						}
-				}
-
-				with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-						results = ydl.extract_info(f"ytsearch10:{query}", download=False)
-
-				if search_id == self.current_search_id:
-						self.search_cache[query] = results
-						self.search_queue.put(results)
-						self.after(0, self._process_search_results)
-						
-		except Exception as e:
-				print(f"Search error: {e}")
-				self.search_queue.put(None)
-				self.after(0, self._process_search_results)
+		"""starts searching youtube based on your search"""
+		query = self.search_entry.get().strip()
+		self.current_query = query or None
+		if not query:
+			self.search_service.cancel()
+			self.search_list.clear()
+			return
 
-	def _process_search_results(self):
-		"""processes the search results from async search and sends them to update ui"""
-		try:
-				results = self.search_queue.get_nowait()
-				self._update_ui(results)
-		except queue.Empty:
-				pass
+		self.search_list.reset()
+		if (cached := self.search_service.get_cached(query)) is not None:
+			entries, exhausted = cached
+			self.search_list.append(entries)
+			self.search_list.set_state(loading=False, exhausted=exhausted)
+			return
 
-	def _show_loading(self):
-		"""shows a label to show the user that the program is searching videos"""
-		self._clear_search_results()
-		CTkLabel(
-			self.search_results_frame,
-			text="Searching...",
-			font=self.my_font
-		).pack(pady=10)
+		self.search_list.show_message("Searching...")
+		self.search_service.search(query, self._on_search_results)
+
+	def _load_more_results(self):
+		"""asks for the next page once the user has scrolled near the end of the results"""
+		if self.current_query:
+			self.search_service.more(self.current_query, self._on_search_results)
+
+	def _on_search_results(self, query, entries, state):
+		"""called from the search worker as entries arrive; hands them to the UI thread if they're still wanted"""
+		def apply():
+			if query != self.current_query:
+				return
+			self.search_list.append(entries)
+			if state != 'partial':
+				self.search_list.set_state(loading=False, exhausted=state != 'page')
+		self.after(0, apply)
+
+	def _create_result_row(self, parent):
+		"""builds an empty search result row; rows are reused for other results as the list scrolls"""
+		row = CTkFrame(parent, height=self.THUMBNAIL_HEIGHT + 10, fg_color="#040D12")
+		row.pack_propagate(False)  # every row is the same height so the list can work out what's visible
+		row.pady = 3
+		row.entry = None
+		row.video_id = None
+		row.thumbnail_future = None
+
+		row.thumbnail = CTkLabel(
+			row,
+			image=self.placeholder_image,
+			text="",
+			width=self.THUMBNAIL_WIDTH,
+			height=self.THUMBNAIL_HEIGHT,
+		)
+		row.thumbnail.pack(side="left", padx=5, pady=5)
 
-	def _clear_search_results(self):
-		"""clears any widgets in the search results window"""
-		for widget in self.search_results_frame.winfo_children():
-			try:
-				widget.destroy()
-			except:
-				pass
+		content_frame = CTkFrame(row, fg_color="transparent")
+		content_frame.pack(side="left", fill="both", expand=True, padx=3)
+		content_frame.grid_columnconfigure(0, weight=1)
 
-	def _update_ui(self, search_results):
-			self._clear_search_results()
-			
-			if not search_results or not search_results.get('entries'):
-					CTkLabel(self.search_results_frame, text="No results found.", font=self.my_font).pack(pady=10)
-					return
-
-			for video in search_results.get("entries", []):
-					if not video:
-							continue
-							
-					result_frame = CTkFrame(self.search_results_frame, height=self.THUMBNAIL_HEIGHT, fg_color="#040D12")
-					result_frame.pack(fill="x", padx=5, pady=3)
-
-					thumbnail_label = CTkLabel(
-							result_frame, 
-							image=self.placeholder_image,
-							text="",
-							width=self.THUMBNAIL_WIDTH,
-							height=self.THUMBNAIL_HEIGHT,
-					)
-					thumbnail_label.pack(side="left", padx=5, pady=5)
-
-					content_frame = CTkFrame(result_frame, fg_color="transparent")
-					content_frame.pack(side="left", fill="both", expand=True, padx=3)
-
-					content_frame.grid_columnconfigure(0, weight=1)
-
-					title_var = StringVar(value=video.get('title', 'Untitled'))
-					title_label = CTkLabel(
-							content_frame,
-							textvariable=title_var,
-							font=self.my_font,
-							text_color= '#93B1A6',
-							wraplength=160,
-							width= 175,
-							justify='left',
-							anchor="w"
-					)
-					title_label.grid(row=0, column=0, padx=5, pady=5, sticky="w")
-
-					CTkButton(
-						content_frame,
-						text="ADD",
-						width=60,
-						corner_radius=5,
-						font=self.my_font,
-						text_color='#93B1A6',
-						fg_color='#183D3D',
-						command=lambda v=video: self.add_link(  # v captures current video
-							url=v.get('url'),
-							video_id=v.get('id'),
-							title=v.get('title')
-						)
-					).grid(row=0, column=1, padx=5, sticky="e")
-
-					video_id = video.get('id')
-					if video_id:
-							self._load_thumbnail(video_id, thumbnail_label)
+		row.title_var = StringVar()
+		CTkLabel(
+			content_frame,
+			textvariable=row.title_var,
+			font=self.my_font,
+			text_color='#93B1A6',
+			wraplength=160,
+			width=175,
+			justify='left',
+			anchor="w"
+		).grid(row=0, column=0, padx=5, pady=5, sticky="w")
+
+		row.add_button = CTkButton(
+			content_frame,
+			text="ADD",
+			width=60,
+			corner_radius=5,
+			font=self.my_font,
+			text_color='#93B1A6',
+			fg_color='#183D3D'
+		)
+		row.add_button.grid(row=0, column=1, padx=5, sticky="e")
+		return row
+
+	def _bind_result_row(self, row, video):
+		"""points a recycled row at another search result"""
+		title = video.get('title') or 'Untitled'
+		row.title_var.set(title if len(title) <= self.RESULT_TITLE_LENGTH else title[:self.RESULT_TITLE_LENGTH - 1] + '…')
+		row.add_button.configure(command=lambda: self.add_link(
+			url=video.get('url'),
+			video_id=video.get('id'),
+			title=video.get('title')
+		))
+
+		if row.thumbnail_future is not None:
+			row.thumbnail_future.cancel()
+			row.thumbnail_future = None
+		row.video_id = video_id = video.get('id')
+		if not video_id:
+			row.thumbnail.configure(image=self.placeholder_image)
+		elif (image := self.thumbnails.get_cached(video_id)) is not None:
+			row.thumbnail.configure(image=self._to_ctk_image(image))
+		else:
+			row.thumbnail.configure(image=self.placeholder_image)
+			def show(image):
+				# the row may have scrolled on to another result in the meantime
+				self.after(0, lambda: row.video_id == video_id and row.thumbnail.configure(image=self._to_ctk_image(image)))
+			row.thumbnail_future = self.thumbnails.submit(video_id, show)
   
 	def _create_placeholder_image(self):
 		img = Image.new('RGB', (self.THUMBNAIL_WIDTH, self.THUMBNAIL_HEIGHT), (40, 40, 40))
 		return CTkImage(light_image=img, dark_image=img, size=(self.THUMBNAIL_WIDTH, self.THUMBNAIL_HEIGHT))
 
 	def _load_thumbnail(self, video_id, label):
-			if video_id in self.thumbnail_cache:
-					self._update_thumbnail(label, self.thumbnail_cache[video_id])
-					return
-
-			self.thumbnail_executor.submit(
-					self._download_thumbnail,
-					video_id,
-					label
-			)
+		if (image := self.thumbnails.get_cached(video_id)) is not None:
+			label.configure(image=self._to_ctk_image(image))
+			return
 
-	def _download_thumbnail(self, video_id, label):
-		try:
-			url = f"https://img.youtube.com/vi/{video_id}/mqdefault.jpg"
-			response = requests.get(url, timeout=5)
-			if response.status_code == 200:
-				mask = Image.new("L", (self.THUMBNAIL_WIDTH, self.THUMBNAIL_HEIGHT), 0)
-				draw = ImageDraw.Draw(mask)
-				draw.rounded_rectangle(
-					(0, 0, self.THUMBNAIL_WIDTH, self.THUMBNAIL_HEIGHT),
-					radius=10,
-					fill=255
-				)
-
-				image = Image.open(io.BytesIO(response.content))
-				image = image.resize((self.THUMBNAIL_WIDTH, self.THUMBNAIL_HEIGHT), Image.LANCZOS)
-
-				image.putalpha(mask)
-				
-				ctk_image = CTkImage(
-					light_image=image,
-					dark_image=image,
-					size=(self.THUMBNAIL_WIDTH, self.THUMBNAIL_HEIGHT)
-				)
-				self.thumbnail_cache[video_id] = ctk_image
-				self._update_thumbnail(label, ctk_image)
-		except Exception as e:
-				print(f"Thumbnail download failed: {e}")
+		self.thumbnails.submit(video_id, lambda image: self._update_thumbnail(label, image))
 
-	def _update_thumbnail(self, label, image):
-			self.after(0, lambda: label.configure(image=image))
+	def _to_ctk_image(self, image):
+		return CTkImage(light_image=image, dark_image=image, size=(self.THUMBNAIL_WIDTH, self.THUMBNAIL_HEIGHT))
 
-	def get_available_encoders(self, ffmpeg_path):
-			"""checks what encoders are available and what gpu you have to return the available encoders"""
-			encoders = ['libx264 (CPU)']
-			detected_gpu = detect_gpu(ffmpeg_path)
-			print(f"GPU Detected: {detected_gpu}")
+	def _update_thumbnail(self, label, image):
+		self.after(0, lambda: label.winfo_exists() and label.configure(image=self._to_ctk_image(image)))
 
+	def probe_ffmpeg(self):
+		"""probes ffmpeg off the UI thread and fills in the encoder menu when it's done"""
+		def probe():
 			try:
-				result = subprocess.run([ffmpeg_path, '-hide_banner', '-encoders'], 
-							capture_output=True, text=True, creationflags=subprocess.CREATE_NO_WINDOW)
-				encoder_output = result.stdout.lower()
-		
-				print(f"Available Encoders from FFmpeg:\n{encoder_output}")
-
-				if 'nvenc' in encoder_output and detected_gpu == 'nvidia':
-					encoders.extend(['h264_nvenc (NVIDIA)', 'hevc_nvenc (NVIDIA)'])
-				if 'amf' in encoder_output and detected_gpu == 'amd':
-					encoders.append('h264_amf (AMD)')
-				if 'qsv' in encoder_output and detected_gpu == 'intel':
-					encoders.append('h264_qsv (Intel)')
-
+				capabilities = self.capabilities.get(self.ffmpeg_path)
+				logging.info(f"FFmpeg: {capabilities['version']}")
+				# test encodes only run on first launch or once the cached result is a week old
+				capabilities = self.capabilities.validate(self.ffmpeg_path)
+				for encoder, reason in capabilities['validation']['rejected'].items():
+					logging.info(f"Encoder {encoder} unavailable: {reason}")
+				options = get_encoder_options(capabilities)
+				self.after(0, lambda: self._set_encoder_options(options))
 			except Exception as e:
-				print(f"Encoder detection error: {str(e)}")
-			print(f"Final Encoder List: {encoders}")
-			return encoders
+				error_msg = str(e)
+				self.after(0, lambda: self.progress_label.configure(
+					text=f"FFmpeg verification failed: {error_msg}"
+				))
+		threading.Thread(target=probe, daemon=True).start()
+
+	def _set_encoder_options(self, options):
+		"""fills the encoder menu with the validated encoders, keeping the user's pick if it's one of them"""
+		self.encoder_menu.configure(values=options)
+		if self.encoder_menu.get() not in options:
+			self.encoder_menu.set(options[0])
 
 	def select_directory(self):
 		"""Here the user can select a directory to download the files to"""
@@ -632,11 +558,16 @@ class App(CTk):
 			self.directory_label.configure(text=f"Save Location: {directory}")
 			self.download_directory = directory
 
-	def add_link(self, url=None, video_id=None, title=None):
-		"""Adds links to the download list with thumbnails and titles"""
-		link = url or self.link_entry.get()
+	def add_link(self, url=None, video_id=None, title=None, prefetch=True):
+		"""Adds links to the download list with thumbnails and titles; returns the new row"""
+		link = (url or self.link_entry.get()).strip()
+		if link and normalize_url(link) in {normalize_url(queued) for queued in self.links}:
+			if not url:
+				self.link_entry.delete(0, "end")
+			return
 		if link:
 			self.links.append(link)
+			self.journal.queue(link, title)
    
 			link_row = CTkFrame(
 				master=self.scrollable_frame, 
@@ -668,10 +599,10 @@ class App(CTk):
 				justify='left',
 				anchor="w"
 			)
-			title_label.grid(row=0, column=0, padx=5, pady=5, sticky="w")
+			title_label.grid(row=0, column=0, rowspan=2, padx=5, pady=5, sticky="w")
 
-			# Remove button
-			CTkButton(
+			# Remove button, cancels the link's jobs instead while a batch is running them
+			action_button = CTkButton(
 				content_frame,
 				text="REMOVE",
 				width=60,
@@ -679,56 +610,107 @@ class App(CTk):
 				font=self.my_font,
 				text_color='#93B1A6',
 				fg_color='#183D3D',
-				command=lambda: self.remove_link(link, link_row)
-			).grid(row=0, column=1, padx=5, sticky="e")
+				command=lambda: self._row_action(link_row)
+			)
+			action_button.grid(row=0, column=1, padx=5, pady=(5, 2), sticky="e")
+
+			# Pause button, only shown while one of the link's videos is converting
+			pause_button = CTkButton(
+				content_frame,
+				text="PAUSE",
+				width=60,
+				corner_radius=5,
+				font=self.my_font,
+				text_color='#93B1A6',
+				fg_color='#183D3D',
+				command=lambda: self._toggle_pause(link_row)
+			)
+			pause_button.grid(row=1, column=1, padx=5, pady=(2, 5), sticky="e")
+			pause_button.grid_remove()
 
 			# Store references for later updates
+			link_row.link = link
 			link_row.thumbnail = thumbnail_label
 			link_row.title = title_label
+			link_row.action_button = action_button
+			link_row.pause_button = pause_button
+			link_row.jobs = {}  # job id -> status, for the videos the running batch made of this link
+			link_row.paused = False
 			self.link_rows.append(link_row)
 
 			# Fetch metadata if not provided
 			if not (video_id and title):
-				self.thumbnail_executor.submit(
-					self.fetch_link_metadata, 
-					link, 
-					link_row
-				)
+				if prefetch:
+					self.prefetcher.submit(link, lambda future: self._on_link_metadata(link, link_row, future))
 			else:
+				self.link_info[link] = {'id': video_id, 'title': title}
 				self._load_thumbnail(video_id, thumbnail_label)
 				title_label.configure(text=title)
+				# search results only carry id and title, extract the rest before the download needs it
+				self.prefetcher.submit(link)
 
 			if not url:
 				self.link_entry.delete(0, "end")
+			return link_row
     
-	def fetch_link_metadata(self, link, link_row):
-		"""Fetches metadata for manually entered URLs"""
-		try:
-			with yt_dlp.YoutubeDL({
-				'quiet': True,
-				'extract_flat': True,
-				'skip_download': True,
-				'noplaylist': True
-			}) as ydl:
-				info = ydl.extract_info(link, download=False)
-				video_id = info.get('id')
-				title = info.get('title', link)
-				
-				self.after(0, lambda: [
-					link_row.title.configure(text=title),
-					self._load_thumbnail(video_id, link_row.thumbnail) 
-					if video_id else None
-				])
-		except Exception as e:
-			self.after(0, lambda: [
-				link_row.title.configure(text=link),
-				link_row.thumbnail.configure(image=self.placeholder_image)
-			])
+	def _on_link_metadata(self, link, link_row, future):
+		"""called from the prefetch pool once a queued link's metadata is in"""
+		if error := future.exception():
+			logging.warning(f"Could not fetch metadata for {link}: {error}")
+			self.after(0, lambda: link_row.winfo_exists() and link_row.title.configure(text=link))
+			return
+
+		info = future.result()
+		if is_collection_url(link):
+			# playlists are only named here, their videos are listed once the download runs
+			self.after(0, lambda: link_row.winfo_exists() and link_row.title.configure(text=f"Playlist: {info['title']}"))
+			return
+
+		self.link_info[link] = info
+		video_id = info.get('id')
+		title = info.get('title', link)
+		self.after(0, lambda: link_row.winfo_exists() and [
+			link_row.title.configure(text=title),
+			self._load_thumbnail(video_id, link_row.thumbnail)
+			if video_id else None
+		])
+
+	def _row_action(self, row):
+		"""the row's first button: cancels its running jobs, or removes it from the queue when none are"""
+		active = [job_id for job_id, status in row.jobs.items() if status not in ('done', 'failed')]
+		if not active:
+			self.remove_link(row.link, row)
+			return
+		for job_id in active:
+			self.engine.cancel_job(job_id)
+		row.action_button.configure(text="CANCELLING", state="disabled")
+
+	def _toggle_pause(self, row):
+		"""pauses or resumes the row's running conversions"""
+		converting = [job_id for job_id, status in row.jobs.items() if status == 'postprocessing']
+		action = self.engine.resume_job if row.paused else self.engine.pause_job
+		if any([action(job_id) for job_id in converting]):
+			row.paused = not row.paused
+			row.pause_button.configure(text="RESUME" if row.paused else "PAUSE")
+
+	def _update_row_controls(self, row):
+		if not any(status not in ('done', 'failed') for status in row.jobs.values()):
+			row.action_button.configure(text="REMOVE", state="normal")
+		elif row.action_button.cget('state') != 'disabled':
+			row.action_button.configure(text="CANCEL")
+		if any(status == 'postprocessing' for status in row.jobs.values()):
+			row.pause_button.grid()
+		else:
+			row.paused = False
+			row.pause_button.configure(text="PAUSE")
+			row.pause_button.grid_remove()
 
 	def remove_link(self, link, row):
 		"""removes the link from the links list"""
 		if link in self.links:
 			self.links.remove(link)
+		self.link_info.pop(link, None)
+		self.journal.forget(link)
 		row.destroy()
 		self.link_rows.remove(row)
 
@@ -737,172 +719,139 @@ class App(CTk):
 		if not hasattr(self, 'download_directory'):
 			self.progress_label.configure(text="Error: Select save location first!")
 			return
-		
-		threading.Thread(target=self.process_downloads, args=(media_type,)).start()
 
-	def process_downloads(self, media_type):
-		"""goes through all the links you've added and downloads them either as mp3 or mp4"""
+		settings = {
+			'media_type': media_type,
+			'directory': self.download_directory,
+			'resolution': int(self.resolution_menu.get()[:-1]),
+			'bitrate': str(self.bitrate_menu.get()[:-3]),
+			'encoder': self.encoder_menu.get().split(' ')[0],
+		}
+		settings['audio_codec'], settings['audio_bitrate'] = self.AUDIO_OPTIONS[self.audio_menu.get()]
 		self.video_button.configure(state="disabled")
 		self.audio_button.configure(state="disabled")
-		self.after(0, lambda: self.progress_label.configure(text="Initializing..."))
-		
-		if not os.path.isfile(self.ffmpeg_path):
-			self.after(0, lambda: self.progress_label.configure(text=f"FFmpeg not found at {self.ffmpeg_path}"))
-			return
+		transfer = self.transfer_menu.get().split(' ')[0].lower()
+		self.batch_thread = threading.Thread(target=self.process_downloads, args=(settings, transfer), daemon=True)
+		self.batch_thread.start()
+
+	def process_downloads(self, settings, transfer='auto'):
+		"""hands every link you've added to the download engine and waits for the batch to finish"""
+		self.job_events.put({'status': 'batch_started', 'message': "Initializing..."})
 
 		try:
-			subprocess.run([self.ffmpeg_path, '-version'], check=True, 
-						 stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+			self.engine.check_ffmpeg()
 		except Exception as e:
-			self.after(0, lambda: self.progress_label.configure(text=f"FFmpeg error: {str(e)}"))
+			self.job_events.put({'status': 'batch_finished', 'message': f"FFmpeg error: {str(e)}"})
 			return
 
-		total = len(self.links)
-		for index, link in enumerate(self.links, 1):
-			try:
-				if not link.startswith(('http://', 'https://')):
-					raise ValueError("Invalid URL")
-		
-				ydl_opts = {
-					'ffmpeg_location': self.ffmpeg_path,
-					'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
-					'outtmpl': os.path.join(self.download_directory, '%(title)s.%(ext)s'),
-					'merge_output_format': 'mp4',
-					'verbose': True
-				}
-
-				with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-					info = ydl.extract_info(link, download=False)
-					video_title = sanitize_filename(info.get('title', 'untitled'))
-					video_id = info.get('id') or str(uuid.uuid4())[:8]
-
-				if media_type == "audio":
-					ydl_opts.update({
-						'outtmpl': os.path.join(self.download_directory, f'{video_title}.%(ext)s'),
-						'format': 'bestaudio/best',
-						'postprocessors': [{
-							'key': 'FFmpegExtractAudio',
-							'preferredcodec': 'mp3',
-							'preferredquality': '320',
-						}]
-					})
-				else:
-					res = int(self.resolution_menu.get()[:-1])
-					bit = str(self.bitrate_menu.get()[:-3])
-					print(f"BITRATE MENU SELECTION: {bit}")
-					encoder = self.encoder_menu.get().split(' ')[0]
-					
-					encoder_args = {
-						'libx264': [
-							'-c:v', 'libx264',
-							'-preset', 'fast',
-							'-crf', '23',
-							'-b:v', f'{bit}',
-							'-pix_fmt', 'yuv420p',
-							'-movflags', '+faststart'
-						],
-						'h264_nvenc': [
-							'-c:v', 'h264_nvenc',
-							'-preset', 'p6',
-							'-rc', 'vbr',
-							'-cq', '23',
-							'-b:v', f'{bit}',
-							'-maxrate', '10M',
-							'-profile:v', 'main',
-							'-pix_fmt', 'yuv420p'
-						],
-						'h264_amf': [
-							'-c:v', 'h264_amf',
-							'-usage', 'transcoding',
-							'-quality', 'balanced',
-							'-b:v', f'{bit}',
-							'-maxrate', '10M',
-							'-profile:v', 'main',
-							'-pix_fmt', 'yuv420p'
-						],
-						'h264_qsv': [
-							'-c:v', 'h264_qsv',
-							'-preset', 'fast',
-							'-global_quality', '23',
-							'-b:v', f'{bit}',
-							'-maxrate', '10M',
-							'-profile:v', 'main',
-							'-pix_fmt', 'yuv420p'
-						]
-					}
-					
-					base_args = [
-						'-c:a', 'aac', 
-						'-b:a', '192k',
-						'-ar', '48000',
-						'-ac', '2'
-					]
-					
-					ydl_opts.update({
-						'outtmpl': os.path.join(self.download_directory, f'{video_title}.mp4'),
-						'format': f'bestvideo[height<={res}][vcodec!^=av01]+bestaudio/best',
-						'postprocessors': [{
-							'key': 'FFmpegVideoConvertor',
-							'preferedformat': 'mp4',
-						}],
-						'postprocessor_args': encoder_args.get(encoder, encoder_args['libx264']) + base_args
-					})
-
-				self.after(0, lambda: self.progress_label.configure(
-					text=f"Processing {index}/{total}"
-				))
-				
-				with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-					ydl.params['verbose'] = True
-					ydl.download([link])
-
-				self.update_overall_progress(index/total, index, total)
-				
-			except Exception as e:
-				error_msg = f"Failed: {str(e)}"
-				self.after(0, lambda: self.progress_label.configure(text=error_msg))
-				self.update_overall_progress(index/total, index, total)
-
-		self.after(0, self.clear_links)
-		self.video_button.configure(state="normal")
-		self.audio_button.configure(state="normal")
-
-	def update_progress(self, data):
-		"""updates the progress bar for the user to see the progress of the downloads"""
-		if data['status'] == 'downloading':
-			progress = data.get('downloaded_bytes', 0) / data.get('total_bytes', 1)
-			self.progress_bar.set(progress)
-			self.progress_label.configure(text=f"Downloading: {os.path.basename(data['filename'])}")
-			
-		elif data['status'] == 'processing':
+		jobs = self.engine.run(list(self.links), settings, self.link_info, transfer=transfer)
+		if self.closing:
+			# the stores are closed, the journal already has everything that didn't finish
+			return
+		logging.info(f"Metadata cache: {self.metadata_cache.stats()}")
+		logging.info(f"Transfer: {throughput_report(jobs)}")
+		try:
+			logging.info(f"Batch summary: {write_batch_summary(jobs, self.metrics)}")
+		except OSError as e:
+			logging.warning(f"Could not save batch summary: {e}")
+
+		# a playlist leaves the queue once every one of its videos is done
+		failed_links = {job.parent or job.link for job in jobs if job.status != 'done'}
+		done_links = [link for link in {job.parent or job.link for job in jobs} if link not in failed_links]
+		failed = sum(job.status != 'done' for job in jobs)
+		message = f"Finished, {failed} failed (kept in queue)" if failed else "All downloads completed!"
+		if archived := sum(job.strategy == ARCHIVED for job in jobs):
+			message += f" ({archived} already downloaded)"
+		if any(job.failures for job in jobs):
 			try:
-				current = data.get('elapsed', 0)
-				duration = data.get('info_dict', {}).get('duration') or 1
-				self.progress_bar.set(current / duration)
-				self.progress_label.configure(text=f"Converting: {data.get('_current_audio_ext', 'file')}")
-			except:
-				self.progress_bar.set(1)
-				self.progress_label.configure(text="Finalizing...")
-
-		elif data['status'] == 'finished':
-			self.progress_bar.set(1)
-			self.progress_label.configure(text="Finalizing...")
-			self.after(2000, lambda: self.progress_bar.set(0))
-
-	def update_overall_progress(self, progress, current, total):
-		"""updates the user on the overall progress"""
-		self.progress_bar.set(progress)
-		self.progress_label.configure(text=f"Completed: {current}/{total}")
-
-	def clear_links(self):
-		"""removes all the links from the link list when done downloading"""
-		for row in self.link_rows:
-			row.destroy()
-		self.links.clear()
-		self.link_rows.clear()
-		self.progress_label.configure(text="All downloads completed!")
+				path = write_failure_report(jobs)
+				logging.info(f"Failure report: {path}")
+				if failed:
+					message += f", see {os.path.basename(path)}"
+			except OSError as e:
+				logging.warning(f"Could not save failure report: {e}")
+		self.job_events.put({'status': 'batch_finished', 'message': message, 'done_links': done_links})
+
+	def _poll_job_events(self):
+		"""drains the scheduler's event channel and redraws progress on the UI thread, at most every EVENT_POLL_MS"""
+		try:
+			while True:
+				event = self.job_events.get_nowait()
+				self._handle_job_event(event)
+		except queue.Empty:
+			pass
+
+		if self.batch_running:
+			snapshot = self.engine.progress.snapshot()
+			if snapshot['version'] != self.progress_version:
+				self.progress_version = snapshot['version']
+				self._show_progress(snapshot)
+		self.after(self.EVENT_POLL_MS, self._poll_job_events)
+
+	def _handle_job_event(self, event):
+		"""applies scheduler events to the widgets; job events only drive the row buttons, progress comes from snapshots"""
+		status = event['status']
+		if 'job' in event:
+			for row in self.link_rows:
+				if row.link == event['link']:
+					row.jobs[event['job']] = status
+					self._update_row_controls(row)
+					if event.get('strategy') == ARCHIVED and not is_collection_url(row.link):
+						row.title.configure(text=f"Already downloaded: {event['title'] or row.link}")
+		elif status == 'batch_started':
+			self.batch_running = True
+			self.progress_version = None
+			self.progress_bar.set(0)
+			self.progress_label.configure(text=event['message'])
+		elif status == 'batch_finished':
+			self.batch_running = False
+			self.progress_bar.set(1 if event.get('done_links') is not None else 0)
+			self.progress_label.configure(text=event['message'])
+			if done_links := event.get('done_links'):
+				self.clear_links(done_links)
+			for row in self.link_rows:
+				row.jobs.clear()
+				self._update_row_controls(row)
+			self.video_button.configure(state="normal")
+			self.audio_button.configure(state="normal")
+
+	def _show_progress(self, snapshot):
+		"""updates the progress bar and label from one aggregated progress snapshot"""
+		self.progress_bar.set(snapshot['fraction'])
+		parts = [f"{snapshot['done'] + snapshot['failed']}/{snapshot['jobs']}"]
+		if snapshot['speed']:
+			parts.append(f"{format_bytes(snapshot['speed'])}/s")
+			parts.append(f"ETA {format_eta(snapshot['eta'])}")
+		if snapshot['failed']:
+			parts.append(f"{snapshot['failed']} failed")
+		if snapshot['current']:
+			parts.append(snapshot['current'][:40])
+		self.progress_label.configure(text=" · ".join(parts))
+
+	def on_close(self):
+		"""cancels the batch and waits for its workers, so closing never leaves ffmpeg running or half written files"""
+		self.closing = True
+		self.withdraw()
+		self.search_service.shutdown()
+		self.prefetcher.shutdown()
+		self.thumbnails.shutdown()
+		self.engine.shutdown(wait=True)
+		if self.batch_thread:
+			self.batch_thread.join(timeout=5)
+		self.destroy()
+
+	def clear_links(self, links=None):
+		"""removes finished links (or all of them) from the link list when done downloading"""
+		for row in list(self.link_rows):
+			if links is None or row.link in links:
+				self.journal.forget(row.link)
+				row.destroy()
+				self.link_rows.remove(row)
+		self.links = [link for link in self.links if links is not None and link not in links]
+		self.link_info = {link: info for link, info in self.link_info.items() if link in self.links}
 
 if __name__ == "__main__":
+	logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(threadName)s: %(message)s")
 	app = App()
 	app.mainloop()
 
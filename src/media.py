@@ -0,0 +1,232 @@
+import json
+import os
+import subprocess
+
+# CREATE_NO_WINDOW only exists on Windows; elsewhere there is no console window to hide
+CREATE_NO_WINDOW = getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+
+REMUX = 'remux'
+COPY_VIDEO = 'copy_video'
+TRANSCODE = 'transcode'
+
+
+AUDIO_ARGS = [
+	'-c:a', 'aac',
+	'-b:a', '192k',
+	'-ar', '48000',
+	'-ac', '2'
+]
+
+
+# audio codecs (as ffprobe names them) that are copied as-is in native mode, and their container
+NATIVE_AUDIO_CONTAINERS = {
+	'aac': 'm4a',
+	'opus': 'opus',
+	'vorbis': 'ogg',
+	'mp3': 'mp3',
+	'flac': 'flac',
+}
+
+# audio_codec setting -> (ffprobe codec name, container, ffmpeg encoder)
+AUDIO_CODECS = {
+	'm4a': ('aac', 'm4a', 'aac'),
+	'opus': ('opus', 'opus', 'libopus'),
+	'mp3': ('mp3', 'mp3', 'libmp3lame'),
+}
+
+# source extensions yt-dlp writes for audio only formats, for when ffprobe isn't available
+AUDIO_EXTENSION_CODECS = {
+	'.m4a': 'aac',
+	'.webm': 'opus',
+	'.opus': 'opus',
+	'.ogg': 'vorbis',
+	'.mp3': 'mp3',
+}
+
+
+def get_encoder_args(encoder: str, bit: str) -> list:
+	"""Returns the ffmpeg video arguments for an encoder, falling back to libx264."""
+	encoder_args = {
+		'libx264': [
+			'-c:v', 'libx264',
+			'-preset', 'fast',
+			'-crf', '23',
+			'-b:v', f'{bit}',
+			'-pix_fmt', 'yuv420p',
+			'-movflags', '+faststart'
+		],
+		'h264_nvenc': [
+			'-c:v', 'h264_nvenc',
+			'-preset', 'p6',
+			'-rc', 'vbr',
+			'-cq', '23',
+			'-b:v', f'{bit}',
+			'-maxrate', '10M',
+			'-profile:v', 'main',
+			'-pix_fmt', 'yuv420p'
+		],
+		'hevc_nvenc': [
+			'-c:v', 'hevc_nvenc',
+			'-preset', 'p6',
+			'-rc', 'vbr',
+			'-cq', '23',
+			'-b:v', f'{bit}',
+			'-maxrate', '10M',
+			'-profile:v', 'main',
+			'-pix_fmt', 'yuv420p'
+		],
+		'h264_amf': [
+			'-c:v', 'h264_amf',
+			'-usage', 'transcoding',
+			'-quality', 'balanced',
+			'-b:v', f'{bit}',
+			'-maxrate', '10M',
+			'-profile:v', 'main',
+			'-pix_fmt', 'yuv420p'
+		],
+		'h264_qsv': [
+			'-c:v', 'h264_qsv',
+			'-preset', 'fast',
+			'-global_quality', '23',
+			'-b:v', f'{bit}',
+			'-maxrate', '10M',
+			'-profile:v', 'main',
+			'-pix_fmt', 'yuv420p'
+		]
+	}
+	return encoder_args.get(encoder, encoder_args['libx264'])
+
+
+# full hardware paths per encoder: decode on the GPU, scale there and hand the frames straight
+# to the encoder. AMF can't take frames from ffmpeg's decoders without a download, so it only
+# gets hardware decode and keeps the software scaler.
+HARDWARE_PIPELINES = {
+	'h264_nvenc': {'hwaccel': 'cuda', 'output_format': 'cuda', 'scaler': 'scale_cuda'},
+	'hevc_nvenc': {'hwaccel': 'cuda', 'output_format': 'cuda', 'scaler': 'scale_cuda'},
+	'h264_qsv': {'hwaccel': 'qsv', 'output_format': 'qsv', 'scaler': 'scale_qsv'},
+	'h264_amf': {'hwaccel': 'd3d11va', 'output_format': None, 'scaler': 'scale'},
+}
+
+
+def get_scale_filter(height: int, scaler: str = 'scale') -> str:
+	"""Scales down to the selected height, never up; -2 keeps the width even as H.264 needs."""
+	return f"{scaler}=w=-2:h=min(ih\\,{height})"
+
+
+def get_hardware_args(encoder: str, bit: str, height: int) -> tuple:
+	"""Returns (input arguments, output arguments) for an encoder's full hardware pipeline.
+
+	When the decoder's frames stay in GPU memory the encoder args lose their -pix_fmt,
+	which would otherwise force every frame back through system memory.
+	"""
+	pipeline = HARDWARE_PIPELINES[encoder]
+	input_args = ['-hwaccel', pipeline['hwaccel']]
+	encoder_args = get_encoder_args(encoder, bit)
+	if pipeline['output_format']:
+		input_args += ['-hwaccel_output_format', pipeline['output_format']]
+		index = encoder_args.index('-pix_fmt')
+		encoder_args = encoder_args[:index] + encoder_args[index + 2:]
+	return input_args, ['-vf', get_scale_filter(height, pipeline['scaler'])] + encoder_args
+
+
+def parse_bitrate(value: str) -> int:
+	"""Turns ffmpeg style bitrates like '5M' or '192k' into bits per second."""
+	value = value.strip().upper()
+	multiplier = {'K': 1_000, 'M': 1_000_000, 'G': 1_000_000_000}.get(value[-1:], 1)
+	number = value[:-1] if multiplier != 1 else value
+	return int(float(number) * multiplier)
+
+
+def probe_media(ffprobe_path: str, path: str) -> dict:
+	"""Returns the first video and audio stream of a file plus its overall bitrate and duration."""
+	result = subprocess.run(
+		[
+			ffprobe_path, '-v', 'error',
+			'-show_entries', 'stream=codec_type,codec_name,width,height,bit_rate,pix_fmt:format=bit_rate,format_name,duration',
+			'-of', 'json', path
+		],
+		capture_output=True,
+		text=True,
+		timeout=30,
+		creationflags=CREATE_NO_WINDOW
+	)
+	if result.returncode != 0:
+		raise Exception(f"ffprobe failed: {result.stderr.strip()}")
+
+	data = json.loads(result.stdout or '{}')
+	probe = {
+		'video': None,
+		'audio': None,
+		'bit_rate': int(data.get('format', {}).get('bit_rate') or 0),
+		'duration': float(data.get('format', {}).get('duration') or 0),
+	}
+	for stream in data.get('streams', []):
+		kind = stream.get('codec_type')
+		if kind in ('video', 'audio') and probe[kind] is None:
+			probe[kind] = stream
+	return probe
+
+
+def choose_video_strategy(probe: dict, max_height: int, max_bitrate: str) -> str:
+	"""Picks the cheapest way to get an H.264/AAC mp4 that satisfies the user's settings.
+
+	Streams that already fit are copied as-is; only the ones that don't get re-encoded.
+	When the container doesn't report a per-stream video bitrate the overall bitrate is
+	used, which can only overestimate it.
+	"""
+	video, audio = probe.get('video'), probe.get('audio')
+	if not video:
+		return TRANSCODE
+
+	video_bitrate = int(video.get('bit_rate') or probe.get('bit_rate') or 0)
+	video_fits = (
+		video.get('codec_name') == 'h264'
+		and video.get('pix_fmt') in (None, 'yuv420p')
+		and int(video.get('height') or 0) <= max_height
+		and 0 < video_bitrate <= parse_bitrate(max_bitrate)
+	)
+	if not video_fits:
+		return TRANSCODE
+	if audio is None or audio.get('codec_name') == 'aac':
+		return REMUX
+	return COPY_VIDEO
+
+
+def get_audio_format(codec: str) -> str:
+	"""Returns the yt-dlp format selector for an audio setting, preferring streams that won't need re-encoding."""
+	return {
+		'm4a': 'bestaudio[acodec^=mp4a]/bestaudio[ext=m4a]/bestaudio/best',
+		'opus': 'bestaudio[acodec=opus]/bestaudio/best',
+	}.get(codec, 'bestaudio/best')
+
+
+def guess_audio_probe(path: str) -> dict:
+	"""A stand-in for probe_media that goes by the source's extension."""
+	codec = AUDIO_EXTENSION_CODECS.get(os.path.splitext(path)[1].lower())
+	return {'video': None, 'audio': {'codec_name': codec} if codec else None, 'bit_rate': 0, 'duration': 0}
+
+
+def choose_audio_output(probe: dict, codec: str, bitrate: str) -> tuple:
+	"""Returns (strategy, extension, ffmpeg arguments) for an audio download.
+
+	'native' keeps whatever the best stream was, just moved into a plain audio container;
+	a specific codec is only re-encoded when the source isn't in that codec already.
+	"""
+	source = (probe.get('audio') or {}).get('codec_name')
+	if codec == 'native':
+		if source in NATIVE_AUDIO_CONTAINERS:
+			extension = NATIVE_AUDIO_CONTAINERS[source]
+			return REMUX, extension, _audio_copy_args(extension)
+		codec = 'm4a'
+
+	name, extension, encoder = AUDIO_CODECS[codec]
+	if source == name:
+		return REMUX, extension, _audio_copy_args(extension)
+	return TRANSCODE, extension, ['-vn', '-c:a', encoder, '-b:a', bitrate]
+
+
+def _audio_copy_args(extension):
+	args = ['-vn', '-c:a', 'copy']
+	if extension == 'm4a':
+		args += ['-movflags', '+faststart']
+	return args
@@ -0,0 +1,150 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from paths import get_data_dir
+
+YOUTUBE_ID_PATTERNS = (
+	re.compile(r'(?:youtube\.com|youtube-nocookie\.com)/(?:watch\?(?:.*&)?v=|embed/|shorts/|live/|v/)([\w-]{11})'),
+	re.compile(r'youtu\.be/([\w-]{11})'),
+)
+
+
+def normalize_url(url: str) -> str:
+	"""Returns a stable cache key for a url, using the video id for anything YouTube."""
+	url = url.strip()
+	for pattern in YOUTUBE_ID_PATTERNS:
+		if match := pattern.search(url):
+			return f"youtube:{match.group(1)}"
+
+	parts = urlsplit(url)
+	query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+	return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip('/'), query, ''))
+
+
+def info_key(info: dict) -> str | None:
+	"""Returns the extractor+id key for an extracted info dict."""
+	if not info.get('id'):
+		return None
+	extractor = (info.get('extractor_key') or info.get('ie_key') or 'generic').lower()
+	return f"{extractor}:{info['id']}"
+
+
+class MetadataCache:
+	"""Persistent SQLite store for extract_info results with per-entry TTLs and LRU eviction.
+
+	Videos are stored once under their extractor+id key and urls are aliases pointing
+	at that key, so the same video added by full url or by short link resolves to the
+	same row. Search results are stored under their normalized query.
+	"""
+	FORMATS_TTL = 5 * 3600  # stream urls in a full extraction expire after ~6 hours
+	METADATA_TTL = 7 * 24 * 3600
+	SEARCH_TTL = 3600
+
+	def __init__(self, path=None, max_entries=5000):
+		self.path = str(path or get_data_dir() / 'metadata.sqlite3')
+		self.max_entries = max_entries
+		self.hits = 0
+		self.misses = 0
+		self.lock = threading.Lock()
+		self.db = sqlite3.connect(self.path, check_same_thread=False)
+		self.db.executescript("""
+			CREATE TABLE IF NOT EXISTS entries (
+				key TEXT PRIMARY KEY,
+				data TEXT NOT NULL,
+				expires REAL NOT NULL,
+				accessed REAL NOT NULL
+			);
+			CREATE TABLE IF NOT EXISTS aliases (
+				alias TEXT PRIMARY KEY,
+				key TEXT NOT NULL
+			);
+			CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+		""")
+
+	def _lookup(self, key, count=True):
+		now = time.time()
+		with self.lock:
+			row = self.db.execute(
+				"SELECT data, expires FROM entries WHERE key = ? OR key = (SELECT key FROM aliases WHERE alias = ?)",
+				(key, key)
+			).fetchone()
+			if row is None or row[1] < now:
+				self.misses += count
+				return None
+			self.db.execute(
+				"UPDATE entries SET accessed = ? WHERE key = ? OR key = (SELECT key FROM aliases WHERE alias = ?)",
+				(now, key, key)
+			)
+			self.db.commit()
+			self.hits += count
+		return json.loads(row[0])
+
+	def _store(self, key, data, ttl, aliases=()):
+		now = time.time()
+		payload = json.dumps(data, default=str)
+		with self.lock:
+			self.db.execute(
+				"INSERT OR REPLACE INTO entries (key, data, expires, accessed) VALUES (?, ?, ?, ?)",
+				(key, payload, now + ttl, now)
+			)
+			self.db.executemany(
+				"INSERT OR REPLACE INTO aliases (alias, key) VALUES (?, ?)",
+				[(alias, key) for alias in aliases if alias != key]
+			)
+			self._evict(now)
+			self.db.commit()
+
+	def _evict(self, now):
+		"""drops expired rows, then the least recently used ones above the size cap"""
+		self.db.execute("DELETE FROM entries WHERE expires < ?", (now,))
+		self.db.execute(
+			"DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+			(self.max_entries,)
+		)
+		self.db.execute("DELETE FROM aliases WHERE key NOT IN (SELECT key FROM entries)")
+
+	def get(self, url, count=True):
+		"""returns the cached info dict for a url or extractor+id key, or None"""
+		return self._lookup(normalize_url(url) if '://' in url else url, count)
+
+	def put(self, info, url=None, ttl=None):
+		"""stores an info dict under its id and, if given, the url it was extracted from"""
+		key = info_key(info) or (url and normalize_url(url))
+		if not key:
+			return
+		if ttl is None:
+			ttl = self.FORMATS_TTL if info.get('formats') else self.METADATA_TTL
+		data = {k: v for k, v in info.items() if not k.startswith('__')}
+		aliases = [normalize_url(u) for u in (url, info.get('webpage_url')) if u]
+		self._store(key, data, ttl, aliases)
+
+	def get_or_extract(self, url, extract, need_formats=False):
+		"""returns cached info for a url, calling ``extract(url)`` and storing the result on a miss"""
+		info = self.get(url, count=False)
+		if info is not None and (info.get('formats') or not need_formats):
+			self.hits += 1
+			return info
+		self.misses += 1
+		info = extract(url)
+		if info:
+			self.put(info, url=url)
+		return info
+
+	def get_search(self, query):
+		return self._lookup(f"search:{query.strip().lower()}")
+
+	def put_search(self, query, results, ttl=None):
+		self._store(f"search:{query.strip().lower()}", results, ttl or self.SEARCH_TTL)
+
+	def stats(self):
+		with self.lock:
+			entries = self.db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+		return {'hits': self.hits, 'misses': self.misses, 'entries': entries}
+
+	def close(self):
+		with self.lock:
+			self.db.close()
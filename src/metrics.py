@@ -0,0 +1,212 @@
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import nullcontext
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from paths import get_data_dir
+
+PREFIX = 'ytdl_'
+SLOWEST_JOBS = 5
+_NULL_TIMER = nullcontext()
+
+
+def _escape(value):
+	return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _series(name, labels):
+	if not labels:
+		return name
+	return name + '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+class _Timer:
+	__slots__ = ('metrics', 'name', 'labels', 'started')
+
+	def __init__(self, metrics, name, labels):
+		self.metrics = metrics
+		self.name = name
+		self.labels = labels
+
+	def __enter__(self):
+		self.started = time.perf_counter()
+		return self
+
+	def __exit__(self, *exc_info):
+		self.metrics.observe(self.name, time.perf_counter() - self.started, **self.labels)
+
+
+class Metrics:
+	"""Counters and stage timers for the whole app, exported as Prometheus text or JSON.
+
+	Every instrumented component takes an optional instance. A disabled one returns
+	before taking any lock and hands out a shared no-op timer, so instrumentation left
+	in the hot paths costs one attribute check when nobody is looking.
+	"""
+	def __init__(self, enabled=True):
+		self.enabled = enabled
+		self.lock = threading.Lock()
+		self.counters = defaultdict(float)  # (name, labels) -> value
+		self.timers = {}  # (name, labels) -> [count, sum, max]
+		self.collectors = []  # callables returning {name: value}, read at export time
+		self.started = time.time()
+
+	def count(self, name, value=1, **labels):
+		if not self.enabled:
+			return
+		key = (name, tuple(sorted(labels.items())))
+		with self.lock:
+			self.counters[key] += value
+
+	def observe(self, name, seconds, **labels):
+		if not self.enabled:
+			return
+		key = (name, tuple(sorted(labels.items())))
+		with self.lock:
+			timer = self.timers.get(key)
+			if timer is None:
+				self.timers[key] = [1, seconds, seconds]
+			else:
+				timer[0] += 1
+				timer[1] += seconds
+				timer[2] = max(timer[2], seconds)
+
+	def timer(self, name, **labels):
+		"""context manager that observes how long its block took"""
+		if not self.enabled:
+			return _NULL_TIMER
+		return _Timer(self, name, labels)
+
+	def add_collector(self, collector):
+		"""registers a callable whose {name: value} gauges are read on every export"""
+		self.collectors.append(collector)
+
+	def record_job(self, job):
+		"""scheduler listener: folds a finished job's stage timings and bytes into the totals"""
+		if not self.enabled or job.status not in ('done', 'failed'):
+			return
+		self.count('jobs_total', status=job.status)
+		for stage, seconds in job.timings.items():
+			self.observe('stage_seconds', seconds, stage=stage)
+		if job.ttfb is not None:
+			self.observe('ttfb_seconds', job.ttfb)
+		if job.bytes_downloaded:
+			self.count('downloaded_bytes_total', job.bytes_downloaded)
+
+	def _gauges(self):
+		gauges = {}
+		for collector in self.collectors:
+			try:
+				gauges.update(collector())
+			except Exception:
+				# a closed cache shouldn't take the whole export down
+				continue
+		return gauges
+
+	def snapshot(self):
+		with self.lock:
+			counters = {_series(name, labels): value for (name, labels), value in self.counters.items()}
+			timers = {
+				_series(name, labels): {'count': count, 'sum': total, 'max': peak}
+				for (name, labels), (count, total, peak) in self.timers.items()
+			}
+		return {
+			'started': self.started,
+			'uptime': time.time() - self.started,
+			'counters': counters,
+			'timers': timers,
+			'gauges': self._gauges(),
+		}
+
+	def prometheus(self):
+		"""the current values in the Prometheus text exposition format"""
+		lines = []
+		with self.lock:
+			counters = sorted(self.counters.items())
+			timers = sorted(self.timers.items())
+		for (name, labels), value in counters:
+			lines.append(f"{PREFIX}{_series(name, labels)} {value:g}")
+		for (name, labels), (count, total, peak) in timers:
+			lines.append(f"{PREFIX}{_series(name + '_count', labels)} {count}")
+			lines.append(f"{PREFIX}{_series(name + '_sum', labels)} {total:.6f}")
+			lines.append(f"{PREFIX}{_series(name + '_max', labels)} {peak:.6f}")
+		for name, value in sorted(self._gauges().items()):
+			lines.append(f"{PREFIX}{name} {value:g}")
+		return '\n'.join(lines) + '\n'
+
+	def serve(self, port, host='127.0.0.1'):
+		"""serves /metrics (Prometheus text) and /metrics.json on a local port from a daemon thread"""
+		metrics = self
+
+		class Handler(BaseHTTPRequestHandler):
+			def do_GET(self):
+				if self.path == '/metrics':
+					body, content_type = metrics.prometheus().encode(), 'text/plain; version=0.0.4'
+				elif self.path == '/metrics.json':
+					body, content_type = json.dumps(metrics.snapshot()).encode(), 'application/json'
+				else:
+					self.send_error(404)
+					return
+				self.send_response(200)
+				self.send_header('Content-Type', content_type)
+				self.send_header('Content-Length', str(len(body)))
+				self.end_headers()
+				self.wfile.write(body)
+
+			def log_message(self, format, *args):
+				pass
+
+		server = ThreadingHTTPServer((host, port), Handler)
+		threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+		return server
+
+
+def _describe(values):
+	values = sorted(values)
+	def percentile(share):
+		return values[min(len(values) - 1, int(share * len(values)))]
+	return {
+		'count': len(values),
+		'total': sum(values),
+		'mean': sum(values) / len(values),
+		'p50': percentile(0.5),
+		'p95': percentile(0.95),
+		'max': values[-1],
+	}
+
+
+def batch_summary(jobs, metrics=None):
+	"""Where the time went in a batch: per-stage totals and percentiles, and the slowest jobs."""
+	stages = defaultdict(list)
+	for job in jobs:
+		for stage, seconds in job.timings.items():
+			stages[stage].append(seconds)
+	slowest = sorted((job for job in jobs if job.timings), key=lambda job: sum(job.timings.values()), reverse=True)
+	summary = {
+		'created': time.time(),
+		'jobs': len(jobs),
+		'status': dict(Counter(job.status for job in jobs)),
+		'bytes': sum(job.bytes_downloaded for job in jobs),
+		'failed_attempts': sum(len(job.failures) for job in jobs),
+		'stages': {stage: _describe(values) for stage, values in stages.items()},
+		'slowest': [
+			{'title': job.title, 'link': job.link, 'seconds': sum(job.timings.values()), 'timings': job.timings}
+			for job in slowest[:SLOWEST_JOBS]
+		],
+	}
+	if metrics and metrics.enabled:
+		summary['metrics'] = metrics.snapshot()
+	return summary
+
+
+def write_batch_summary(jobs, metrics=None, path=None):
+	"""Saves the summary of the last batch next to the app's other data and returns its path."""
+	path = str(path or get_data_dir() / 'batch_summary.json')
+	temp_path = f"{path}.tmp"
+	with open(temp_path, 'w', encoding='utf-8') as f:
+		json.dump(batch_summary(jobs, metrics), f, indent=1, default=str)
+	os.replace(temp_path, path)
+	return path
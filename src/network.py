@@ -0,0 +1,204 @@
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+import weakref
+from collections import defaultdict
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import yt_dlp
+from yt_dlp.networking.exceptions import HTTPError
+
+from transfer import MAX_CONNECTIONS
+
+# priority classes, lower goes first
+INTERACTIVE = 0  # search pages and thumbnails, someone is looking at the screen
+METADATA = 1  # link titles, playlist listings
+BULK = 2  # media downloads
+
+DEFAULT_HOST_LIMIT = 6
+# hosts whose limit isn't the default, matched on the end of the hostname
+HOST_LIMITS = {
+	'googlevideo.com': MAX_CONNECTIONS,  # media streams, already bounded by the transfer profiles
+}
+# hosts that answer to the same rate limiter, so a 429 from one pauses all of them
+HOST_GROUPS = {
+	'youtube.com': 'youtube',
+	'youtu.be': 'youtube',
+	'googlevideo.com': 'youtube',
+	'ytimg.com': 'youtube',
+	'googleapis.com': 'youtube',
+}
+
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 120.0
+BURST_SECONDS = 0.5
+
+
+def _match(host, table, default):
+	for suffix, value in table.items():
+		if host == suffix or host.endswith('.' + suffix):
+			return value
+	return default
+
+
+def parse_retry_after(value):
+	"""Retry-After in seconds; the HTTP date form is rare enough to treat as absent"""
+	try:
+		return max(float(value), 0.0)
+	except (TypeError, ValueError):
+		return None
+
+
+class NetworkGovernor:
+	"""Coordinates every network consumer in the app: search, thumbnails, metadata and downloads.
+
+	* per-host connection limits, handed out by priority so a waiting search or thumbnail
+	  gets the next free slot before queued bulk downloads
+	* a global connection budget for bulk downloads
+	* an optional global bandwidth cap; bulk reads are paced to it while interactive reads
+	  pass straight through and only use up the bulk share
+	* a shared backoff when a host answers 429, which pauses new requests to every host in
+	  its group (YouTube pages, streams and images) rather than only the caller that saw it
+	"""
+	def __init__(self, bandwidth=None, bulk_connections=MAX_CONNECTIONS):
+		self.bandwidth = bandwidth  # bytes per second, None for unlimited
+		self.bulk_connections = bulk_connections
+		self.condition = threading.Condition()
+		self.active = defaultdict(int)
+		self.active_bulk = 0
+		self.waiting = defaultdict(list)  # host -> heap of (priority, ticket)
+		self.tickets = itertools.count()
+		self.blocked_until = {}
+		self.strikes = defaultdict(int)
+		self.pace_lock = threading.Lock()
+		self.next_free = 0.0
+
+	@staticmethod
+	def _host(url):
+		return (urlsplit(url).hostname or '').lower()
+
+	def acquire(self, url, priority=BULK):
+		"""blocks until a connection to the url's host may be opened; returns the release callable"""
+		host = self._host(url)
+		group = _match(host, HOST_GROUPS, host)
+		limit = _match(host, HOST_LIMITS, DEFAULT_HOST_LIMIT)
+		ticket = (priority, next(self.tickets))
+		with self.condition:
+			heapq.heappush(self.waiting[host], ticket)
+			while True:
+				blocked = self.blocked_until.get(group, 0) - time.monotonic()
+				if (blocked <= 0 and self.waiting[host][0] == ticket and self.active[host] < limit
+						and (priority < BULK or self.active_bulk < self.bulk_connections)):
+					break
+				self.condition.wait(blocked if blocked > 0 else None)
+			heapq.heappop(self.waiting[host])
+			self.active[host] += 1
+			if priority == BULK:
+				self.active_bulk += 1
+			# the next waiter for this host may be able to go too
+			self.condition.notify_all()
+
+		released = []
+		def release():
+			if released:
+				return
+			released.append(True)
+			with self.condition:
+				self.active[host] -= 1
+				if priority == BULK:
+					self.active_bulk -= 1
+				self.condition.notify_all()
+		return release
+
+	@contextmanager
+	def slot(self, url, priority=BULK):
+		release = self.acquire(url, priority)
+		try:
+			yield
+		finally:
+			release()
+
+	def consume(self, nbytes, priority=BULK):
+		"""accounts for bytes read; bulk reads sleep as long as it takes to stay under the cap"""
+		if not self.bandwidth or not nbytes:
+			return
+		with self.pace_lock:
+			now = time.monotonic()
+			self.next_free = max(self.next_free, now - BURST_SECONDS) + nbytes / self.bandwidth
+			delay = self.next_free - now
+		if priority == BULK and delay > 0:
+			time.sleep(delay)
+
+	def report(self, url, status, retry_after=None):
+		"""feeds a response status back; a 429 backs off the whole host group"""
+		host = self._host(url)
+		group = _match(host, HOST_GROUPS, host)
+		with self.condition:
+			if status != 429:
+				if status < 400 and self.strikes.get(group):
+					self.strikes[group] = 0
+				return
+			self.strikes[group] += 1
+			delay = parse_retry_after(retry_after)
+			if delay is None:
+				delay = min(BACKOFF_BASE * 2 ** (self.strikes[group] - 1), BACKOFF_MAX)
+				delay *= random.uniform(0.5, 1.0)
+			until = time.monotonic() + delay
+			if until > self.blocked_until.get(group, 0):
+				self.blocked_until[group] = until
+				logging.warning(f"{host} is rate limiting, pausing {group} requests for {delay:.0f}s")
+
+	def wrap_response(self, response, release, priority=BULK):
+		"""makes a yt-dlp response pace its reads and give its slot back once it's done with"""
+		read = response.read
+		close = response.close
+		# the downloader stops reading at Content-Length without ever seeing EOF or closing
+		remaining = [int(response.headers.get('Content-Length') or -1)]
+
+		def governed_read(amt=None):
+			data = read(amt)
+			self.consume(len(data), priority)
+			remaining[0] -= len(data)
+			if not data or amt is None or remaining[0] == 0:
+				release()
+			return data
+
+		def governed_close():
+			release()
+			return close()
+
+		response.read = governed_read
+		response.close = governed_close
+		# extractors often read a page and drop the response without closing it
+		weakref.finalize(response, release)
+		return response
+
+
+class GovernedYoutubeDL(yt_dlp.YoutubeDL):
+	"""YoutubeDL whose every HTTP request (pages, API calls, media) goes through the governor."""
+	def __init__(self, params, governor=None, priority=BULK):
+		super().__init__(params)
+		self.governor = governor
+		self.priority = priority
+
+	def urlopen(self, req):
+		if self.governor is None:
+			return super().urlopen(req)
+
+		url = req if isinstance(req, str) else req.url
+		release = self.governor.acquire(url, self.priority)
+		try:
+			response = super().urlopen(req)
+		except HTTPError as e:
+			release()
+			self.governor.report(url, e.status, e.response.get_header('Retry-After'))
+			raise
+		except BaseException:
+			release()
+			raise
+		self.governor.report(url, response.status)
+		return self.governor.wrap_response(response, release, self.priority)
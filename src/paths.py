@@ -0,0 +1,23 @@
+import os
+import sys
+from pathlib import Path
+
+APP_NAME = "YoutubeDownloader"
+
+
+def get_base_path() -> Path:
+	"""Returns the folder bundled resources live in (PyInstaller's temp dir when frozen)."""
+	try:
+		return Path(sys._MEIPASS)
+	except AttributeError:
+		return Path(os.path.dirname(os.path.abspath(__file__)))
+
+
+def get_data_dir() -> Path:
+	"""Returns (and creates) the per-user folder for caches and other persistent state."""
+	if root := os.environ.get('LOCALAPPDATA'):
+		data_dir = Path(root) / APP_NAME
+	else:
+		data_dir = Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache') / APP_NAME
+	data_dir.mkdir(parents=True, exist_ok=True)
+	return data_dir
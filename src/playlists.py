@@ -0,0 +1,71 @@
+import re
+
+from network import GovernedYoutubeDL, METADATA
+
+YOUTUBE_WATCH_URL = "https://www.youtube.com/watch?v={video_id}"
+
+COLLECTION_URL = re.compile(r'youtube\.com/(?:playlist\?|@|channel/|c/|user/)|[?&]list=')
+SINGLE_VIDEO_URL = re.compile(r'[?&]v=|youtu\.be/|/shorts/[\w-]{11}')
+
+# a channel root lists its tabs (videos, shorts, live), each of which is a playlist itself
+MAX_NESTING = 2
+
+FLAT_OPTIONS = {
+	'quiet': True,
+	'extract_flat': 'in_playlist',
+	'skip_download': True,
+}
+
+
+def is_collection_url(url: str) -> bool:
+	"""Whether a url names a playlist or channel rather than a single video.
+
+	A watch url that also carries a playlist id stays a single video, like it always has.
+	"""
+	return bool(COLLECTION_URL.search(url)) and not SINGLE_VIDEO_URL.search(url)
+
+
+def get_collection_info(url: str, governor=None) -> dict:
+	"""Returns a playlist or channel's id and title without enumerating its entries."""
+	with GovernedYoutubeDL(FLAT_OPTIONS, governor, METADATA) as ydl:
+		info = ydl.extract_info(url, download=False, process=False) or {}
+	return {'id': info.get('id'), 'title': info.get('title') or url}
+
+
+def _walk(ydl, url, depth):
+	info = ydl.extract_info(url, download=False, process=False)
+	if not info:
+		return
+	if info.get('_type') in ('url', 'url_transparent'):
+		# e.g. a /c/ name that redirects to the channel
+		if depth < MAX_NESTING:
+			yield from _walk(ydl, info['url'], depth + 1)
+		return
+
+	# entries is the extractor's own generator here, continuation pages are only
+	# requested once the previous page has been consumed
+	for entry in info.get('entries') or []:
+		if not entry:
+			continue
+		if entry.get('ie_key') == 'YoutubeTab' or entry.get('_type') == 'playlist':
+			if depth < MAX_NESTING and entry.get('url'):
+				yield from _walk(ydl, entry['url'], depth + 1)
+			continue
+		if not entry.get('id'):
+			continue
+		# only what the queue needs, the full metadata is extracted when the video downloads
+		yield {
+			'id': entry['id'],
+			'title': entry.get('title'),
+			'url': entry.get('url') or YOUTUBE_WATCH_URL.format(video_id=entry['id']),
+		}
+
+
+def iter_collection(url: str, governor=None):
+	"""Lazily yields {'id', 'title', 'url'} for every video in a playlist or channel.
+
+	Nothing beyond the page currently being read is held in memory, so a channel with
+	thousands of uploads can be consumed as a stream.
+	"""
+	with GovernedYoutubeDL(FLAT_OPTIONS, governor, METADATA) as ydl:
+		yield from _walk(ydl, url, 0)
@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from urllib.parse import urlparse, parse_qs
+
+from engine import extract_link_info
+from metadata_cache import MetadataCache, normalize_url
+from playlists import is_collection_url, get_collection_info
+
+FORMATS_TTL = 3600  # for stream urls that don't say when they expire
+EXPIRY_MARGIN = 1800  # a download started closer than this to the urls expiring may outlive them
+
+
+def info_expires(info, now=None):
+	"""when a prefetched info dict goes stale: its signed stream urls' expire= minus a margin"""
+	now = now or time.time()
+	if not info.get('formats'):
+		return now + MetadataCache.METADATA_TTL
+	stamps = []
+	for fmt in info['formats']:
+		if values := parse_qs(urlparse(fmt.get('url') or '').query).get('expire'):
+			try:
+				stamps.append(float(values[0]))
+			except ValueError:
+				pass
+	if stamps:
+		return min(stamps) - EXPIRY_MARGIN
+	return now + FORMATS_TTL
+
+
+class MetadataPrefetcher:
+	"""Extracts link metadata ahead of the download on its own bounded pool.
+
+	Requests are coalesced by video (normalized url), so the same video added twice, or
+	asked for by the queue and then by the download, is only extracted once. Finished
+	info dicts stay in a small LRU (and the metadata cache, when given) for the download
+	to pick up instead of extracting again, but only until their signed stream urls are
+	about to expire; after that a lookup counts as a miss and extracts afresh.
+	"""
+	def __init__(self, metadata_cache=None, governor=None, workers=3, max_results=500):
+		self.metadata_cache = metadata_cache
+		self.governor = governor
+		self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='metadata')
+		self.lock = threading.Lock()
+		self.in_flight = {}  # key -> Future
+		self.results = OrderedDict()  # key -> (info, expires)
+		self.max_results = max_results
+
+	def _extract(self, link):
+		return extract_link_info(link, self.governor)
+
+	def _load(self, link, need_formats):
+		if is_collection_url(link):
+			# only the name, the videos are listed when the batch runs
+			return get_collection_info(link, self.governor)
+		if self.metadata_cache:
+			info = self.metadata_cache.get_or_extract(link, self._extract, need_formats=need_formats)
+			if info.get('formats') and info_expires(info) <= time.time():
+				# the disk cache kept stream urls that are about to expire
+				info = self._extract(link)
+				self.metadata_cache.put(info, url=link)
+			return info
+		return self._extract(link)
+
+	def _run(self, key, link, need_formats):
+		try:
+			info = self._load(link, need_formats)
+			with self.lock:
+				self.results[key] = (info, info_expires(info))
+				self.results.move_to_end(key)
+				while len(self.results) > self.max_results:
+					self.results.popitem(last=False)
+			return info
+		finally:
+			with self.lock:
+				self.in_flight.pop(key, None)
+
+	def submit(self, link, callback=None, need_formats=False):
+		"""returns a Future for the link's info; ``callback(future)`` runs once it is done"""
+		key = normalize_url(link)
+		with self.lock:
+			info, expires = self.results.get(key, (None, 0))
+			if info is not None and expires <= time.time():
+				del self.results[key]
+				info = None
+			if info is not None and (info.get('formats') or not need_formats):
+				self.results.move_to_end(key)
+				future = Future()
+				future.set_result(info)
+			elif key in self.in_flight:
+				future = self.in_flight[key]
+			else:
+				future = self.executor.submit(self._run, key, link, need_formats)
+				self.in_flight[key] = future
+		if callback:
+			future.add_done_callback(callback)
+		return future
+
+	def submit_many(self, links, callback=None):
+		"""queues a whole batch at once, e.g. everything restored from the journal"""
+		return {link: self.submit(link, callback and (lambda future, link=link: callback(link, future))) for link in links}
+
+	def get(self, link, need_formats=False):
+		"""blocks until the link's info is available, joining a prefetch that's already running"""
+		info = self.submit(link).result()
+		if need_formats and not info.get('formats'):
+			info = self.submit(link, need_formats=True).result()
+		return info
+
+	def shutdown(self):
+		self.executor.shutdown(wait=False, cancel_futures=True)
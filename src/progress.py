@@ -0,0 +1,109 @@
+import threading
+import time
+
+# share of a job's progress bar slice spent downloading; the rest is conversion
+DOWNLOAD_WEIGHT = 0.7
+
+
+def format_bytes(count):
+	for unit in ('B', 'KB', 'MB'):
+		if count < 1024:
+			return f"{count:.0f} {unit}" if unit == 'B' else f"{count:.1f} {unit}"
+		count /= 1024
+	return f"{count:.1f} GB"
+
+
+def format_eta(seconds):
+	if seconds is None:
+		return "--:--"
+	minutes, seconds = divmod(int(seconds), 60)
+	hours, minutes = divmod(minutes, 60)
+	return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+class ProgressAggregator:
+	"""Collects progress from every concurrent job and hands out coalesced snapshots.
+
+	yt-dlp progress hooks and stage changes only update plain dicts under a lock, so
+	they are cheap to call from any worker thread. Consumers call ``snapshot()`` at
+	whatever rate they redraw (the window does it at 10 Hz) instead of reacting to
+	every hook invocation.
+	"""
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.reset([])
+
+	def reset(self, job_ids):
+		"""starts tracking a new batch"""
+		with self.lock:
+			self.jobs = {job_id: {'status': 'queued', 'title': None, 'files': {}, 'convert': 0.0} for job_id in job_ids}
+			self.started = time.monotonic()
+			self.version = 0
+
+	def on_status(self, job):
+		"""scheduler listener: records stage changes"""
+		with self.lock:
+			entry = self.jobs.setdefault(job.id, {'status': job.status, 'title': None, 'files': {}, 'convert': 0.0})
+			entry['status'] = job.status
+			entry['title'] = job.title or entry['title']
+			self.version += 1
+
+	def on_download(self, job_id, data):
+		"""yt-dlp progress hook payload for one of the job's files"""
+		total = data.get('total_bytes') or data.get('total_bytes_estimate') or 0
+		downloaded = data.get('downloaded_bytes') or 0
+		with self.lock:
+			entry = self.jobs.get(job_id)
+			if entry is None:
+				return
+			entry['files'][data.get('filename')] = {
+				'downloaded': downloaded,
+				'total': max(total, downloaded),
+				'speed': (data.get('speed') or 0) if data['status'] == 'downloading' else 0,
+			}
+			self.version += 1
+
+	def on_convert(self, job_id, fraction):
+		"""conversion progress for a job, 0..1"""
+		with self.lock:
+			if entry := self.jobs.get(job_id):
+				entry['convert'] = min(max(fraction, 0.0), 1.0)
+				self.version += 1
+
+	def _job_fraction(self, entry):
+		if entry['status'] in ('done', 'failed'):
+			return 1.0
+		files = entry['files'].values()
+		total = sum(f['total'] for f in files)
+		downloaded = sum(f['downloaded'] for f in files)
+		download = downloaded / total if total else 0.0
+		if entry['status'] == 'postprocessing':
+			return DOWNLOAD_WEIGHT + (1 - DOWNLOAD_WEIGHT) * entry['convert']
+		return DOWNLOAD_WEIGHT * download
+
+	def snapshot(self):
+		"""returns the aggregate state of the batch"""
+		with self.lock:
+			entries = list(self.jobs.values())
+			version = self.version
+			elapsed = time.monotonic() - self.started
+
+		files = [f for entry in entries for f in entry['files'].values()]
+		speed = sum(f['speed'] for f in files)
+		remaining = sum(f['total'] - f['downloaded'] for f in files)
+		counts = {status: sum(entry['status'] == status for entry in entries)
+				  for status in ('queued', 'downloading', 'postprocessing', 'done', 'failed')}
+		fraction = sum(self._job_fraction(entry) for entry in entries) / len(entries) if entries else 0.0
+		current = next((entry['title'] for entry in reversed(entries)
+						if entry['status'] in ('downloading', 'postprocessing') and entry['title']), None)
+		return {
+			'version': version,
+			'jobs': len(entries),
+			**counts,
+			'fraction': fraction,
+			'downloaded_bytes': sum(f['downloaded'] for f in files),
+			'speed': speed,
+			'eta': remaining / speed if speed and remaining else None,
+			'elapsed': elapsed,
+			'current': current,
+		}
@@ -0,0 +1,135 @@
+import errno
+import http.client
+import json
+import os
+import random
+import re
+import socket
+import time
+
+from yt_dlp.networking.exceptions import HTTPError, TransportError
+from yt_dlp.utils import DownloadError
+
+from paths import get_data_dir
+
+# failure categories
+NETWORK = 'network'  # timeouts, resets, 5xx: try again
+RATE_LIMITED = 'rate_limited'  # 429: try again once the backoff has passed
+EXPIRED = 'expired'  # 403 on a stream url, the signature expired: extract again and retry
+ENCODER = 'encoder'  # a hardware encoder failed, the next one is tried on the same source
+CONVERSION = 'conversion'  # ffmpeg failed even with the software encoder
+INVALID = 'invalid'  # bad url, private or removed video: retrying won't help
+DISK = 'disk'  # out of space, no permission
+UNKNOWN = 'unknown'
+
+# attempts allowed per category, anything not listed fails on the first try
+MAX_ATTEMPTS = {
+	NETWORK: 4,
+	RATE_LIMITED: 4,
+	EXPIRED: 2,
+	UNKNOWN: 2,
+}
+
+MESSAGE_PATTERNS = (
+	(RATE_LIMITED, re.compile(r'HTTP Error 429|Too Many Requests', re.I)),
+	(EXPIRED, re.compile(r'HTTP Error 403|Forbidden', re.I)),
+	(INVALID, re.compile(
+		r'Invalid URL|Unsupported URL|is not a valid URL|Video unavailable|Private video|'
+		r'has been removed|account associated with this video has been terminated|'
+		r'Sign in to confirm your age|members-only|HTTP Error 404|HTTP Error 410', re.I)),
+	(NETWORK, re.compile(
+		r'timed out|Connection (?:reset|refused|aborted)|Temporary failure in name resolution|'
+		r'Remote end closed|IncompleteRead|Read timed out|HTTP Error 5\d\d|Unable to download webpage|'
+		r'giving up after \d+ (?:fragment )?retries', re.I)),
+	(DISK, re.compile(r'No space left on device|Permission denied', re.I)),
+)
+
+
+class ConversionError(Exception):
+	"""ffmpeg exited with an error while converting a source."""
+
+
+def _error_chain(error):
+	"""the error plus everything it wraps; yt-dlp keeps the original in exc_info"""
+	seen = set()
+	while error is not None and id(error) not in seen:
+		seen.add(id(error))
+		yield error
+		if isinstance(error, DownloadError) and error.exc_info and error.exc_info[1] is not error:
+			error = error.exc_info[1]
+		else:
+			error = error.__cause__ or error.__context__
+
+
+def classify(error):
+	"""Works out why a stage failed, which decides whether and how it is retried."""
+	for cause in _error_chain(error):
+		if isinstance(cause, ConversionError):
+			return CONVERSION
+		if isinstance(cause, HTTPError):
+			if cause.status == 429:
+				return RATE_LIMITED
+			if cause.status == 403:
+				return EXPIRED
+			if cause.status in (404, 410):
+				return INVALID
+			if cause.status >= 500:
+				return NETWORK
+		if isinstance(cause, (TransportError, ConnectionError, TimeoutError, socket.timeout, http.client.IncompleteRead)):
+			return NETWORK
+		if isinstance(cause, OSError) and cause.errno in (errno.ENOSPC, errno.EACCES, errno.EROFS):
+			return DISK
+
+	message = str(error)
+	for category, pattern in MESSAGE_PATTERNS:
+		if pattern.search(message):
+			return category
+	return UNKNOWN
+
+
+class RetryPolicy:
+	"""Decides whether a failed attempt is retried and how long to wait first.
+
+	Delays grow exponentially with full jitter, so jobs that failed together
+	don't all come back at the same moment.
+	"""
+	def __init__(self, base_delay=2.0, max_delay=60.0, max_attempts=None):
+		self.base_delay = base_delay
+		self.max_delay = max_delay
+		self.max_attempts = max_attempts or MAX_ATTEMPTS
+
+	def should_retry(self, category, attempt):
+		return attempt < self.max_attempts.get(category, 1)
+
+	def delay(self, category, attempt):
+		base = self.base_delay * (4 if category == RATE_LIMITED else 1)
+		return random.uniform(0, min(self.max_delay, base * 2 ** (attempt - 1)))
+
+
+def failure_report(jobs):
+	"""Collects every job that failed, or only got through after retries or an encoder fallback."""
+	failed = []
+	recovered = []
+	for job in jobs:
+		if not job.failures:
+			continue
+		entry = {
+			'link': job.link,
+			'title': job.title,
+			'status': job.status,
+			'error': job.error,
+			'category': job.failures[-1]['category'],
+			'attempts': job.failures,
+		}
+		(recovered if job.status == 'done' else failed).append(entry)
+	return {'created': time.time(), 'total': len(jobs), 'failed': failed, 'recovered': recovered}
+
+
+def write_failure_report(jobs, path=None):
+	"""Saves the report of the last batch next to the app's other data and returns its path."""
+	path = str(path or get_data_dir() / 'failure_report.json')
+	temp_path = f"{path}.tmp"
+	with open(temp_path, 'w', encoding='utf-8') as f:
+		json.dump(failure_report(jobs), f, indent=1, default=str)
+	os.replace(temp_path, path)
+	return path
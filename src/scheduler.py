@@ -0,0 +1,160 @@
+import os
+import queue
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+
+
+class Job:
+	"""A single queued download and everything the pipeline learns about it."""
+	def __init__(self, link, settings, job_id=None, info=None, parent=None):
+		self.id = job_id or str(uuid.uuid4())[:8]
+		self.link = link
+		self.parent = parent  # playlist or channel url the job was expanded from
+		self.key = None  # extractor:id once known, see archive.archive_key
+		self.format_id = None
+		self.settings = settings
+		self.info = info
+		self.status = 'queued'
+		self.title = None
+		self.partial_path = None
+		self.source_path = None
+		self.output_path = None
+		self.strategy = None
+		self.archived_copy = None  # archived file on another drive, the postprocess stage copies it to output_path
+		self.encoder = None  # encoder the conversion actually used, after any fallback
+		self.error = None
+		self.failures = []  # every failed attempt: stage, category, error, attempt
+		self.refresh_info = False  # the extracted info went stale and must not come from the cache
+		# filled in by the pipeline stages, in seconds
+		self.timings = {}
+		self.ttfb = None
+		self.bytes_downloaded = 0
+		self.duration = None  # of the video, for conversion progress
+		self.transfer = None  # resolved transfer settings the download used
+
+	def __repr__(self):
+		return f"<Job {self.id} {self.status} {self.link}>"
+
+
+class JobScheduler:
+	"""Runs jobs through a download pool and a separate, bounded postprocessing pool.
+
+	Network-bound downloads and CPU/GPU-bound conversions run in different pools so
+	they overlap instead of alternating. Audio conversions get a pool of their own (sized
+	to the cores unless told otherwise): each one is a single threaded ffmpeg process, so
+	a batch of mp3 encodes can use every core without holding up the video conversions. Every status change is published as a dict
+	on ``self.events`` which the UI (or any other consumer) drains at its own pace.
+	"""
+	def __init__(self, download_workers=3, postprocess_workers=None, events=None, audio_workers=None):
+		if postprocess_workers is None:
+			postprocess_workers = max(1, (os.cpu_count() or 2) // 4)
+		if audio_workers is None:
+			audio_workers = os.cpu_count() or 2
+		self.download_workers = download_workers
+		self.postprocess_workers = postprocess_workers
+		self.audio_workers = audio_workers
+		self.events = events if events is not None else queue.Queue()
+		self.download_pool = ThreadPoolExecutor(
+			max_workers=download_workers, thread_name_prefix='download'
+		)
+		self.postprocess_pool = ThreadPoolExecutor(
+			max_workers=postprocess_workers, thread_name_prefix='postprocess'
+		)
+		self.audio_pool = ThreadPoolExecutor(
+			max_workers=audio_workers, thread_name_prefix='audio'
+		)
+		self.cancelled = threading.Event()
+		self.listeners = []
+
+	def emit(self, job, status, **detail):
+		"""records the job's new status and publishes it on the event channel"""
+		job.status = status
+		for listener in self.listeners:
+			listener(job)
+		self.events.put({'job': job.id, 'status': status, 'title': job.title, 'link': job.parent or job.link, **detail})
+
+	def submit(self, job, download, postprocess):
+		"""queues a job; the returned future resolves with the job once it is done or failed"""
+		finished = Future()
+
+		def fail(error):
+			job.error = str(error)
+			category = job.failures[-1]['category'] if job.failures else None
+			self.emit(job, 'failed', error=job.error, category=category)
+			finished.set_result(job)
+
+		def postprocess_stage():
+			if self.cancelled.is_set():
+				raise RuntimeError("Cancelled")
+			self.emit(job, 'postprocessing')
+			postprocess(job)
+
+		def after_postprocess(future):
+			if future.cancelled():
+				fail(RuntimeError("Cancelled"))
+				return
+			if error := future.exception():
+				fail(error)
+				return
+			self.emit(job, 'done', output=job.output_path, strategy=job.strategy)
+			finished.set_result(job)
+
+		def download_stage():
+			if self.cancelled.is_set():
+				raise RuntimeError("Cancelled")
+			self.emit(job, 'downloading')
+			download(job)
+
+		def after_download(future):
+			if future.cancelled():
+				fail(RuntimeError("Cancelled"))
+				return
+			if error := future.exception():
+				fail(error)
+				return
+			pool = self.audio_pool if job.settings['media_type'] == 'audio' else self.postprocess_pool
+			try:
+				pool.submit(postprocess_stage).add_done_callback(after_postprocess)
+			except RuntimeError as e:
+				fail(e)
+
+		self.emit(job, 'queued')
+		self.download_pool.submit(download_stage).add_done_callback(after_download)
+		return finished
+
+	def run(self, jobs, download, postprocess, window=None):
+		"""submits every job and blocks until all of them have finished or failed
+
+		``jobs`` can be any iterable. With a ``window`` at most that many jobs are queued
+		or running at once and the iterable is only advanced as earlier jobs finish, so a
+		lazily produced stream of jobs is never read far ahead of the downloads.
+		"""
+		self.cancelled.clear()
+		slots = threading.Semaphore(window) if window else None
+		submitted = []
+		futures = []
+		for job in jobs:
+			if slots:
+				slots.acquire()
+			if self.cancelled.is_set():
+				break
+			future = self.submit(job, download, postprocess)
+			if slots:
+				future.add_done_callback(lambda _: slots.release())
+			submitted.append(job)
+			futures.append(future)
+		wait(futures)
+		return submitted
+
+	def cancel(self):
+		"""stops jobs that have not started a stage yet; running stages finish normally"""
+		self.cancelled.set()
+
+	def shutdown(self, wait=False):
+		"""drops every stage that hasn't started; with ``wait`` also blocks until the running ones return"""
+		self.cancel()
+		# the download pool goes first, its callbacks still hand finished downloads to the others
+		self.download_pool.shutdown(wait=wait, cancel_futures=True)
+		self.postprocess_pool.shutdown(wait=wait, cancel_futures=True)
+		self.audio_pool.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,259 @@
+import logging
+import threading
+import time
+
+import yt_dlp
+from cachetools import TTLCache
+
+from network import GovernedYoutubeDL, INTERACTIVE
+from metrics import Metrics
+
+PAGE_SIZE = 10
+MAX_RESULTS = 500
+
+
+class SearchCancelled(Exception):
+	"""Raised inside yt-dlp when a newer search supersedes the running one."""
+
+
+class CancellableYoutubeDL(GovernedYoutubeDL):
+	"""YoutubeDL that refuses to start any further HTTP request once cancelled."""
+	def __init__(self, params, cancel_event, governor=None):
+		super().__init__(params, governor, INTERACTIVE)
+		self.cancel_event = cancel_event
+
+	def urlopen(self, req):
+		if self.cancel_event.is_set():
+			raise SearchCancelled()
+		return super().urlopen(req)
+
+
+class YoutubeSearchSession:
+	"""A live YouTube search whose flat entries are pulled from yt-dlp as they are needed.
+
+	yt-dlp's search extractor yields entries lazily and only fetches the next results
+	page when the previous one is used up, so holding on to the generator lets the
+	results pane load more on scroll without repeating the earlier pages.
+	"""
+	def __init__(self, query, cancel_event, governor=None):
+		self.ydl = CancellableYoutubeDL({
+			"quiet": True,
+			"extract_flat": "in_playlist",
+			"skip_download": True,
+			"ignoreerrors": True,
+			"noplaylist": True,
+			"extractor_args": {
+				"youtube": {
+					"skip": ["hls", "dash", "translated_subs"]
+				}
+			}
+		}, cancel_event, governor)
+		info = self.ydl.extract_info(f"ytsearch{MAX_RESULTS}:{query}", download=False, process=False)
+		self.entries = iter((info or {}).get('entries') or [])
+		self.exhausted = False
+
+	@property
+	def cancel_event(self):
+		return self.ydl.cancel_event
+
+	@cancel_event.setter
+	def cancel_event(self, event):
+		self.ydl.cancel_event = event
+
+	def pull(self):
+		"""returns the next entry, or None once the search has no more results"""
+		for entry in self.entries:
+			if self.cancel_event.is_set():
+				raise SearchCancelled()
+			if entry:
+				return yt_dlp.YoutubeDL.sanitize_info(entry)
+		self.exhausted = True
+		return None
+
+	def close(self):
+		self.ydl.close()
+
+
+class SearchService:
+	"""Debounced, single-worker, paginated search with coalescing and cancellation.
+
+	Only the most recent request is ever waiting. A different query cancels the one in
+	flight, while the same query again just joins it. Results stream to the callback a
+	few entries at a time as ``callback(query, entries, state)`` where state is
+	'partial' while a page is loading, then 'page', or 'end' when nothing is left.
+	Each callback gets the query exactly as its caller typed it, even when it joined a
+	request for the same query in another case. Callbacks run on the worker thread.
+
+	Loaded entries are kept per query in a bounded LRU with a TTL, backed by the
+	on-disk metadata cache when one is given.
+	"""
+	def __init__(self, session_factory=YoutubeSearchSession, debounce=0.3, cache_size=64, ttl=3600,
+				 metadata_cache=None, page_size=PAGE_SIZE, metrics=None):
+		self.session_factory = session_factory
+		self.metrics = metrics or Metrics(enabled=False)
+		self.debounce = debounce
+		self.page_size = page_size
+		self.metadata_cache = metadata_cache
+		self.cache = TTLCache(maxsize=cache_size, ttl=ttl)  # key -> {'entries': [...], 'exhausted': bool}
+		self.condition = threading.Condition()
+		self.pending = None  # {'key', 'query', 'callbacks': [(query, callback)], 'requested', 'more'}
+		self.in_flight = None  # same, plus the 'cancel' event and the 'delivered' entries
+		self.session = None  # (key, session) of the last query that hit the network
+		self.closed = False
+		self.worker = threading.Thread(target=self._run, name='search', daemon=True)
+		self.worker.start()
+
+	@staticmethod
+	def _key(query):
+		return query.strip().lower()
+
+	def get_cached(self, query):
+		"""returns (entries loaded so far, whether that's all of them) for a query, or None"""
+		with self.condition:
+			if cached := self.cache.get(self._key(query)):
+				return list(cached['entries']), cached['exhausted']
+		return None
+
+	def search(self, query, callback):
+		"""starts a new search; replaces whatever was being searched for before"""
+		self._request(query, callback, more=False)
+
+	def more(self, query, callback):
+		"""loads the next page of an existing search"""
+		self._request(query, callback, more=True)
+
+	def _request(self, query, callback, more):
+		key = self._key(query)
+		delivered = None
+		with self.condition:
+			in_flight = self.in_flight
+			if in_flight and in_flight['key'] == key and in_flight['more'] == more and not in_flight['cancel'].is_set():
+				in_flight['callbacks'].append((query, callback))
+				self.pending = None
+				delivered = list(in_flight['delivered'])
+			else:
+				if in_flight and in_flight['key'] != key:
+					in_flight['cancel'].set()
+
+				if self.pending and self.pending['key'] == key and self.pending['more'] == more:
+					self.pending['callbacks'].append((query, callback))
+				else:
+					self.pending = {'key': key, 'query': query, 'callbacks': [(query, callback)], 'more': more}
+				self.pending['requested'] = time.monotonic()
+				self.condition.notify()
+		if delivered:
+			# a caller joining a running search starts from an empty list, so it gets what already arrived
+			callback(query, delivered, 'partial')
+
+	def cancel(self):
+		"""drops the waiting search and cancels the running one"""
+		with self.condition:
+			self.pending = None
+			if self.in_flight:
+				self.in_flight['cancel'].set()
+
+	def shutdown(self):
+		with self.condition:
+			self.closed = True
+			self.pending = None
+			if self.in_flight:
+				self.in_flight['cancel'].set()
+			self.condition.notify()
+
+	def _next_request(self):
+		"""waits until a request has been quiet for the debounce period and claims it"""
+		with self.condition:
+			while not self.closed:
+				if self.pending is None:
+					self.condition.wait()
+					continue
+				# scrolling for more shouldn't wait, only typing is debounced
+				delay = 0 if self.pending['more'] else self.debounce
+				remaining = self.pending['requested'] + delay - time.monotonic()
+				if remaining > 0:
+					self.condition.wait(remaining)
+					continue
+				request, self.pending = self.pending, None
+				request['cancel'] = threading.Event()
+				request['delivered'] = []
+				self.in_flight = request
+				return request
+		return None
+
+	def _cached_entries(self, request):
+		with self.condition:
+			cached = self.cache.get(request['key'])
+		if cached is None and self.metadata_cache:
+			if stored := self.metadata_cache.get_search(request['query']):
+				cached = {'entries': stored.get('entries') or [], 'exhausted': stored.get('exhausted', False)}
+		return cached or {'entries': [], 'exhausted': False}
+
+	def _get_session(self, request, skip):
+		"""reuses the live session for this query, or starts one that skips entries already shown"""
+		if self.session and self.session[0] == request['key']:
+			session = self.session[1]
+			session.cancel_event = request['cancel']
+			return session
+
+		if self.session:
+			self.session[1].close()
+			self.session = None
+		session = self.session_factory(request['query'], request['cancel'])
+		for _ in range(skip):
+			if session.pull() is None:
+				break
+		self.session = (request['key'], session)
+		return session
+
+	def _deliver(self, request, entries, state):
+		if request['cancel'].is_set():
+			return
+		with self.condition:
+			request['delivered'].extend(entries)
+			callbacks = list(request['callbacks'])
+		for query, callback in callbacks:
+			callback(query, entries, state)
+
+	def _load_page(self, request):
+		cached = self._cached_entries(request)
+		entries = list(cached['entries'])
+		if cached['exhausted'] or (entries and not request['more']):
+			# a new search shows everything loaded before; scrolling further asks the network
+			with self.condition:
+				self.cache[request['key']] = {'entries': entries, 'exhausted': cached['exhausted']}
+			self._deliver(request, [] if request['more'] else entries, 'end' if cached['exhausted'] else 'page')
+			self.metrics.count('search_pages_total', source='cache')
+			return
+
+		session = self._get_session(request, skip=len(entries))
+		page = []
+		self.metrics.count('search_pages_total', source='network')
+		try:
+			with self.metrics.timer('search_seconds', page='more' if request['more'] else 'first'):
+				while len(page) < self.page_size and (entry := session.pull()) is not None:
+					page.append(entry)
+					self._deliver(request, [entry], 'partial')
+		except SearchCancelled:
+			# a half-read generator can't be trusted, start over next time
+			session.close()
+			self.session = None
+			raise
+
+		entries.extend(page)
+		with self.condition:
+			self.cache[request['key']] = {'entries': entries, 'exhausted': session.exhausted}
+		if self.metadata_cache:
+			self.metadata_cache.put_search(request['query'], {'entries': entries, 'exhausted': session.exhausted})
+		self._deliver(request, [], 'end' if session.exhausted else 'page')
+
+	def _run(self):
+		while (request := self._next_request()) is not None:
+			try:
+				self._load_page(request)
+			except SearchCancelled:
+				pass
+			except Exception as e:
+				logging.warning(f"Search error: {e}")
+				self._deliver(request, [], 'error')
+			with self.condition:
+				self.in_flight = None
@@ -0,0 +1,133 @@
+import tkinter as tk
+
+from customtkinter import CTkLabel
+
+
+class SearchResultList:
+	"""Virtualized list of search results inside a CTkScrollableFrame.
+
+	Only the rows within the viewport (plus a few either side) have widgets; the space
+	above and below them is taken up by two plain spacer frames sized to the rows they
+	stand in for, so the scrollbar still reflects the whole result set. Row widgets are
+	created on first need and then rebound to other entries as the list scrolls or a new
+	search starts, never destroyed.
+
+	``create_row(parent)`` builds one row widget, ``bind_row(row, entry)`` fills it in
+	and ``on_need_more()`` is called when the user gets close to the end of what's loaded.
+	"""
+	OVERSCAN = 3
+
+	def __init__(self, frame, create_row, bind_row, on_need_more, font=None, background='#183D3D'):
+		self.frame = frame
+		self.canvas = frame._parent_canvas
+		self.create_row = create_row
+		self.bind_row = bind_row
+		self.on_need_more = on_need_more
+		self.entries = []
+		self.exhausted = True
+		self.loading = False
+		self.rows = []  # pool, in display order while packed
+		self.first = 0
+		self.row_height = None
+		self.refresh_pending = False
+
+		self.message = CTkLabel(frame, text="", font=font)
+		self.top_spacer = tk.Frame(frame, height=1, bg=background, highlightthickness=0)
+		self.bottom_spacer = tk.Frame(frame, height=1, bg=background, highlightthickness=0)
+		self.top_spacer.pack(fill='x')
+		self.bottom_spacer.pack(fill='x')
+
+		# hear about every scroll, whether it came from the wheel, the scrollbar or a resize
+		scrollbar_set = frame._scrollbar.set
+		def on_scroll(first, last):
+			scrollbar_set(first, last)
+			self._schedule_refresh()
+		self.canvas.configure(yscrollcommand=on_scroll)
+
+	def reset(self):
+		"""empties the list for a new search, keeping the row widgets for reuse"""
+		self.entries = []
+		self.exhausted = False
+		self.loading = True
+		self.first = 0
+		self.message.pack_forget()
+		self.canvas.yview_moveto(0)
+		self._refresh()
+
+	def show_message(self, text):
+		self.message.configure(text=text)
+		self.message.pack(pady=10, before=self.top_spacer)
+
+	def clear(self):
+		self.reset()
+		self.loading = False
+		self.exhausted = True
+
+	def append(self, entries):
+		if not entries:
+			return
+		self.message.pack_forget()
+		self.entries.extend(entries)
+		self._schedule_refresh()
+
+	def set_state(self, loading, exhausted=False):
+		self.loading = loading
+		self.exhausted = exhausted
+		if not loading and not self.entries:
+			self.show_message("No results found.")
+		self._schedule_refresh()
+
+	def _schedule_refresh(self):
+		if not self.refresh_pending:
+			self.refresh_pending = True
+			self.frame.after_idle(self._refresh)
+
+	def _measure(self, row):
+		row.update_idletasks()
+		# rows are packed with pady, which customtkinter scales along with the widget
+		self.row_height = row.winfo_reqheight() + 2 * row._apply_widget_scaling(row.pady)
+
+	def _visible_range(self):
+		"""returns the (first, last) entry indexes in the viewport"""
+		height = self.row_height or 1
+		top = max(self.canvas.canvasy(0), 0)
+		viewport = max(self.canvas.winfo_height(), height)
+		first = int(top // height)
+		return first, min(int((top + viewport) // height) + 1, len(self.entries))
+
+	def _refresh(self):
+		self.refresh_pending = False
+		count = len(self.entries)
+		if count and self.row_height is None:
+			if not self.rows:
+				self.rows.append(self.create_row(self.frame))
+			self._measure(self.rows[0])
+
+		visible_first, visible_last = self._visible_range() if count else (0, 0)
+		first = max(visible_first - self.OVERSCAN, 0)
+		last = min(visible_last + self.OVERSCAN, count)
+
+		while len(self.rows) < last - first:
+			self.rows.append(self.create_row(self.frame))
+
+		for offset, row in enumerate(self.rows):
+			index = first + offset
+			if index < last:
+				entry = self.entries[index]
+				if row.entry is not entry:
+					row.entry = entry
+					self.bind_row(row, entry)
+				if not row.winfo_manager():
+					row.pack(fill='x', padx=5, pady=row.pady, before=self.bottom_spacer)
+			elif row.winfo_manager():
+				row.pack_forget()
+				row.entry = None
+
+		height = self.row_height or 0
+		self.top_spacer.configure(height=max(first * height, 1))
+		self.bottom_spacer.configure(height=max((count - last) * height, 1))
+		self.first = first
+
+		if count and not self.loading and not self.exhausted and visible_last >= count - self.OVERSCAN:
+			self.loading = True
+			self.on_need_more()
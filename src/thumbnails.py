@@ -0,0 +1,172 @@
+import hashlib
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from PIL import Image, ImageDraw
+
+from paths import get_data_dir
+from network import INTERACTIVE
+from metrics import Metrics
+
+YOUTUBE_THUMBNAIL_URL = "https://img.youtube.com/vi/{video_id}/mqdefault.jpg"
+
+
+class ThumbnailStore:
+	"""Fetches, processes and caches the rounded thumbnails shown in the lists.
+
+	Lookups go memory LRU -> processed PNG on disk -> network. Downloading, decoding,
+	resizing and masking all happen on the store's own worker threads over a single
+	keep-alive session; only the finished PIL image is handed back.
+
+	The disk cache is capped at ``max_disk`` bytes. Reads touch a file's mtime, and the
+	least recently used files are pruned at startup and whenever a write goes over the cap.
+	"""
+	def __init__(self, width=128, height=72, radius=10, cache_dir=None, max_memory=256,
+				 url_template=YOUTUBE_THUMBNAIL_URL, workers=4, session=None, governor=None, metrics=None,
+				 max_disk=64 * 1024 * 1024):
+		self.size = (width, height)
+		self.url_template = url_template
+		self.cache_dir = cache_dir or get_data_dir() / 'thumbnails'
+		os.makedirs(self.cache_dir, exist_ok=True)
+		self.max_memory = max_memory
+		self.governor = governor
+		self.metrics = metrics or Metrics(enabled=False)
+		self.memory = OrderedDict()
+		self.lock = threading.Lock()
+		self.max_disk = max_disk
+		self.disk_usage = None  # bytes on disk, known once the startup prune has run
+		self.disk_lock = threading.Lock()
+		self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='thumbnail')
+		self.executor.submit(self._prune_disk)
+
+		if session is None:
+			session = requests.Session()
+			adapter = HTTPAdapter(pool_connections=2, pool_maxsize=workers)
+			session.mount('https://', adapter)
+			session.mount('http://', adapter)
+		self.session = session
+
+		# the mask is identical for every thumbnail, so draw it once
+		self.mask = Image.new("L", self.size, 0)
+		ImageDraw.Draw(self.mask).rounded_rectangle((0, 0, *self.size), radius=radius, fill=255)
+
+	def _disk_path(self, url):
+		digest = hashlib.sha256(f"{url}|{self.size[0]}x{self.size[1]}".encode()).hexdigest()
+		return os.path.join(self.cache_dir, digest[:2], f"{digest}.png")
+
+	def _prune_disk(self):
+		"""deletes the least recently used files until the cache is back under 90% of max_disk"""
+		with self.disk_lock:
+			files = []
+			for root, _, names in os.walk(self.cache_dir):
+				for name in names:
+					path = os.path.join(root, name)
+					try:
+						stat = os.stat(path)
+					except OSError:
+						continue
+					files.append((stat.st_mtime, stat.st_size, path))
+			total = sum(size for _, size, _ in files)
+			if total > self.max_disk:
+				for _, size, path in sorted(files):
+					try:
+						os.remove(path)
+					except OSError:
+						continue
+					total -= size
+					if total <= self.max_disk * 0.9:
+						break
+			self.disk_usage = total
+
+	def _remember(self, video_id, image):
+		with self.lock:
+			self.memory[video_id] = image
+			self.memory.move_to_end(video_id)
+			while len(self.memory) > self.max_memory:
+				self.memory.popitem(last=False)
+
+	def get_cached(self, video_id):
+		"""returns the processed image if it is already in memory, without any I/O"""
+		with self.lock:
+			image = self.memory.get(video_id)
+			if image is not None:
+				self.memory.move_to_end(video_id)
+			return image
+
+	def process(self, data):
+		"""decodes raw image bytes into a resized thumbnail with rounded corners"""
+		image = Image.open(io.BytesIO(data)).convert('RGB')
+		image = image.resize(self.size, Image.LANCZOS)
+		image.putalpha(self.mask)
+		return image
+
+	def load(self, video_id):
+		"""returns the thumbnail for a video, fetching and caching it if needed (blocking)"""
+		if (image := self.get_cached(video_id)) is not None:
+			self.metrics.count('thumbnails_total', source='memory')
+			return image
+
+		url = self.url_template.format(video_id=video_id)
+		path = self._disk_path(url)
+		if os.path.isfile(path):
+			try:
+				image = Image.open(path)
+				image.load()
+			except OSError:
+				os.remove(path)
+			else:
+				try:
+					os.utime(path)  # keeps it out of the next prune
+				except OSError:
+					pass
+				self._remember(video_id, image)
+				self.metrics.count('thumbnails_total', source='disk')
+				return image
+
+		with self.metrics.timer('thumbnail_seconds'):
+			if self.governor:
+				with self.governor.slot(url, INTERACTIVE):
+					response = self.session.get(url, timeout=5)
+				self.governor.report(url, response.status_code, response.headers.get('Retry-After'))
+				self.governor.consume(len(response.content), INTERACTIVE)
+			else:
+				response = self.session.get(url, timeout=5)
+		self.metrics.count('thumbnails_total', source='network')
+		self.metrics.count('thumbnail_bytes_total', len(response.content))
+		if response.status_code != 200:
+			return None
+		image = self.process(response.content)
+		self._remember(video_id, image)
+
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		temp_path = f"{path}.{threading.get_ident()}.tmp"
+		image.save(temp_path, format='PNG')
+		os.replace(temp_path, path)
+		size = os.path.getsize(path)
+		with self.disk_lock:
+			if self.disk_usage is not None:
+				self.disk_usage += size
+			over = self.disk_usage is not None and self.disk_usage > self.max_disk
+		if over:
+			self._prune_disk()
+		return image
+
+	def submit(self, video_id, callback):
+		"""loads a thumbnail in the background and calls ``callback(image)`` from the worker thread"""
+		def task():
+			try:
+				if (image := self.load(video_id)) is not None:
+					callback(image)
+			except Exception as e:
+				logging.warning(f"Thumbnail download failed: {e}")
+		return self.executor.submit(task)
+
+	def shutdown(self):
+		self.executor.shutdown(wait=False, cancel_futures=True)
+		self.session.close()
@@ -0,0 +1,231 @@
+import os
+import re
+import signal
+import subprocess
+import threading
+from collections import defaultdict, deque
+
+from media import CREATE_NO_WINDOW
+from retry import ConversionError
+
+# how many conversions of each kind may run at once
+ENCODER_LIMITS = {
+	'software': max(1, (os.cpu_count() or 2) // 4),  # libx264 already spreads one encode over every core
+	'nvenc': 3,  # consumer NVIDIA drivers refuse sessions past their limit
+	'amf': 2,
+	'qsv': 2,
+	'audio': os.cpu_count() or 2,  # audio encoders are single threaded
+	'copy': 4,  # remuxes only wait on the disk
+}
+STDERR_LINES = 20
+DURATION_PATTERN = re.compile(r'Duration: (\d+):(\d+):(\d+(?:\.\d+)?)')
+
+
+class TranscodeCancelled(Exception):
+	"""The conversion was cancelled before it finished; nothing is left at the output path."""
+
+
+def encoder_class(args):
+	"""Works out which limit a conversion counts against from its ffmpeg arguments."""
+	codecs = {}
+	for flag, value in zip(args, args[1:]):
+		if flag in ('-c', '-c:v', '-c:a'):
+			codecs[flag] = value
+	video = codecs.get('-c:v') or (codecs.get('-c') if '-vn' not in args else None)
+	if video and video != 'copy':
+		for kind in ('nvenc', 'amf', 'qsv'):
+			if kind in video:
+				return kind
+		return 'software'
+	audio = codecs.get('-c:a') or codecs.get('-c')
+	if audio and audio != 'copy':
+		return 'audio'
+	return 'copy'
+
+
+def parse_progress(state, duration=None):
+	"""Turns one block of ffmpeg's ``-progress`` key=value output into numbers."""
+	def number(key):
+		try:
+			return float(state.get(key, '').rstrip('x'))
+		except ValueError:
+			return None
+
+	# out_time_ms is microseconds too, older builds only write that one
+	microseconds = number('out_time_us')
+	if microseconds is None:
+		microseconds = number('out_time_ms')
+	seconds = microseconds / 1_000_000 if microseconds is not None else None
+	percent = None
+	if state.get('progress') == 'end':
+		percent = 1.0
+	elif duration and seconds is not None:
+		percent = min(max(seconds / duration, 0.0), 1.0)
+	return {
+		'frame': int(number('frame') or 0),
+		'fps': number('fps'),
+		'speed': number('speed'),
+		'out_time': seconds,
+		'percent': percent,
+	}
+
+
+def _suspend(process, pause):
+	if os.name == 'nt':
+		import ctypes
+		call = ctypes.windll.ntdll.NtSuspendProcess if pause else ctypes.windll.ntdll.NtResumeProcess
+		call(int(process._handle))
+	else:
+		os.kill(process.pid, signal.SIGSTOP if pause else signal.SIGCONT)
+
+
+class TranscodeExecutor:
+	"""Runs the ffmpeg conversions as processes it owns, instead of a fire-and-wait subprocess.run.
+
+	* each kind of encoder has its own cap (ENCODER_LIMITS), so the cpu isn't thrashed and
+	  the GPU never runs out of encoder sessions. The caps are the only limit when the
+	  pools calling ``run`` have a thread for every job in flight, as the engine sizes
+	  them: remuxes then start next to a libx264 encode instead of queuing behind the
+	  jobs waiting for the next libx264 slot
+	* ``-progress pipe:1`` output is parsed as it arrives and handed to ``on_progress``
+	  with the frame, fps, speed and percent done
+	* a job's conversion can be cancelled, which kills ffmpeg and removes the partial
+	  output, or paused and resumed; a paused conversion keeps its slot
+	"""
+	def __init__(self, ffmpeg_path, limits=None):
+		self.ffmpeg_path = ffmpeg_path
+		self.limits = {**ENCODER_LIMITS, **(limits or {})}
+		self.condition = threading.Condition()
+		self.active = defaultdict(int)
+		self.waiting = set()
+		self.processes = {}  # job id -> Popen, None until ffmpeg has started
+		self.paused = set()
+		self.cancelled = set()
+		self.closed = False
+
+	def run(self, job_id, source, args, output, duration=None, on_progress=None, input_args=None):
+		"""converts ``source`` into ``output``, blocking until ffmpeg exits
+
+		Waits for a free slot of the conversion's encoder kind first. ``input_args`` go
+		before ``-i``, e.g. to decode on the GPU. Raises ConversionError when ffmpeg fails
+		and TranscodeCancelled when the job was cancelled.
+		"""
+		kind = encoder_class(args)
+		with self.condition:
+			if self.closed:
+				raise TranscodeCancelled("Cancelled")
+			self.waiting.add(job_id)
+			try:
+				while self.active[kind] >= self.limits.get(kind, 1) and job_id not in self.cancelled:
+					self.condition.wait()
+			finally:
+				self.waiting.discard(job_id)
+			if job_id in self.cancelled:
+				self.cancelled.discard(job_id)
+				raise TranscodeCancelled("Cancelled")
+			self.active[kind] += 1
+			# the job counts as running from here, so a cancel before ffmpeg starts isn't lost
+			self.processes[job_id] = None
+		try:
+			self._run(job_id, source, input_args or [], args, output, duration, on_progress)
+		finally:
+			with self.condition:
+				self.active[kind] -= 1
+				self.processes.pop(job_id, None)
+				self.paused.discard(job_id)
+				self.cancelled.discard(job_id)
+				self.condition.notify_all()
+
+	def _run(self, job_id, source, input_args, args, output, duration, on_progress):
+		process = subprocess.Popen(
+			[self.ffmpeg_path, '-hide_banner', '-nostats', '-y', '-progress', 'pipe:1']
+			+ input_args + ['-i', source] + args + [output],
+			stdin=subprocess.DEVNULL,
+			stdout=subprocess.PIPE,
+			stderr=subprocess.PIPE,
+			text=True,
+			encoding='utf-8',
+			errors='replace',
+			creationflags=CREATE_NO_WINDOW
+		)
+		with self.condition:
+			self.processes[job_id] = process
+			if job_id in self.cancelled:
+				# cancelled between getting the slot and starting
+				process.kill()
+
+		# stderr is drained on the side so a chatty ffmpeg never blocks on a full pipe
+		stderr_tail = deque(maxlen=STDERR_LINES)
+		source_duration = [duration]
+
+		def read_stderr():
+			for line in process.stderr:
+				stderr_tail.append(line)
+				# ffmpeg reports the input's length itself when nobody else knew it
+				if not source_duration[0] and (match := DURATION_PATTERN.search(line)):
+					hours, minutes, seconds = match.groups()
+					source_duration[0] = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+		reader = threading.Thread(target=read_stderr, daemon=True)
+		reader.start()
+		state = {}
+		for line in process.stdout:
+			key, _, value = line.strip().partition('=')
+			state[key] = value
+			if key == 'progress' and on_progress:
+				on_progress(parse_progress(state, source_duration[0]))
+		process.wait()
+		reader.join()
+
+		with self.condition:
+			cancelled = job_id in self.cancelled
+		if (cancelled or process.returncode != 0) and os.path.exists(output):
+			# don't leave a broken file behind to push the retry onto another name
+			os.remove(output)
+		if cancelled:
+			raise TranscodeCancelled("Cancelled")
+		if process.returncode != 0:
+			raise ConversionError(f"FFmpeg conversion failed: {[line.strip() for line in stderr_tail if line.strip()][-1:]}")
+
+	def cancel(self, job_id):
+		"""stops a job's conversion, whether it's running, paused or still waiting for a slot"""
+		with self.condition:
+			if job_id not in self.processes and job_id not in self.waiting:
+				return False
+			process = self.processes.get(job_id)
+			self.cancelled.add(job_id)
+			self.condition.notify_all()
+		if process is not None:
+			if job_id in self.paused:
+				_suspend(process, False)
+			process.kill()
+		return True
+
+	def pause(self, job_id):
+		with self.condition:
+			process = self.processes.get(job_id)
+			if process is None or job_id in self.paused or process.poll() is not None:
+				return False
+			_suspend(process, True)
+			self.paused.add(job_id)
+		return True
+
+	def resume(self, job_id):
+		with self.condition:
+			process = self.processes.get(job_id)
+			if process is None or job_id not in self.paused:
+				return False
+			_suspend(process, False)
+			self.paused.discard(job_id)
+		return True
+
+	def cancel_all(self):
+		with self.condition:
+			job_ids = list(self.processes) + list(self.waiting)
+		for job_id in job_ids:
+			self.cancel(job_id)
+
+	def shutdown(self):
+		"""cancels every conversion and refuses to start any more"""
+		with self.condition:
+			self.closed = True
+		self.cancel_all()
@@ -0,0 +1,93 @@
+import logging
+import shutil
+
+# upper bound on simultaneous connections across every running download
+MAX_CONNECTIONS = 16
+
+# yt-dlp defaults to 1 KiB reads that it grows on its own; starting larger saves the ramp-up
+BUFFER_SIZE = 64 * 1024
+# YouTube throttles single large range requests, ~10 MiB chunks stay under it
+CHUNK_SIZE = 10 * 1024 * 1024
+
+# connections per stream, None means work it out from how many jobs run at once
+TRANSFER_PROFILES = {
+	'auto': {'fragments': None, 'chunk_size': CHUNK_SIZE, 'buffer_size': BUFFER_SIZE},
+	'conservative': {'fragments': 1, 'chunk_size': None, 'buffer_size': None},
+	'balanced': {'fragments': 4, 'chunk_size': CHUNK_SIZE, 'buffer_size': BUFFER_SIZE},
+	'aggressive': {'fragments': 8, 'chunk_size': CHUNK_SIZE, 'buffer_size': 256 * 1024},
+}
+
+# extra arguments for external downloaders that can split a single file across connections
+EXTERNAL_DOWNLOADER_ARGS = {
+	'aria2c': lambda connections: ['-x', str(connections), '-s', str(connections), '-k', '1M'],
+}
+
+
+def resolve_transfer(profile='auto', streams=1, external_downloader=None):
+	"""Works out the transfer settings for a batch where ``streams`` downloads run at once.
+
+	Every profile is capped so that streams x connections stays within MAX_CONNECTIONS;
+	'auto' simply takes its even share of that budget.
+	"""
+	if profile not in TRANSFER_PROFILES:
+		raise ValueError(f"Unknown transfer profile: {profile}")
+	options = TRANSFER_PROFILES[profile]
+	share = max(1, MAX_CONNECTIONS // max(streams, 1))
+	fragments = min(options['fragments'] or share, share)
+
+	if external_downloader and not shutil.which(external_downloader):
+		logging.warning(f"External downloader {external_downloader} not found, using the built-in one")
+		external_downloader = None
+	return {
+		'profile': profile,
+		'fragments': fragments,
+		'chunk_size': options['chunk_size'],
+		'buffer_size': options['buffer_size'],
+		'external_downloader': external_downloader,
+	}
+
+
+def get_transfer_options(transfer):
+	"""Turns resolved transfer settings into yt-dlp options."""
+	ydl_opts = {'concurrent_fragment_downloads': transfer['fragments']}
+	if transfer['chunk_size']:
+		ydl_opts['http_chunk_size'] = transfer['chunk_size']
+	if transfer['buffer_size']:
+		ydl_opts['buffersize'] = transfer['buffer_size']
+	if downloader := transfer['external_downloader']:
+		ydl_opts['external_downloader'] = {'default': downloader}
+		if args := EXTERNAL_DOWNLOADER_ARGS.get(downloader):
+			ydl_opts['external_downloader_args'] = {downloader: args(transfer['fragments'])}
+	return ydl_opts
+
+
+def throughput_report(jobs):
+	"""Summarizes what each transfer profile achieved per download stream.
+
+	Only jobs that actually downloaded something count; a job resumed from an
+	already finished source has no transfer to measure.
+	"""
+	report = {}
+	for job in jobs:
+		seconds = job.timings.get('download')
+		if not job.transfer or not job.bytes_downloaded or not seconds:
+			continue
+		entry = report.setdefault(job.transfer['profile'], {
+			'fragments': job.transfer['fragments'],
+			'external_downloader': job.transfer['external_downloader'],
+			'streams': 0,
+			'bytes': 0,
+			'seconds': 0.0,
+			'rates': [],
+		})
+		entry['streams'] += 1
+		entry['bytes'] += job.bytes_downloaded
+		entry['seconds'] += seconds
+		entry['rates'].append(job.bytes_downloaded / seconds)
+
+	for entry in report.values():
+		rates = entry.pop('rates')
+		entry['bytes_per_second'] = entry['bytes'] / entry['seconds']
+		entry['min_bytes_per_second'] = min(rates)
+		entry['max_bytes_per_second'] = max(rates)
+	return report
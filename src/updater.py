@@ -0,0 +1,262 @@
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import textwrap
+import time
+
+import requests
+from packaging import version
+
+from paths import get_base_path, get_data_dir
+from archive import file_checksum
+
+GITHUB_API = "https://api.github.com"
+CHUNK_SIZE = 256 * 1024
+MAX_ATTEMPTS = 5
+TIMEOUT = (5, 30)  # connect, read
+CHECK_INTERVAL = 6 * 3600  # seconds a release check is trusted before asking GitHub again
+# release assets that can hold the checksum when the API doesn't publish a digest
+CHECKSUM_ASSETS = ("{exe_name}.sha256", "SHA256SUMS", "SHA256SUMS.txt", "checksums.txt")
+
+
+class UpdateError(Exception):
+	"""The update could not be downloaded or didn't match its published checksum."""
+
+
+def _find_checksum(text, name):
+	"""pulls the sha256 for ``name`` out of a `sha256sum` style listing, or a file with just the hash"""
+	for line in text.splitlines():
+		match = re.match(r'\s*([0-9a-fA-F]{64})(?:\s+\*?(.+?))?\s*$', line)
+		if match and (match.group(2) is None or os.path.basename(match.group(2)) == name):
+			return match.group(1).lower()
+	return None
+
+
+class UpdateHandler:
+	"""Handles application updates by checking and downloading the latest version.
+
+	The new executable is streamed to disk in chunks, so memory stays flat whatever the
+	release size. An interrupted download is picked up where it stopped with a Range
+	request, and nothing is swapped in until the file matches the checksum published
+	with the release.
+
+	The release check is cached on disk with its ETag/Last-Modified. Launches within
+	CHECK_INTERVAL of the last check, or while GitHub's rate limit is used up, don't touch
+	the network at all; later ones send a conditional request, and a 304 (or no network)
+	answers from the cached release.
+	"""
+	def __init__(self, api_url=GITHUB_API, download_dir=None, session=None, state_path=None,
+				 check_interval=CHECK_INTERVAL):
+		self.current_version = self.get_current_version()
+		self.repo_owner = "SleepyTK"
+		self.repo_name = "YoutubeDownloader"
+		self.exe_name = "YouTube_Downloader.exe"
+		self.api_url = api_url
+		self.download_dir = download_dir or get_data_dir() / 'update'
+		self.session = session or requests.Session()
+		self.state_path = str(state_path or get_data_dir() / 'release_check.json')
+		self.check_interval = check_interval
+
+	def get_current_version(self):
+		"""Gets the current version from the version file."""
+		version_file = get_base_path() / "version.txt"
+		return version_file.read_text().strip()
+
+	def _load_state(self):
+		try:
+			with open(self.state_path, encoding='utf-8') as f:
+				return json.load(f)
+		except (OSError, ValueError):
+			return {}
+
+	def _save_state(self, state):
+		temp_path = f"{self.state_path}.tmp"
+		try:
+			with open(temp_path, 'w', encoding='utf-8') as f:
+				json.dump(state, f)
+			os.replace(temp_path, self.state_path)
+		except OSError as e:
+			logging.warning(f"Couldn't save the release check: {e}")
+
+	def latest_release(self):
+		"""Returns the latest release, from the on-disk cache whenever GitHub doesn't need asking."""
+		state = self._load_state()
+		cached = state.get('release')
+		now = time.time()
+		if cached and now - state.get('checked', 0) < self.check_interval:
+			return cached
+		if cached and state.get('rate_remaining') == 0 and now < state.get('rate_reset', 0):
+			return cached
+
+		headers = {'Accept': 'application/vnd.github+json'}
+		if cached and state.get('etag'):
+			headers['If-None-Match'] = state['etag']
+		if cached and state.get('last_modified'):
+			headers['If-Modified-Since'] = state['last_modified']
+		try:
+			response = self.session.get(
+				f"{self.api_url}/repos/{self.repo_owner}/{self.repo_name}/releases/latest",
+				headers=headers,
+				timeout=5
+			)
+		except requests.RequestException as e:
+			logging.warning(f"Release check failed, using the cached release: {e}")
+			return cached
+
+		if remaining := response.headers.get('X-RateLimit-Remaining'):
+			state['rate_remaining'] = int(remaining)
+			state['rate_reset'] = float(response.headers.get('X-RateLimit-Reset') or 0)
+		if response.status_code == 200:
+			release = response.json()
+			# only what the update needs, the release notes can be long
+			state['release'] = {
+				'tag_name': release['tag_name'],
+				'assets': [
+					{key: asset.get(key) for key in ('name', 'browser_download_url', 'size', 'digest')}
+					for asset in release.get('assets', [])
+				],
+			}
+			state['etag'] = response.headers.get('ETag')
+			state['last_modified'] = response.headers.get('Last-Modified')
+			state['checked'] = now
+		elif response.status_code == 304:
+			state['checked'] = now
+		else:
+			# 403/429 from the rate limit, or GitHub having a bad moment: try again next launch
+			logging.warning(f"Release check answered {response.status_code}, using the cached release")
+		self._save_state(state)
+		return state.get('release')
+
+	def check_update(self):
+		"""Checks for updates by querying the GitHub API (or the cached answer)."""
+		try:
+			latest_data = self.latest_release()
+			if latest_data:
+				latest_version_str = latest_data['tag_name']
+				latest_version = version.parse(latest_version_str.lstrip('v'))
+				current_version = version.parse(self.current_version)
+				logging.info(f"Current version {current_version}, latest {latest_version}")
+
+				if latest_version > current_version:
+					return self._release_info(latest_data)
+		except Exception as e:
+			logging.error(f"Update check failed: {e}")
+		return None
+
+	def _release_info(self, release):
+		"""picks the executable out of the release's assets by name, along with its checksum"""
+		assets = {asset['name']: asset for asset in release.get('assets', [])}
+		asset = assets.get(self.exe_name)
+		if asset is None:
+			logging.error(f"Release {release['tag_name']} has no {self.exe_name}")
+			return None
+
+		sha256 = None
+		digest = asset.get('digest') or ''
+		if digest.startswith('sha256:'):
+			sha256 = digest.split(':', 1)[1].lower()
+		checksum_url = None
+		for name in CHECKSUM_ASSETS:
+			if checksum_asset := assets.get(name.format(exe_name=self.exe_name)):
+				checksum_url = checksum_asset['browser_download_url']
+				break
+		return {
+			'url': asset['browser_download_url'],
+			'version': release['tag_name'],
+			'size': asset.get('size'),
+			'sha256': sha256,
+			'checksum_url': checksum_url,
+		}
+
+	def _published_checksum(self, update_info):
+		if update_info.get('sha256'):
+			return update_info['sha256']
+		if update_info.get('checksum_url'):
+			response = self.session.get(update_info['checksum_url'], timeout=TIMEOUT)
+			response.raise_for_status()
+			if checksum := _find_checksum(response.text, self.exe_name):
+				return checksum
+		raise UpdateError("The release doesn't publish a checksum for the executable")
+
+	def download(self, update_info, progress=None):
+		"""Streams the executable into the update folder and returns its path once verified.
+
+		``progress(done, total)`` is called from this thread as chunks arrive. A partial
+		file left by an earlier attempt (or an earlier run) is resumed rather than restarted.
+		"""
+		expected = self._published_checksum(update_info)
+		os.makedirs(self.download_dir, exist_ok=True)
+		# the part file is per release, so a newer release never resumes an older one's bytes
+		part_path = os.path.join(self.download_dir, f"{self.exe_name}.{update_info['version']}.part")
+		final_path = os.path.join(self.download_dir, self.exe_name)
+
+		for attempt in range(1, MAX_ATTEMPTS + 1):
+			try:
+				self._fetch(update_info['url'], part_path, update_info.get('size'), progress)
+				break
+			except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+				if attempt == MAX_ATTEMPTS:
+					raise UpdateError(f"Download kept failing: {e}") from e
+				logging.warning(f"Update download interrupted, resuming: {e}")
+				time.sleep(min(2 ** attempt, 30))
+
+		if update_info.get('size') and os.path.getsize(part_path) != update_info['size']:
+			os.remove(part_path)
+			raise UpdateError("The download doesn't have the size the release lists")
+		if file_checksum(part_path) != expected:
+			os.remove(part_path)
+			raise UpdateError("The download doesn't match the published checksum")
+		os.replace(part_path, final_path)
+		return final_path
+
+	def _fetch(self, url, part_path, size, progress):
+		done = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+		if size and done >= size:
+			return
+		headers = {'Range': f'bytes={done}-'} if done else {}
+		with self.session.get(url, headers=headers, stream=True, timeout=TIMEOUT) as response:
+			if response.status_code == 416:
+				# the part file already holds everything the server has
+				return
+			response.raise_for_status()
+			if response.status_code != 206:
+				# the server ignored the range, so it's sending the whole file again
+				done = 0
+			total = size or (done + int(response.headers.get('Content-Length') or 0)) or None
+			with open(part_path, 'ab' if done else 'wb') as f:
+				for chunk in response.iter_content(CHUNK_SIZE):
+					f.write(chunk)
+					done += len(chunk)
+					if progress:
+						progress(done, total)
+
+	def perform_update(self, update_info, progress=None):
+		"""Downloads the new executable and hands it to a script that swaps it in once we exit.
+
+		Blocks for the whole download, so call it off the UI thread. Raises UpdateError
+		(or an OSError) when the update can't be installed.
+		"""
+		new_exe = self.download(update_info, progress)
+		bat_script = textwrap.dedent(f"""
+			@echo off
+			timeout /t 1 /nobreak >nul
+			del /F /Q "{sys.executable}"
+			move /Y "{new_exe}" "{sys.executable}"
+			start "" "{sys.executable}"
+			del %0
+		""")
+
+		script_path = os.path.join(self.download_dir, "updater.bat")
+		with open(script_path, 'w') as f:
+			f.write(bat_script)
+
+		subprocess.Popen(
+			['cmd.exe', '/C', script_path],
+			shell=True,
+			creationflags=subprocess.CREATE_NO_WINDOW
+		)
+		return True
+
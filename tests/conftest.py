@@ -0,0 +1,15 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# the app's modules import each other by bare name, as they do when run from src/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+	"""keeps caches, journals and reports written by the code under test out of the real data folder"""
+	monkeypatch.delenv('LOCALAPPDATA', raising=False)
+	monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+	return tmp_path / 'cache'
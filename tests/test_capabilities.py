@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+import capabilities
+from engine import find_tool
+
+FFMPEG = find_tool('ffmpeg')
+needs_ffmpeg = pytest.mark.skipif(not os.path.isfile(FFMPEG), reason="no ffmpeg binary found")
+
+
+def test_encoders_are_ranked_by_test_encode_speed(monkeypatch):
+	speeds = {'libx264': 120.0, 'h264_nvenc': 480.0}
+
+	def fake_test_encoder(ffmpeg_path, encoder):
+		if encoder == 'h264_amf':
+			raise Exception("DLL amfrt64.dll failed to open")
+		return speeds[encoder]
+
+	monkeypatch.setattr(capabilities, 'test_encoder', fake_test_encoder)
+	validation = capabilities.validate_encoders('ffmpeg', ['libx264', 'h264_nvenc', 'h264_amf'])
+
+	assert [entry['name'] for entry in validation['working']] == ['h264_nvenc', 'libx264']
+	assert validation['rejected']['h264_amf'] == "DLL amfrt64.dll failed to open"
+	# listed by -encoders isn't enough, missing from the build is rejected without a test
+	assert validation['rejected']['h264_qsv'] == "not included in this ffmpeg build"
+
+
+def test_encoder_menu_always_offers_libx264():
+	assert capabilities.get_encoder_options({}) == ['libx264 (CPU)']
+	options = capabilities.get_encoder_options({'validation': {'working': [{'name': 'h264_nvenc', 'fps': 400}]}})
+	assert options == ['h264_nvenc (NVIDIA)', 'libx264 (CPU)']
+
+
+def test_old_validation_without_pipelines_is_redone(tmp_path, monkeypatch):
+	cache = capabilities.CapabilityCache(tmp_path / 'capabilities.json')
+	ffmpeg = tmp_path / 'ffmpeg'
+	ffmpeg.write_bytes(b'')
+	old = {'working': [{'name': 'libx264', 'fps': 100}], 'rejected': {}, 'checked_at': 4102444800}
+	cache.update(str(ffmpeg), {'version': 'x', 'encoders': ['libx264'], 'hwaccels': [], 'validation': old})
+	calls = []
+
+	def fake_validate(ffmpeg_path, available, hwaccels=()):
+		calls.append(available)
+		return {**old, 'pipelines': {'working': [], 'rejected': {}}}
+
+	monkeypatch.setattr(capabilities, 'validate_encoders', fake_validate)
+	assert 'pipelines' in cache.validate(str(ffmpeg))['validation']
+	cache.validate(str(ffmpeg))
+	assert calls == [['libx264']]
+
+
+@needs_ffmpeg
+def test_libx264_passes_a_real_test_encode():
+	assert capabilities.test_encoder(FFMPEG, 'libx264') > 0
+
+
+@needs_ffmpeg
+def test_failed_test_encode_raises_ffmpeg_error(tmp_path):
+	with pytest.raises(Exception, match='(?i)encoder'):
+		capabilities._test_encode(FFMPEG, [
+			'-f', 'lavfi', '-i', 'testsrc2=size=320x240:rate=30', '-t', '1', '-c:v', 'no_such_encoder',
+		], str(tmp_path / 'out.mp4'))
@@ -0,0 +1,37 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('customtkinter')
+from main import App
+
+
+class FakeMenu:
+	def __init__(self, value):
+		self.value = value
+		self.values = None
+
+	def configure(self, values=None):
+		self.values = values
+
+	def get(self):
+		return self.value
+
+	def set(self, value):
+		self.value = value
+
+
+OPTIONS = ['h264_nvenc (NVIDIA)', 'libx264 (CPU)']
+
+
+def test_pick_made_during_the_probe_is_kept():
+	app = SimpleNamespace(encoder_menu=FakeMenu('libx264 (CPU)'))
+	App._set_encoder_options(app, OPTIONS)
+	assert app.encoder_menu.values == OPTIONS
+	assert app.encoder_menu.get() == 'libx264 (CPU)'
+
+
+def test_pick_that_failed_validation_is_replaced_by_the_fastest():
+	app = SimpleNamespace(encoder_menu=FakeMenu('h264_amf (AMD)'))
+	App._set_encoder_options(app, OPTIONS)
+	assert app.encoder_menu.get() == 'h264_nvenc (NVIDIA)'
@@ -0,0 +1,80 @@
+import shutil
+import threading
+
+import engine as engine_module
+from engine import DownloadEngine
+from archive import DownloadArchive, ARCHIVED, archive_variant
+from capabilities import CapabilityCache
+from journal import JobJournal
+from retry import RetryPolicy
+
+LINK = 'https://youtu.be/dQw4w9WgXcQ'
+
+
+def test_job_cancelled_in_one_batch_downloads_in_the_next(tmp_path):
+	engine = DownloadEngine(
+		ffmpeg_path='ffmpeg', ffprobe_path='ffprobe',
+		capabilities=CapabilityCache(tmp_path / 'capabilities.json'),
+		journal=JobJournal(tmp_path / 'journal.sqlite3'),
+		retry_policy=RetryPolicy(base_delay=0)
+	)
+	downloads = []
+
+	def download(job):
+		downloads.append(job.id)
+		if len(downloads) == 1:
+			# the user hits cancel while the first download is running
+			engine.cancel_job(job.id)
+			raise ConnectionResetError("Connection reset by peer")
+
+	engine.download = download
+	engine.postprocess = lambda job: None
+	settings = {'directory': str(tmp_path)}
+	try:
+		[first] = engine.run([LINK], settings)
+		assert (first.status, first.error) == ('failed', 'Cancelled')
+
+		[second] = engine.run([LINK], settings)
+		# the journal gives the requeued link its old id back
+		assert second.id == first.id
+		assert second.status == 'done'
+		assert downloads == [first.id, first.id]
+	finally:
+		engine.shutdown()
+
+
+def test_archived_file_on_another_drive_is_copied_by_the_postprocess_pool(tmp_path, monkeypatch):
+	old_folder = tmp_path / 'old'
+	old_folder.mkdir()
+	archived = old_folder / 'Video.mp4'
+	archived.write_bytes(b'video' * 1000)
+	settings = {'media_type': 'video', 'resolution': 720, 'directory': str(tmp_path / 'new')}
+	archive = DownloadArchive(tmp_path / 'archive.sqlite3')
+	archive.add('youtube:dQw4w9WgXcQ', archive_variant(settings), str(archived))
+
+	def no_hardlinks(source, target):
+		raise OSError(18, "Invalid cross-device link")
+
+	copies = []
+	copy2 = shutil.copy2
+
+	def record_copy(source, target):
+		copies.append(threading.current_thread().name)
+		return copy2(source, target)
+
+	monkeypatch.setattr(engine_module.os, 'link', no_hardlinks)
+	monkeypatch.setattr(engine_module.shutil, 'copy2', record_copy)
+	engine = DownloadEngine(
+		ffmpeg_path='ffmpeg', ffprobe_path='ffprobe',
+		capabilities=CapabilityCache(tmp_path / 'capabilities.json'), archive=archive
+	)
+	try:
+		[job] = engine.run([LINK], settings)
+	finally:
+		engine.shutdown()
+
+	assert (job.status, job.strategy) == ('done', ARCHIVED)
+	assert job.output_path == str(tmp_path / 'new' / 'Video.mp4')
+	with open(job.output_path, 'rb') as f:
+		assert f.read() == b'video' * 1000
+	assert len(copies) == 1 and copies[0].startswith('postprocess')
@@ -0,0 +1,135 @@
+import os
+import subprocess
+
+import pytest
+
+import capabilities
+from engine import DownloadEngine, find_tool
+from media import get_hardware_args, get_scale_filter
+from retry import ConversionError, ENCODER
+from scheduler import Job
+
+FFMPEG = find_tool('ffmpeg')
+needs_ffmpeg = pytest.mark.skipif(not os.path.isfile(FFMPEG), reason="no ffmpeg binary found")
+
+NVENC_PIPELINE = {'validation': {
+	'working': [{'name': 'h264_nvenc', 'fps': 600}, {'name': 'libx264', 'fps': 150}],
+	'rejected': {},
+	'pipelines': {'working': [{'name': 'h264_nvenc', 'fps': 900}], 'rejected': {}},
+}}
+
+
+class FixedCapabilities:
+	"""a CapabilityCache that answers with what a validation on some other machine found"""
+	def __init__(self, capabilities):
+		self.capabilities = capabilities
+
+	def get(self, ffmpeg_path):
+		return self.capabilities
+
+
+def make_engine(tmp_path, found=NVENC_PIPELINE, ffmpeg_path='ffmpeg'):
+	return DownloadEngine(ffmpeg_path=ffmpeg_path, ffprobe_path=str(tmp_path / 'no-ffprobe'),
+						  capabilities=FixedCapabilities(found))
+
+
+def video_settings(tmp_path, **settings):
+	return {'media_type': 'video', 'directory': str(tmp_path), 'resolution': 720, 'bitrate': '5M',
+			'encoder': 'h264_nvenc', 'hwaccel': 'auto', **settings}
+
+
+def test_pipeline_validation_rejects_what_fails(monkeypatch):
+	def fake_test_pipeline(ffmpeg_path, encoder):
+		if encoder == 'h264_nvenc':
+			raise Exception("No device available for decoder: device type cuda needed for codec h264")
+		return 800.0
+
+	monkeypatch.setattr(capabilities, 'test_pipeline', fake_test_pipeline)
+	working = [{'name': name, 'fps': 100} for name in ('h264_nvenc', 'hevc_nvenc', 'h264_qsv', 'libx264')]
+	pipelines = capabilities.validate_pipelines('ffmpeg', working, ['cuda'])
+
+	assert pipelines['working'] == [{'name': 'hevc_nvenc', 'fps': 800.0}]
+	assert 'No device available' in pipelines['rejected']['h264_nvenc']
+	assert pipelines['rejected']['h264_qsv'] == "this ffmpeg build has no qsv hwaccel"
+	assert 'libx264' not in pipelines['rejected']
+	assert capabilities.has_hardware_pipeline('hevc_nvenc', {'validation': {'pipelines': pipelines}})
+	assert not capabilities.has_hardware_pipeline('h264_nvenc', {'validation': {'pipelines': pipelines}})
+
+
+def test_gpu_frames_skip_the_pix_fmt_conversion():
+	input_args, args = get_hardware_args('h264_nvenc', '5M', 720)
+	assert input_args == ['-hwaccel', 'cuda', '-hwaccel_output_format', 'cuda']
+	assert args[:2] == ['-vf', get_scale_filter(720, 'scale_cuda')]
+	assert '-pix_fmt' not in args
+	# AMF only decodes on the GPU, its frames come back to system memory for the software scaler
+	input_args, args = get_hardware_args('h264_amf', '5M', 720)
+	assert input_args == ['-hwaccel', 'd3d11va']
+	assert args[:2] == ['-vf', get_scale_filter(720)]
+
+
+def test_scaling_never_upscales():
+	assert get_scale_filter(720) == 'scale=w=-2:h=min(ih\\,720)'
+
+
+def test_chain_falls_back_from_the_gpu_pipeline_to_software(tmp_path):
+	engine = make_engine(tmp_path)
+	chain = engine._transcode_chain(video_settings(tmp_path))
+	assert [label for label, _, _ in chain] == ['h264_nvenc+cuda', 'h264_nvenc', 'libx264']
+	assert chain[0][1][:2] == ['-hwaccel', 'cuda']
+	assert all(input_args == [] for _, input_args, _ in chain[1:])
+
+
+@pytest.mark.parametrize('found, settings', [
+	(NVENC_PIPELINE, {'hwaccel': 'off'}),
+	({'validation': {'working': [{'name': 'h264_nvenc', 'fps': 600}], 'rejected': {}}}, {}),
+	({}, {}),
+])
+def test_no_gpu_pipeline_unless_validated_and_enabled(tmp_path, found, settings):
+	chain = make_engine(tmp_path, found)._transcode_chain(video_settings(tmp_path, **settings))
+	assert chain[0][0] == 'h264_nvenc'
+	assert chain[-1][0] == 'libx264'
+
+
+def test_failed_gpu_pipeline_falls_back_on_the_same_source(tmp_path, monkeypatch):
+	engine = make_engine(tmp_path)
+	source = tmp_path / 'clip [abc].source.mkv'
+	source.write_bytes(b'source')
+	job = Job('https://youtu.be/dQw4w9WgXcQ', video_settings(tmp_path))
+	job.title = 'clip'
+	job.source_path = str(source)
+	runs = []
+
+	def fake_run(job_id, source_path, args, output, duration=None, on_progress=None, input_args=None):
+		runs.append(source_path)
+		if '-hwaccel' in input_args or 'h264_nvenc' in args:
+			raise ConversionError("FFmpeg conversion failed: ['Cannot load libcuda.so.1']")
+		with open(output, 'wb') as f:
+			f.write(b'converted')
+
+	monkeypatch.setattr(engine.transcoder, 'run', fake_run)
+	engine.postprocess(job)
+
+	assert runs == [str(source)] * 3
+	assert job.encoder == 'libx264'
+	assert [(failure['category'], failure['encoder']) for failure in job.failures] == [
+		(ENCODER, 'h264_nvenc+cuda'), (ENCODER, 'h264_nvenc')
+	]
+	assert os.path.isfile(job.output_path) and not source.exists()
+
+
+@needs_ffmpeg
+def test_real_conversion_ends_on_a_working_encoder(tmp_path):
+	source = tmp_path / 'clip [abc].source.mp4'
+	subprocess.run([FFMPEG, '-v', 'error', '-f', 'lavfi', '-i', 'testsrc2=size=320x240:rate=30', '-t', '1',
+					'-c:v', 'libx264', '-preset', 'ultrafast', str(source)], check=True)
+	engine = make_engine(tmp_path, ffmpeg_path=FFMPEG)
+	job = Job('https://youtu.be/dQw4w9WgXcQ', video_settings(tmp_path))
+	job.title = 'clip'
+	job.source_path = str(source)
+
+	engine.postprocess(job)
+
+	labels = [label for label, _, _ in engine._transcode_chain(job.settings)]
+	# every attempt before the one that worked was recorded as an encoder fallback
+	assert len(job.failures) == labels.index(job.encoder)
+	assert os.path.getsize(job.output_path) > 0
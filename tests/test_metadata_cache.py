@@ -0,0 +1,54 @@
+import time
+
+from metadata_cache import MetadataCache, normalize_url
+
+
+def make_info(video_id, formats=True):
+	info = {'id': video_id, 'extractor_key': 'Youtube', 'title': f'Video {video_id}'}
+	if formats:
+		info['formats'] = [{'format_id': '18', 'url': 'https://example.invalid/stream'}]
+	return info
+
+
+def test_short_and_full_links_share_an_entry(tmp_path):
+	cache = MetadataCache(tmp_path / 'metadata.sqlite3')
+	cache.put(make_info('dQw4w9WgXcQ'), url='https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=10')
+	assert normalize_url('https://youtu.be/dQw4w9WgXcQ') == 'youtube:dQw4w9WgXcQ'
+	assert cache.get('https://youtu.be/dQw4w9WgXcQ')['title'] == 'Video dQw4w9WgXcQ'
+
+
+def test_expired_entries_are_misses(tmp_path):
+	cache = MetadataCache(tmp_path / 'metadata.sqlite3')
+	cache.put(make_info('aaaaaaaaaaa'), url='https://youtu.be/aaaaaaaaaaa', ttl=-1)
+	assert cache.get('https://youtu.be/aaaaaaaaaaa') is None
+	assert cache.stats()['misses'] == 1
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+	cache = MetadataCache(tmp_path / 'metadata.sqlite3', max_entries=2)
+	cache.put(make_info('aaaaaaaaaaa'), url='https://youtu.be/aaaaaaaaaaa')
+	time.sleep(0.01)
+	cache.put(make_info('bbbbbbbbbbb'), url='https://youtu.be/bbbbbbbbbbb')
+	time.sleep(0.01)
+	cache.get('https://youtu.be/aaaaaaaaaaa')
+	time.sleep(0.01)
+	cache.put(make_info('ccccccccccc'), url='https://youtu.be/ccccccccccc')
+
+	assert cache.get('https://youtu.be/bbbbbbbbbbb') is None
+	assert cache.get('https://youtu.be/aaaaaaaaaaa') is not None
+	assert cache.get('https://youtu.be/ccccccccccc') is not None
+
+
+def test_metadata_only_entry_does_not_satisfy_a_download(tmp_path):
+	cache = MetadataCache(tmp_path / 'metadata.sqlite3')
+	cache.put(make_info('aaaaaaaaaaa', formats=False), url='https://youtu.be/aaaaaaaaaaa')
+	extracted = []
+
+	def extract(url):
+		extracted.append(url)
+		return make_info('aaaaaaaaaaa')
+
+	assert cache.get_or_extract('https://youtu.be/aaaaaaaaaaa', extract)['title'] == 'Video aaaaaaaaaaa'
+	assert not extracted
+	assert cache.get_or_extract('https://youtu.be/aaaaaaaaaaa', extract, need_formats=True)['formats']
+	assert extracted == ['https://youtu.be/aaaaaaaaaaa']
@@ -0,0 +1,120 @@
+import errno
+import io
+import socket
+
+import pytest
+from yt_dlp.networking import Response
+from yt_dlp.networking.exceptions import HTTPError, TransportError
+from yt_dlp.utils import DownloadError
+
+from engine import DownloadEngine
+from capabilities import CapabilityCache
+from scheduler import Job
+from retry import (
+	RetryPolicy, ConversionError, classify,
+	NETWORK, RATE_LIMITED, EXPIRED, INVALID, CONVERSION, DISK, UNKNOWN
+)
+
+
+def http_error(status):
+	return HTTPError(Response(io.BytesIO(b''), 'https://example.invalid/', {}, status=status))
+
+
+def wrapped(error):
+	"""what yt-dlp raises after catching ``error`` itself"""
+	return DownloadError(f"ERROR: {error}", (type(error), error, None))
+
+
+@pytest.mark.parametrize('error', [
+	TransportError('Connection reset by peer'),
+	ConnectionResetError(errno.ECONNRESET, 'Connection reset by peer'),
+	socket.timeout('timed out'),
+	http_error(503),
+	wrapped(TransportError('Read timed out')),
+	wrapped(http_error(502)),
+	DownloadError('ERROR: Unable to download webpage: <urlopen error [Errno -3] Temporary failure in name resolution>'),
+])
+def test_network_errors_are_retried(error):
+	assert classify(error) == NETWORK
+	assert RetryPolicy().should_retry(NETWORK, 1)
+
+
+@pytest.mark.parametrize('error', [
+	ValueError('Invalid URL'),
+	http_error(404),
+	wrapped(http_error(410)),
+	DownloadError('ERROR: [youtube] dQw4w9WgXcQ: Video unavailable'),
+	DownloadError('ERROR: [youtube] dQw4w9WgXcQ: Private video. Sign in if you\'ve been granted access'),
+	DownloadError('ERROR: Unsupported URL: https://example.com/'),
+])
+def test_invalid_errors_are_not_retried(error):
+	assert classify(error) == INVALID
+	assert not RetryPolicy().should_retry(INVALID, 1)
+
+
+@pytest.mark.parametrize('error, category', [
+	(http_error(429), RATE_LIMITED),
+	(wrapped(http_error(403)), EXPIRED),
+	(ConversionError('FFmpeg conversion failed'), CONVERSION),
+	(OSError(errno.ENOSPC, 'No space left on device'), DISK),
+	(RuntimeError('something new'), UNKNOWN),
+])
+def test_other_categories(error, category):
+	assert classify(error) == category
+
+
+def test_attempts_are_capped_per_category():
+	policy = RetryPolicy()
+	assert [policy.should_retry(NETWORK, attempt) for attempt in (1, 2, 3, 4)] == [True, True, True, False]
+	assert not policy.should_retry(CONVERSION, 1)
+	assert 0 <= policy.delay(RATE_LIMITED, 3) <= policy.max_delay
+
+
+@pytest.fixture
+def engine(tmp_path):
+	engine = DownloadEngine(
+		ffmpeg_path='ffmpeg', ffprobe_path='ffprobe',
+		capabilities=CapabilityCache(tmp_path / 'capabilities.json'),
+		retry_policy=RetryPolicy(base_delay=0)
+	)
+	yield engine
+	engine.shutdown()
+
+
+def test_engine_retries_network_errors_until_they_pass(engine):
+	job = Job('https://youtu.be/dQw4w9WgXcQ', {})
+	errors = [TransportError('Connection reset by peer'), socket.timeout('timed out')]
+
+	def download(job):
+		if errors:
+			raise errors.pop(0)
+		return 'downloaded'
+
+	assert engine._retrying('download', download)(job) == 'downloaded'
+	assert [failure['category'] for failure in job.failures] == [NETWORK, NETWORK]
+
+
+def test_engine_gives_up_on_invalid_errors_at_once(engine):
+	job = Job('https://youtu.be/dQw4w9WgXcQ', {})
+	calls = []
+
+	def download(job):
+		calls.append(job)
+		raise DownloadError('ERROR: [youtube] dQw4w9WgXcQ: Video unavailable')
+
+	with pytest.raises(DownloadError):
+		engine._retrying('download', download)(job)
+	assert len(calls) == 1
+	assert job.failures[0]['category'] == INVALID
+
+
+def test_expired_stream_urls_force_a_fresh_extraction(engine):
+	job = Job('https://youtu.be/dQw4w9WgXcQ', {}, info={'id': 'dQw4w9WgXcQ', 'formats': []})
+	errors = [wrapped(http_error(403))]
+
+	def download(job):
+		if errors:
+			raise errors.pop(0)
+
+	engine._retrying('download', download)(job)
+	assert job.info is None and job.refresh_info
@@ -0,0 +1,122 @@
+import io
+import os
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+from PIL import Image
+
+from thumbnails import ThumbnailStore
+
+
+def make_jpeg():
+	data = io.BytesIO()
+	Image.new('RGB', (320, 180), (200, 30, 30)).save(data, format='JPEG')
+	return data.getvalue()
+
+
+JPEG = make_jpeg()
+
+
+class ThumbnailServer(ThreadingHTTPServer):
+	"""stands in for img.youtube.com and counts the requests it gets"""
+	daemon_threads = True
+
+	def __init__(self):
+		super().__init__(('127.0.0.1', 0), ThumbnailHandler)
+		self.requests = []
+
+	@property
+	def url_template(self):
+		return f"http://127.0.0.1:{self.server_address[1]}/vi/{{video_id}}/mqdefault.jpg"
+
+
+class ThumbnailHandler(BaseHTTPRequestHandler):
+	protocol_version = 'HTTP/1.1'
+
+	def do_GET(self):
+		self.server.requests.append(self.path)
+		self.send_response(200)
+		self.send_header('Content-Type', 'image/jpeg')
+		self.send_header('Content-Length', str(len(JPEG)))
+		self.end_headers()
+		self.wfile.write(JPEG)
+
+	def log_message(self, format, *args):
+		pass
+
+
+@pytest.fixture
+def server():
+	server = ThumbnailServer()
+	threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+	yield server
+	server.shutdown()
+	server.server_close()
+
+
+def make_store(server, cache_dir, **options):
+	store = ThumbnailStore(cache_dir=str(cache_dir), url_template=server.url_template, **options)
+	# the startup prune runs on the store's pool, the tests below want it done first
+	deadline = time.monotonic() + 5
+	while store.disk_usage is None and time.monotonic() < deadline:
+		time.sleep(0.01)
+	return store
+
+
+def cached_files(cache_dir):
+	return [os.path.join(root, name) for root, _, names in os.walk(cache_dir) for name in names]
+
+
+def test_memory_hit_skips_the_network(server, tmp_path):
+	store = make_store(server, tmp_path)
+	image = store.load('aaaaaaaaaaa')
+	assert image.size == (128, 72) and image.mode == 'RGBA'
+	assert store.load('aaaaaaaaaaa') is image
+	assert store.get_cached('aaaaaaaaaaa') is image
+	assert server.requests == ['/vi/aaaaaaaaaaa/mqdefault.jpg']
+	store.shutdown()
+
+
+def test_disk_hit_once_memory_is_cleared(server, tmp_path):
+	store = make_store(server, tmp_path)
+	store.load('aaaaaaaaaaa')
+	store.memory.clear()
+	assert store.get_cached('aaaaaaaaaaa') is None
+
+	assert store.load('aaaaaaaaaaa').size == (128, 72)
+	assert len(server.requests) == 1
+	store.shutdown()
+
+
+def test_least_recently_used_files_are_pruned_over_the_budget(server, tmp_path):
+	store = make_store(server, tmp_path)
+	store.load('aaaaaaaaaaa')
+	file_size = store.disk_usage
+	store.shutdown()
+
+	# room for three thumbnails; the fourth write goes over and prunes back under 90%
+	store = make_store(server, tmp_path, max_disk=3 * file_size + file_size // 2)
+	for video_id in ('bbbbbbbbbbb', 'ccccccccccc', 'ddddddddddd'):
+		time.sleep(0.02)  # distinct mtimes
+		store.load(video_id)
+
+	files = cached_files(tmp_path)
+	assert len(files) == 3
+	assert sum(os.path.getsize(path) for path in files) <= store.max_disk
+	assert not os.path.exists(store._disk_path(store.url_template.format(video_id='aaaaaaaaaaa')))
+	store.shutdown()
+
+
+def test_startup_prunes_an_oversized_cache(server, tmp_path):
+	store = make_store(server, tmp_path)
+	for video_id in ('aaaaaaaaaaa', 'bbbbbbbbbbb', 'ccccccccccc'):
+		time.sleep(0.02)
+		store.load(video_id)
+	store.shutdown()
+
+	store = make_store(server, tmp_path, max_disk=store.disk_usage // 2)
+	assert store.disk_usage <= store.max_disk * 0.9
+	assert len(cached_files(tmp_path)) == 1
+	store.shutdown()
@@ -0,0 +1,51 @@
+import queue
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('customtkinter')
+from main import App
+from updater import UpdateError
+
+
+class FakeWidget:
+	def __init__(self):
+		self.text = None
+		self.destroyed = False
+
+	def configure(self, text=None, **options):
+		self.text = text
+
+	def destroy(self):
+		self.destroyed = True
+
+
+class FailingUpdater:
+	def perform_update(self, update_info, progress=None):
+		progress(50, 100)
+		raise UpdateError("The download doesn't match the published checksum")
+
+
+def test_failed_update_reports_its_error():
+	scheduled = queue.Queue()
+	failures = []
+	# only what start_update touches, so no Tk window is needed
+	app = SimpleNamespace(
+		progress_label=FakeWidget(),
+		update_handler=FailingUpdater(),
+		after=lambda delay, callback: scheduled.put(callback),
+		_on_update_failed=failures.append,
+		on_close=lambda: pytest.fail("closed after a failed update"),
+	)
+	dialog = FakeWidget()
+
+	App.start_update(app, {'version': 'v9.9.9'}, dialog)
+	# callbacks run after the worker's except block is gone, as they would from Tk's event loop
+	callbacks = [scheduled.get(timeout=5), scheduled.get(timeout=5)]
+	for callback in callbacks:
+		callback()
+
+	assert dialog.destroyed
+	assert app.progress_label.text == "Downloading update... 50%"
+	assert len(failures) == 1 and isinstance(failures[0], UpdateError)
+	assert "checksum" in str(failures[0])
@@ -0,0 +1,126 @@
+import hashlib
+import os
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+import requests
+
+import updater
+from updater import UpdateHandler, UpdateError
+
+PAYLOAD = os.urandom(3 * updater.CHUNK_SIZE + 1234)
+SHA256 = hashlib.sha256(PAYLOAD).hexdigest()
+
+
+class ReleaseServer(ThreadingHTTPServer):
+	"""serves PAYLOAD with Range support; can drop the connection halfway through the first response"""
+	daemon_threads = True
+
+	def __init__(self, cut_first=False):
+		super().__init__(('127.0.0.1', 0), ReleaseHandler)
+		self.cut_first = cut_first
+		self.ranges = []  # the Range header of every request, None when there wasn't one
+
+	@property
+	def url(self):
+		return f"http://127.0.0.1:{self.server_address[1]}/YouTube_Downloader.exe"
+
+
+class ReleaseHandler(BaseHTTPRequestHandler):
+	protocol_version = 'HTTP/1.1'
+
+	def do_GET(self):
+		header = self.headers.get('Range')
+		self.server.ranges.append(header)
+		start = int(header.split('=')[1].rstrip('-')) if header else 0
+		body = PAYLOAD[start:]
+		self.send_response(206 if header else 200)
+		if header:
+			self.send_header('Content-Range', f'bytes {start}-{len(PAYLOAD) - 1}/{len(PAYLOAD)}')
+		self.send_header('Content-Length', str(len(body)))
+		self.end_headers()
+		if self.server.cut_first:
+			self.server.cut_first = False
+			self.wfile.write(body[:len(body) // 2])
+			self.wfile.flush()
+			self.close_connection = True
+			return
+		self.wfile.write(body)
+
+	def log_message(self, format, *args):
+		pass
+
+
+@pytest.fixture
+def serve():
+	servers = []
+
+	def start(**options):
+		server = ReleaseServer(**options)
+		threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+		servers.append(server)
+		return server
+	yield start
+	for server in servers:
+		server.shutdown()
+		server.server_close()
+
+
+@pytest.fixture
+def handler(tmp_path, monkeypatch):
+	monkeypatch.setattr(updater.time, 'sleep', lambda seconds: None)
+	return UpdateHandler(
+		download_dir=str(tmp_path / 'update'), session=requests.Session(), state_path=tmp_path / 'release_check.json'
+	)
+
+
+def update_info(server, sha256=SHA256):
+	return {'url': server.url, 'version': 'v9.9.9', 'size': len(PAYLOAD), 'sha256': sha256, 'checksum_url': None}
+
+
+def test_verified_download(serve, handler):
+	path = handler.download(update_info(serve()))
+	with open(path, 'rb') as f:
+		assert f.read() == PAYLOAD
+
+
+def test_digest_mismatch_is_rejected(serve, handler):
+	with pytest.raises(UpdateError, match='checksum'):
+		handler.download(update_info(serve(), sha256='0' * 64))
+	# neither the bad file nor a part file to resume from is left behind
+	assert os.listdir(handler.download_dir) == []
+
+
+def test_interrupted_download_resumes_with_a_range_request(serve, handler):
+	server = serve(cut_first=True)
+	progress = []
+	path = handler.download(update_info(server), lambda done, total: progress.append((done, total)))
+
+	with open(path, 'rb') as f:
+		assert f.read() == PAYLOAD
+	assert server.ranges[0] is None
+	assert server.ranges[1].startswith('bytes=') and server.ranges[1] != 'bytes=0-'
+	assert progress[-1] == (len(PAYLOAD), len(PAYLOAD))
+
+
+def test_part_file_from_an_earlier_run_is_resumed(serve, handler):
+	server = serve()
+	os.makedirs(handler.download_dir)
+	with open(os.path.join(handler.download_dir, 'YouTube_Downloader.exe.v9.9.9.part'), 'wb') as f:
+		f.write(PAYLOAD[:1000])
+
+	path = handler.download(update_info(server))
+	with open(path, 'rb') as f:
+		assert f.read() == PAYLOAD
+	assert server.ranges == ['bytes=1000-']
+
+
+def test_release_without_a_checksum_is_refused(serve, handler):
+	with pytest.raises(UpdateError):
+		handler.download({**update_info(serve()), 'sha256': None})
+
+
+def test_checksum_is_read_from_a_sha256sums_asset():
+	listing = f"{'1' * 64}  other.zip\n{SHA256} *YouTube_Downloader.exe\n"
+	assert updater._find_checksum(listing, 'YouTube_Downloader.exe') == SHA256